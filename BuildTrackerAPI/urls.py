@@ -19,6 +19,9 @@ from BuildTrackerApp.views import (
     send_email_notification,
     upload_excel,
     upload_excel_forecast,
+    ImportJobDetailView,
+    SyncView,
+    PerfSummaryView,
 )
 
 
@@ -45,4 +48,7 @@ urlpatterns = [
     path('api/send-email/', send_email_notification, name='send_email'),
     path('upload-excel/', upload_excel, name='excel_upload'),
     path('upload_excel_forecast/', upload_excel_forecast, name='upload_excel_forecast'),
+    path('import-jobs/<int:pk>/', ImportJobDetailView.as_view(), name='import_job_detail'),
+    path('sync/', SyncView.as_view(), name='sync'),
+    path('_perf/', PerfSummaryView.as_view(), name='perf_summary'),
 ]
@@ -0,0 +1,121 @@
+"""
+JWT authentication without a User query per request.
+
+``CachedJWTAuthentication`` verifies the token like simplejwt's
+``JWTAuthentication`` (signature and expiry, no database), but instead of
+loading the User row it returns a ``ClaimsUser``: the user id from the
+token with the username, is_staff and is_superuser flags from a small
+in-process cache. An entry lives for AUTH_USER_CACHE_TTL seconds and is
+dropped as soon as this process saves or deletes the User (signals.py),
+so a changed staff flag or a deleted account takes effect at once here
+and within the TTL in other processes. The cache holds at most
+AUTH_USER_CACHE_SIZE users, dropping the least recently seen.
+
+``request.user`` is then not a model instance: views that need the User
+row itself (to update it, say) load it by ``request.user.id``.
+"""
+import collections
+import functools
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .replica import primary_reads
+
+CLAIM_FIELDS = ('username', 'is_staff', 'is_superuser', 'is_active')
+
+# User id -> (expiry on the time.monotonic() clock, claims or None for no such user),
+# least recently used first
+_claims = collections.OrderedDict()
+_claims_lock = threading.Lock()
+
+
+def get_cache_ttl():
+    return getattr(settings, 'AUTH_USER_CACHE_TTL', 30)
+
+
+def get_cache_size():
+    return getattr(settings, 'AUTH_USER_CACHE_SIZE', 1000)
+
+
+class ClaimsUser(TokenUser):
+    """The authenticated user as far as permissions go: id, username, is_staff and is_superuser."""
+
+    def __str__(self):
+        return self.username
+
+
+def load_claims(user_id):
+    fields = CLAIM_FIELDS + (('password',) if api_settings.CHECK_REVOKE_TOKEN else ())
+    with primary_reads():
+        row = get_user_model().objects.filter(**{api_settings.USER_ID_FIELD: user_id}).values(*fields).first()
+    if row is None:
+        return None
+    if 'password' in row:
+        row[api_settings.REVOKE_TOKEN_CLAIM] = get_md5_hash_password(row.pop('password'))
+    row[api_settings.USER_ID_CLAIM] = user_id
+    return row
+
+
+def user_claims(user_id):
+    """The cached claims of ``user_id``, loaded again once they are AUTH_USER_CACHE_TTL seconds old."""
+    now = time.monotonic()
+    with _claims_lock:
+        entry = _claims.get(user_id)
+        if entry is not None and entry[0] > now:
+            _claims.move_to_end(user_id)
+            return entry[1]
+
+    entry = (now + get_cache_ttl(), load_claims(user_id))
+    with _claims_lock:
+        _claims[user_id] = entry
+        _claims.move_to_end(user_id)
+        # Expired entries go first, then the least recently used beyond the limit
+        while _claims and next(iter(_claims.values()))[0] <= now:
+            _claims.popitem(last=False)
+        while len(_claims) > get_cache_size():
+            _claims.popitem(last=False)
+    return entry[1]
+
+
+def invalidate_user(user_id, using=None):
+    """
+    Forget the claims of ``user_id`` now and again when the current
+    transaction commits, so they are not reloaded from before the change.
+    """
+    _claims.pop(user_id, None)
+    transaction.on_commit(functools.partial(_claims.pop, user_id, None), using=using)
+
+
+def clear_user_cache():
+    _claims.clear()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        claims = user_claims(user_id)
+        if claims is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not claims['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != claims[api_settings.REVOKE_TOKEN_CLAIM]
+        ):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return ClaimsUser(claims)
@@ -0,0 +1,244 @@
+"""
+Benchmark of the API routes against the data in the database.
+
+``default_cases`` builds one ``BenchmarkCase`` per route (and a few
+variants: filters, exports, bulk writes, uploads, ETag revalidation) from
+rows already stored, so seed a data set first (``manage.py seed_data``).
+``run`` sends each case ``repeat`` times through the Django test client,
+the whole middleware stack included, and reports per case:
+
+* throughput (requests per second) and latency percentiles, streamed
+  bodies read to the end;
+* the number of SQL queries of one request;
+* the peak memory allocated during one extra request, traced with
+  ``tracemalloc`` (kept out of the timed requests, it slows them down).
+
+Requests that write run in a transaction that is rolled back, so every
+repetition sees the same data and the database is left as it was. Uploads
+are imported straight away (IMPORT_JOBS_EAGER) and stored in a temporary
+MEDIA_ROOT. The client expects ``django.test.utils.setup_test_environment``
+(for the test server host and the in-memory mail backend); the
+``run_benchmarks`` command sets it up.
+"""
+import contextlib
+import datetime
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from typing import NamedTuple
+
+import django
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connections, transaction
+from django.test import Client, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import PLO, ChangeCounter, Forecast, Item, Processor
+from .perf import PERCENTILES
+from .serializers import ItemSerializer
+from .synthetic import build_items, free_sids, write_forecast_sheet, write_item_sheet
+
+BENCHMARK_USERNAME = 'benchmark-runner'
+
+
+class BenchmarkCase(NamedTuple):
+    name: str
+    method: str
+    path: str
+    data: object = None
+    upload: tuple = None  # (file name, bytes) sent as the multipart 'file' field
+    writes: bool = False
+    revalidate: bool = False  # send the ETag of a first response as If-None-Match
+
+
+class QueryCounter:
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def default_cases(upload_rows=200, work_dir=None):
+    """The cases for the stored data; upload files of ``upload_rows`` rows are written to ``work_dir``."""
+    item = Item.objects.order_by('id').first()
+    forecast = Forecast.objects.order_by('id').first()
+    if item is None or forecast is None:
+        raise ValueError("Seed Items and Forecasts before benchmarking (manage.py seed_data).")
+    token = ChangeCounter.objects.get(pk=1).value
+
+    rng = np.random.default_rng()
+    new_items = ItemSerializer(
+        build_items(free_sids(50, rng), list(PLO.objects.all()), list(Processor.objects.all()), rng), many=True,
+    ).data
+    stored_sids = Item.objects.order_by('id').values_list('sid', flat=True)[:50]
+    changes = [{'sid': sid, 'comments': 'Benchmark'} for sid in stored_sids]
+
+    cases = [
+        BenchmarkCase('plo list', 'get', '/api/api/plo/'),
+        BenchmarkCase('processor list', 'get', '/api/api/processor/'),
+        BenchmarkCase('item list', 'get', '/api/api/item/'),
+        BenchmarkCase('item list revalidated', 'get', '/api/api/item/', revalidate=True),
+        BenchmarkCase('item list filtered', 'get', f'/api/api/item/?status={item.status}&ordering=-requested_date'),
+        BenchmarkCase('item list sparse', 'get', '/api/api/item/?fields=sid,status'),
+        BenchmarkCase('item search', 'get', f'/api/api/item/?search={item.sid[:1]}'),
+        BenchmarkCase('item detail', 'get', f'/api/api/item/{item.sid}/'),
+        BenchmarkCase('item stats', 'get', '/api/api/item/stats/'),
+        BenchmarkCase('item stage stats', 'get', '/api/api/item/stage-stats/?group_by=flavour'),
+        BenchmarkCase('item eta', 'get', '/api/api/item/eta/'),
+        BenchmarkCase('item export csv', 'get', '/api/api/item/export/?format=csv'),
+        BenchmarkCase('item export xlsx', 'get', '/api/api/item/export/?format=xlsx'),
+        BenchmarkCase('item update', 'patch', f'/api/api/item/{item.sid}/',
+                      data={'comments': 'Benchmark', 'partial': True}, writes=True),
+        BenchmarkCase('item bulk create', 'post', '/api/api/item/bulk/', data=new_items, writes=True),
+        BenchmarkCase('item bulk update', 'patch', '/api/api/item/bulk/', data=changes, writes=True),
+        BenchmarkCase('forecast list', 'get', '/api/api/forecast/'),
+        BenchmarkCase('forecast list filtered', 'get', f'/api/api/forecast/?assigned_to={forecast.assigned_to}'),
+        BenchmarkCase('forecast detail', 'get', f'/api/api/forecast/{forecast.pk}/'),
+        BenchmarkCase('forecast capacity', 'get', '/api/api/forecast/capacity/'),
+        BenchmarkCase('forecast capacity what-if', 'post', '/api/api/forecast/capacity/',
+                      data={'remove': [forecast.pk], 'team_capacity': {forecast.assigned_to: 10}}),
+        BenchmarkCase('forecast export xlsx', 'get', '/api/api/forecast/export/?format=xlsx'),
+        BenchmarkCase('sync full', 'get', '/api/sync/'),
+        BenchmarkCase('sync incremental', 'get', f'/api/sync/?since={max(token - 100, 0)}'),
+        BenchmarkCase('user detail', 'get', '/api/user/'),
+        BenchmarkCase('user list', 'get', '/api/users/'),
+        BenchmarkCase('perf summary', 'get', '/api/_perf/'),
+    ]
+
+    if upload_rows and work_dir:
+        for name, path, writer in (
+            ('upload items', '/api/upload-excel/', write_item_sheet),
+            ('upload forecasts', '/api/upload_excel_forecast/', write_forecast_sheet),
+        ):
+            file_name = os.path.join(work_dir, f"{name.replace(' ', '-')}.xlsx")
+            writer(file_name, upload_rows)
+            with open(file_name, 'rb') as sheet:
+                upload = (os.path.basename(file_name), sheet.read())
+            cases.append(BenchmarkCase(name, 'post', path, upload=upload, writes=True))
+    return cases
+
+
+def _send(client, case, headers):
+    if case.upload:
+        name, content = case.upload
+        response = client.post(case.path, {'file': SimpleUploadedFile(name, content)}, headers=headers)
+    elif case.data is not None:
+        response = getattr(client, case.method)(case.path, case.data, content_type='application/json', headers=headers)
+    else:
+        response = getattr(client, case.method)(case.path, headers=headers)
+    size = len(b''.join(response.streaming_content)) if response.streaming else len(response.content)
+    return response, size
+
+
+def _request(client, case, headers):
+    """Send ``case`` once; returns the response, body size, seconds taken and number of queries."""
+    counter = QueryCounter()
+    with contextlib.ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counter))
+        if case.writes:
+            stack.enter_context(transaction.atomic())
+        start = time.perf_counter()
+        response, size = _send(client, case, headers)
+        elapsed = time.perf_counter() - start
+        if case.writes:
+            transaction.set_rollback(True)
+    return response, size, elapsed, counter.count
+
+
+def measure(client, case, repeat, headers=None):
+    headers = dict(headers or {})
+    if case.revalidate:
+        response, _size = _send(client, case, headers)
+        headers['If-None-Match'] = response.get('ETag', '')
+    response, size, _elapsed, queries = _request(client, case, headers)  # warm-up
+    timings = [_request(client, case, headers)[2] for _ in range(repeat)]
+
+    tracemalloc.start()
+    try:
+        _request(client, case, headers)
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latencies = np.array(timings) * 1000
+    return {
+        'name': case.name,
+        'method': case.method.upper(),
+        'path': case.path,
+        'status': response.status_code,
+        'requests': repeat,
+        'throughput_rps': round(repeat / sum(timings), 2),
+        'latency_ms': {
+            **{f'p{percentile}': round(float(value), 2)
+               for percentile, value in zip(PERCENTILES, np.percentile(latencies, PERCENTILES))},
+            'mean': round(float(latencies.mean()), 2),
+            'max': round(float(latencies.max()), 2),
+        },
+        'queries': queries,
+        'peak_memory_kb': round(peak / 1024, 1),
+        'bytes': size,
+    }
+
+
+@contextlib.contextmanager
+def benchmark_user():
+    """A staff user for the routes behind authentication, removed again afterwards."""
+    user, _created = User.objects.update_or_create(
+        username=BENCHMARK_USERNAME, defaults={'is_staff': True, 'is_superuser': True},
+    )
+    try:
+        yield user
+    finally:
+        user.delete()
+
+
+def run(repeat=20, only=None, upload_rows=200, progress=None):
+    """
+    Benchmark the cases whose name contains one of ``only`` (all by
+    default) and return the report; ``progress`` is called with each result.
+    """
+    started_at = timezone.now()
+    with tempfile.TemporaryDirectory() as work_dir, benchmark_user() as user, \
+            override_settings(IMPORT_JOBS_EAGER=True, MEDIA_ROOT=work_dir):
+        cases = default_cases(upload_rows, work_dir)
+        if only:
+            cases = [case for case in cases if any(term in case.name for term in only)]
+        client = Client()
+        headers = {'Authorization': f'Bearer {RefreshToken.for_user(user).access_token}'}
+        results = []
+        for case in cases:
+            results.append(measure(client, case, repeat, headers))
+            if progress:
+                progress(results[-1])
+
+    return {
+        'started_at': started_at.isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connections['default'].vendor,
+        },
+        'data': {model.__name__: model.objects.count() for model in (PLO, Processor, Item, Forecast)},
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def save(report, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as output:
+        json.dump(report, output, indent=2)
+
+
+def default_output_path(base_dir):
+    return os.path.join(base_dir, 'benchmarks', f'{datetime.datetime.now():%Y%m%d-%H%M%S}.json')
@@ -0,0 +1,118 @@
+"""
+Calendar weeks stored as sortable integers.
+
+An ISO week is stored as ``year * 100 + week`` (CW 10 of 2026 is
+``202610``), so integer order is calendar order and a week range is two
+plain indexed integer columns. Forecasts keep ``cw_request_plo`` and
+``cw_delivered`` as the first week of a range and ``*_end`` as the last;
+"requested in CW 10-14 of 2026" is then the overlap test
+``cw_request_plo <= 202614 AND cw_request_plo_end >= 202610``.
+
+``parse_weeks`` accepts what people type into the sheet or the form: a
+week number (``10``, ``CW10``), a year and week (``2026-W10``), ranges
+(``10-14``, ``2026-W52..2027-W02``) and lists (``10,11,12``, kept as the
+range they span). ``format_weeks`` renders the canonical text form.
+"""
+import datetime
+import re
+
+import numpy as np
+from django.utils import timezone
+
+WEEK_TOKEN = re.compile(r'(?:(?P<year>\d{4})\s*[-/ ]\s*)?(?:c?w\s*)?(?P<week>\d{1,2})(?!\d)', re.IGNORECASE)
+SEPARATORS = re.compile(r'^(?:\s|,|;|-|–|—|\.\.|to|cw|w)*$', re.IGNORECASE)
+
+
+def encode(year, week):
+    """``(year, week)`` as the stored integer; raises ValueError for a week the year does not have."""
+    datetime.date.fromisocalendar(year, week, 1)
+    return year * 100 + week
+
+
+def decode(value):
+    return divmod(value, 100)
+
+
+def current_year():
+    return timezone.localdate().isocalendar().year
+
+
+def parse_weeks(value, default_year=None):
+    """
+    ``(first, last)`` encoded weeks for ``value``, or ``(None, None)`` when blank.
+
+    Weeks given without a year take the year of the previous week in the
+    value, or ``default_year`` (the current ISO year) for the first one; a
+    week lower than the one before it rolls over into the next year.
+    Raises ValueError for anything else.
+    """
+    if value is None or value == '' or value == []:
+        return None, None
+    if isinstance(value, (list, tuple)):
+        weeks = [week for item in value for week in parse_weeks(item, default_year) if week is not None]
+        return (min(weeks), max(weeks)) if weeks else (None, None)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        if value >= 100 * 1000:
+            encode(*decode(value))
+            return value, value
+        value = str(value)
+    if not isinstance(value, str):
+        raise ValueError(f"Not a calendar week: {value!r}.")
+
+    text = value.strip()
+    if not text:
+        return None, None
+    year = default_year or current_year()
+    weeks = []
+    position = 0
+    for match in WEEK_TOKEN.finditer(text):
+        if not SEPARATORS.match(text[position:match.start()]):
+            break
+        week = int(match['week'])
+        if match['year']:
+            year = int(match['year'])
+        elif weeks and week < decode(weeks[-1])[1] and decode(weeks[-1])[0] == year:
+            year += 1
+        try:
+            weeks.append(encode(year, week))
+        except ValueError:
+            raise ValueError(f"{year} has no calendar week {week}.")
+        position = match.end()
+    if not weeks or not SEPARATORS.match(text[position:]):
+        raise ValueError(f"Not a calendar week: {value!r}.")
+    return min(weeks), max(weeks)
+
+
+def format_week(value):
+    year, week = decode(value)
+    return f'{year}-W{week:02d}'
+
+
+def format_weeks(first, last=None):
+    if first is None:
+        return None
+    if last is None or last == first:
+        return format_week(first)
+    return f'{format_week(first)}..{format_week(last)}'
+
+
+def week_index(values):
+    """
+    Consecutive week numbers for an array of encoded weeks, so that
+    ``week_index(b) - week_index(a)`` is the number of weeks between them.
+    """
+    values = np.asarray(values, dtype='int64')
+    years, weeks = np.divmod(values, 100)
+    jan4 = (years - 1970).astype('datetime64[Y]').astype('datetime64[D]') + 3
+    # 1970-01-01 was a Thursday; shift so that Monday starts the week
+    monday_of_week1 = jan4.astype('int64') - (jan4.astype('int64') + 3) % 7
+    return (monday_of_week1 + 3) // 7 + weeks - 1
+
+
+def from_week_index(index):
+    """Inverse of ``week_index`` for one value."""
+    monday = datetime.date(1970, 1, 1) + datetime.timedelta(weeks=int(index), days=-3)
+    year, week, _day = monday.isocalendar()
+    return encode(year, week)
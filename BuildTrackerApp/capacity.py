@@ -0,0 +1,255 @@
+"""
+Calendar-week capacity planning over Forecast demand.
+
+Every scheduled Forecast occupies the weeks from the first week of
+``cw_request_plo`` up to the last week of ``cw_delivered`` (or ``time_weeks``
+weeks when it has not been delivered).
+While open it needs one build slot, or one per client when its clients are
+processed in parallel. That load is charged to the assigned team and split
+evenly between the processors of the linked Item.
+
+``load_demand`` reads all Forecasts into NumPy columns with one query.
+``simulate`` turns them into week-by-week load profiles with difference
+arrays (``np.add.at`` at interval starts and ends, then ``cumsum``), so a
+what-if run over a few thousand Forecasts costs a handful of array
+operations. ``apply_scenario`` applies the edits of a what-if request to a
+copy of the demand.
+"""
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .calendar_weeks import encode, format_week, from_week_index, parse_weeks, week_index
+from .models import Forecast
+from .references import processors as processor_table
+
+TEAMS = [value for value, _label in Forecast.ASSIGNED_TO_CHOICES]
+# Teams without a configured capacity (TBD by default) are reported but never flagged
+DEFAULT_TEAM_CAPACITY = {'COE': 10, 'ODC': 10}
+DEFAULT_PROCESSOR_CAPACITY = 3
+
+DEMAND_FIELDS = [
+    'id', 'assigned_to', 'cw_request_plo', 'cw_delivered_end', 'time_weeks', 'clients',
+    'parallel_processing', 'item__processor1_id', 'item__processor2_id',
+]
+NO_PROCESSOR = -1
+
+
+class ScenarioError(ValueError):
+    """Raised for a what-if request that cannot be applied."""
+
+
+def load_demand():
+    """
+    All Forecasts as a dict of equally long NumPy arrays, ordered by id.
+    ``start`` and ``delivered`` hold encoded calendar weeks, 0 when unset.
+    """
+    rows = list(Forecast.objects.order_by('id').values_list(*DEMAND_FIELDS))
+    ids, teams, starts, delivered, weeks, clients, parallel, processor1, processor2 = (
+        list(zip(*rows)) if rows else [()] * len(DEMAND_FIELDS)
+    )
+    team_index = {team: index for index, team in enumerate(TEAMS)}
+    return {
+        'id': np.array(ids, dtype='int64'),
+        'team': np.array([team_index.get(team, TEAMS.index(Forecast.TBD)) for team in teams], dtype='int64'),
+        'start': _int_array(starts),
+        'delivered': _int_array(delivered),
+        'weeks': _int_array(weeks),
+        'clients': _int_array(clients),
+        'parallel': np.array([bool(value) for value in parallel], dtype=bool),
+        'processor1': _int_array(processor1, NO_PROCESSOR),
+        'processor2': _int_array(processor2, NO_PROCESSOR),
+    }
+
+
+def _int_array(values, missing=0):
+    """Integers with None replaced by ``missing``."""
+    return np.array([missing if value is None else value for value in values], dtype='int64')
+
+
+def intervals(demand):
+    """
+    ``(scheduled, start, end, load)``: the mask of Forecasts that have a
+    start week, and for those their half-open week interval and weekly load.
+    """
+    scheduled = demand['start'] > 0
+    # Consecutive week numbers, so intervals may cross a year boundary
+    start = np.where(scheduled, week_index(np.where(scheduled, demand['start'], 197001)), 0)
+    delivered = demand['delivered'] > 0
+    end = np.where(delivered, week_index(np.where(delivered, demand['delivered'], 197001)) + 1,
+                   start + np.maximum(demand['weeks'], 1))
+    end = np.maximum(end, start + 1)
+    load = np.where(demand['parallel'], np.maximum(demand['clients'], 1), 1).astype(float)
+    return scheduled, start[scheduled], end[scheduled], load[scheduled]
+
+
+def _profiles(groups, group_count, start, end, load, first, week_count):
+    """Week-by-week load per group, from interval endpoints clipped to the window."""
+    delta = np.zeros((group_count, week_count + 1))
+    np.add.at(delta, (groups, np.clip(start - first, 0, week_count)), load)
+    np.add.at(delta, (groups, np.clip(end - first, 0, week_count)), -load)
+    return np.cumsum(delta, axis=1)[:, :week_count]
+
+
+def _report(load, capacity, weeks):
+    overcommitted = load > capacity if capacity is not None else np.zeros(len(weeks), dtype=bool)
+    return {
+        'capacity': capacity,
+        'load': np.round(load, 2).tolist(),
+        'peak': float(load.max()) if len(load) else 0.0,
+        'overcommitted_weeks': weeks[overcommitted].tolist(),
+    }
+
+
+def simulate(demand, team_capacity=None, processor_capacity=None, first_week=None, last_week=None):
+    """
+    Load profiles per team and processor for the encoded calendar weeks
+    ``first_week`` to ``last_week`` (default: every week touched by a
+    scheduled Forecast).
+
+    ``team_capacity`` maps teams to weekly slots and overrides
+    CAPACITY_TEAM_SLOTS for those teams. ``processor_capacity`` is either
+    one number for every processor or a mapping of processor name to slots;
+    processors it leaves out get CAPACITY_PROCESSOR_SLOTS.
+    """
+    team_capacity = {
+        **getattr(settings, 'CAPACITY_TEAM_SLOTS', DEFAULT_TEAM_CAPACITY),
+        **(team_capacity or {}),
+    }
+    default_processor_capacity = getattr(settings, 'CAPACITY_PROCESSOR_SLOTS', DEFAULT_PROCESSOR_CAPACITY)
+    if processor_capacity is None:
+        processor_capacity = default_processor_capacity
+
+    scheduled, start, end, load = intervals(demand)
+    if first_week:
+        first = int(week_index([first_week])[0])
+    elif len(start):
+        first = int(start.min())
+    else:
+        first = int(week_index([encode(*timezone.localdate().isocalendar()[:2])])[0])
+    last = int(week_index([last_week])[0]) if last_week else int(end.max()) - 1 if len(end) else first
+    if last < first:
+        raise ScenarioError("last_week must not be before first_week.")
+    weeks = np.array([format_week(from_week_index(index)) for index in range(first, last + 1)])
+    week_count = len(weeks)
+
+    team_load = _profiles(demand['team'][scheduled], len(TEAMS), start, end, load, first, week_count)
+
+    # Each Forecast contributes one entry per assigned processor, sharing its load
+    processor1 = demand['processor1'][scheduled]
+    processor2 = demand['processor2'][scheduled]
+    processor2 = np.where(processor2 == processor1, NO_PROCESSOR, processor2)
+    share = load / np.maximum((processor1 != NO_PROCESSOR).astype(int) + (processor2 != NO_PROCESSOR), 1)
+    processors = np.concatenate([processor1, processor2])
+    assigned = processors != NO_PROCESSOR
+    processor_ids, groups = np.unique(processors[assigned], return_inverse=True)
+    processor_load = _profiles(
+        groups, len(processor_ids),
+        np.concatenate([start, start])[assigned], np.concatenate([end, end])[assigned],
+        np.concatenate([share, share])[assigned], first, week_count,
+    )
+    unassigned = (processor1 == NO_PROCESSOR) & (processor2 == NO_PROCESSOR)
+
+    names = processor_table.get().names
+    if isinstance(processor_capacity, dict):
+        capacity_for = lambda name: processor_capacity.get(name, default_processor_capacity)
+    else:
+        capacity_for = lambda name: processor_capacity
+    return {
+        'weeks': weeks.tolist(),
+        'teams': {
+            team: _report(team_load[index], team_capacity.get(team), weeks)
+            for index, team in enumerate(TEAMS)
+        },
+        'processors': {
+            names.get(processor_id, str(processor_id)): _report(
+                processor_load[index], capacity_for(names.get(processor_id)), weeks,
+            )
+            for index, processor_id in enumerate(processor_ids.tolist())
+        },
+        'forecasts': int(len(demand['id'])),
+        'unscheduled': int((~scheduled).sum()),
+        'without_processor': int(unassigned.sum()),
+    }
+
+
+def _processor_ids(names):
+    mapping = {name: pk for name, pk in processor_table.get().ids.items() if name in names}
+    unknown = set(names) - set(mapping) - {None, ''}
+    if unknown:
+        raise ScenarioError(f"Unknown processor(s): {', '.join(sorted(unknown))}.")
+    return mapping
+
+
+def _set_fields(demand, index, values, processor_mapping):
+    for name, value in values.items():
+        if name == 'assigned_to':
+            if value not in TEAMS:
+                raise ScenarioError(f"assigned_to must be one of: {', '.join(TEAMS)}.")
+            demand['team'][index] = TEAMS.index(value)
+        elif name in ('processor1', 'processor2'):
+            demand[name][index] = processor_mapping.get(value, NO_PROCESSOR)
+        elif name == 'parallel_processing':
+            demand['parallel'][index] = bool(value)
+        elif name in ('cw_request_plo', 'cw_delivered'):
+            try:
+                first, last = parse_weeks(value)
+            except ValueError as e:
+                raise ScenarioError(f"{name}: {e}")
+            if name == 'cw_request_plo':
+                demand['start'][index] = first or 0
+            else:
+                demand['delivered'][index] = last or 0
+        elif name in ('time_weeks', 'clients'):
+            column = {'time_weeks': 'weeks'}.get(name, name)
+            try:
+                demand[column][index] = 0 if value is None else int(value)
+            except (TypeError, ValueError):
+                raise ScenarioError(f"{name} must be a whole number.")
+        else:
+            raise ScenarioError(f"Cannot change '{name}'.")
+
+
+def apply_scenario(demand, changes=(), add=(), remove=()):
+    """
+    A copy of ``demand`` with a what-if applied: ``changes`` is a list of
+    ``{'id': ..., <field>: <value>}`` edits to existing Forecasts, ``add``
+    a list of hypothetical Forecasts and ``remove`` a list of Forecast ids.
+    Fields use the Forecast names, calendar weeks in any form
+    ``parse_weeks`` accepts; processors are given by name.
+    """
+    demand = {name: column.copy() for name, column in demand.items()}
+    names = {
+        values.get(field)
+        for values in list(changes) + list(add)
+        for field in ('processor1', 'processor2')
+    }
+    processor_mapping = _processor_ids(names - {None, ''})
+
+    for values in changes:
+        values = dict(values)
+        forecast_id = values.pop('id', None)
+        index = np.searchsorted(demand['id'], forecast_id) if isinstance(forecast_id, int) else len(demand['id'])
+        if index >= len(demand['id']) or demand['id'][index] != forecast_id:
+            raise ScenarioError(f"No forecast with id {forecast_id!r}.")
+        _set_fields(demand, index, values, processor_mapping)
+
+    if add:
+        count = len(add)
+        blank = {
+            'id': np.zeros(count, dtype='int64'),
+            'team': np.full(count, TEAMS.index(Forecast.TBD), dtype='int64'),
+            'parallel': np.zeros(count, dtype=bool),
+            'processor1': np.full(count, NO_PROCESSOR, dtype='int64'),
+            'processor2': np.full(count, NO_PROCESSOR, dtype='int64'),
+        }
+        for name in ('start', 'delivered', 'weeks', 'clients'):
+            blank[name] = np.zeros(count, dtype='int64')
+        for index, values in enumerate(add):
+            _set_fields(blank, index, dict(values), processor_mapping)
+        demand = {name: np.concatenate([column, blank[name]]) for name, column in demand.items()}
+
+    if remove:
+        keep = ~np.isin(demand['id'], np.array(list(remove), dtype='int64')) | (demand['id'] == 0)
+        demand = {name: column[keep] for name, column in demand.items()}
+    return demand
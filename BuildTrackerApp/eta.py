@@ -0,0 +1,236 @@
+"""
+Delivery date prediction learned from delivered Items.
+
+Build duration (``delivery_date - requested_date`` in days) is modelled as
+a ridge regression over one-hot flavour, t-shirt size, hardware and bfs,
+hashed ``setup`` buckets and ``log1p(estimated_clients)``. The model only
+keeps the normal-equation sums ``X'X`` and ``X'y``, so delivered Items can
+be added to a fitted model without revisiting the old ones; solving the
+small system again is all a refit costs.
+
+``get_model`` returns the model from Django's cache after folding in Items
+delivered since it was stored, or refits it when an Item it learned from
+has changed, and ``predict_open_items`` scores every open Item in one
+vectorized NumPy pass.
+"""
+import zlib
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Item
+from .replica import primary_reads
+
+ETA_MODEL_CACHE_KEY = 'buildtracker:eta-model'
+NO_DELIVERY_DATE = Item._meta.get_field('delivery_date').default
+
+CATEGORICAL_FIELDS = {
+    'flavour': [value for value, _label in Item.FLAVOUR_CHOICES],
+    't_shirt_size': [value for value, _label in Item.TSHIRT_SIZE_CHOICES],
+    'hardware': [value for value, _label in Item.HARDWARE_CHOICES],
+    'bfs': [value for value, _label in Item.BFS_CHOICES],
+}
+SETUP_BUCKETS = 16
+FEATURE_FIELDS = ['requested_date', 'estimated_clients', 'setup'] + list(CATEGORICAL_FIELDS)
+INACTIVE_STATUSES = ('Cancelled',)
+
+
+def _setup_bucket(setup):
+    # crc32 rather than hash(), which is salted per process
+    return zlib.crc32((setup or '').strip().lower().encode()) % SETUP_BUCKETS
+
+
+def feature_columns(rows):
+    """Turn ``values_list`` rows of ``FEATURE_FIELDS`` (plus extras) into NumPy columns."""
+    columns = list(zip(*rows)) if rows else [()] * len(FEATURE_FIELDS)
+    return dict(zip(FEATURE_FIELDS, (np.array(column, dtype=object) for column in columns)))
+
+
+def design_matrix(columns):
+    """Feature matrix for the columns returned by ``feature_columns``; the first column is the intercept."""
+    count = len(columns['requested_date'])
+    parts = [np.ones((count, 1)), np.log1p(np.maximum(columns['estimated_clients'].astype(float), 0))[:, None]]
+    for field, choices in CATEGORICAL_FIELDS.items():
+        parts.append((columns[field][:, None] == np.array(choices, dtype=object)[None, :]).astype(float))
+    setup = np.fromiter((_setup_bucket(value) for value in columns['setup']), dtype=int, count=count)
+    parts.append((setup[:, None] == np.arange(SETUP_BUCKETS)[None, :]).astype(float))
+    return np.hstack(parts)
+
+
+def _days(dates):
+    return np.array(dates, dtype='datetime64[D]').astype('int64')
+
+
+class EtaModel:
+    """Ridge regression of build duration in days, fitted from running sums."""
+
+    def __init__(self, ridge=1.0):
+        self.ridge = ridge
+        self.width = design_matrix(feature_columns([])).shape[1]
+        self.xtx = np.zeros((self.width, self.width))
+        self.xty = np.zeros(self.width)
+        self.count = 0
+        self.residual_ss = 0.0
+        self.item_ids = set()  # delivered Items already folded in, maintained by get_model
+        self.change_seq = 0  # highest change_seq among them, so later edits show
+        self.coef = np.zeros(self.width)
+
+    def add(self, X, y):
+        """Fold observations into the sums and re-solve the coefficients."""
+        if not len(y):
+            return self
+        self.xtx += X.T @ X
+        self.xty += X.T @ y
+        self.count += len(y)
+        # Residuals against the model as it was, an honest (slightly pessimistic) error estimate
+        self.residual_ss += float(np.sum((y - X @ self.coef) ** 2))
+        penalty = self.ridge * np.eye(self.width)
+        penalty[0, 0] = 0  # leave the intercept unpenalised
+        self.coef = np.linalg.solve(self.xtx + penalty, self.xty)
+        return self
+
+    def predict_days(self, X):
+        return np.maximum(X @ self.coef, 0)
+
+    @property
+    def rmse_days(self):
+        return float(np.sqrt(self.residual_ss / self.count)) if self.count else None
+
+
+def delivered_items():
+    """Delivered Items usable for training, as ``values_list`` rows ending in ``delivery_date`` and ``id``."""
+    return (
+        Item.objects
+        .exclude(delivery_date=NO_DELIVERY_DATE)
+        .exclude(status__in=INACTIVE_STATUSES)
+        .values_list(*FEATURE_FIELDS, 'delivery_date', 'id')
+    )
+
+
+def training_data(rows):
+    """``(X, y)`` for delivered ``rows``; items delivered before they were requested are dropped."""
+    columns = feature_columns([row[:len(FEATURE_FIELDS)] for row in rows])
+    delivered = _days([row[-2] for row in rows])
+    y = (delivered - _days(columns['requested_date'])).astype(float) if rows else np.zeros(0)
+    keep = y >= 0
+    return design_matrix(columns)[keep], y[keep]
+
+
+def fit(rows, ridge=None):
+    """A fresh model trained on delivered ``rows``; see ``delivered_items``."""
+    ridge = ridge if ridge is not None else getattr(settings, 'ETA_RIDGE', 1.0)
+    X, y = training_data(rows)
+    return EtaModel(ridge).add(X, y)
+
+
+@primary_reads()  # the model is cached across requests, so never learns from a lagging replica
+def get_model():
+    """
+    The cached model, brought up to date with Items delivered since it was stored.
+
+    Only the ids and change numbers of delivered Items are read to detect
+    new ones. The model is rebuilt from scratch when an Item it learned from
+    was edited since (its ``change_seq`` moved past the model's) or is no
+    longer delivered (its delivery date was cleared, or it was deleted or
+    cancelled), since its old contribution cannot be taken out of the sums.
+    """
+    model = cache.get(ETA_MODEL_CACHE_KEY)
+    delivered = dict(delivered_items().values_list('id', 'change_seq'))
+    learned = model.item_ids if model is not None else set()
+    if (
+        model is None
+        or getattr(model, 'change_seq', None) is None  # stored before change numbers were tracked
+        or not learned <= delivered.keys()
+        or any(delivered[pk] > model.change_seq for pk in learned)
+    ):
+        rows = list(delivered_items())
+        model = fit(rows)
+        model.item_ids = {row[-1] for row in rows}
+    else:
+        new_ids = delivered.keys() - learned
+        if not new_ids:
+            return model
+        X, y = training_data(list(delivered_items().filter(id__in=new_ids)))
+        model.add(X, y)
+        # Rows dropped as unusable still count as seen, so they are not refetched every time
+        model.item_ids |= new_ids
+    model.change_seq = max((delivered[pk] for pk in model.item_ids if pk in delivered), default=0)
+    cache.set(ETA_MODEL_CACHE_KEY, model, None)
+    return model
+
+
+def predict_open_items(model=None):
+    """
+    Predicted delivery dates for every open Item.
+
+    An Item already open for longer than its predicted duration is expected
+    today at the earliest, so predictions never fall in the past. Without
+    any delivered Item to learn from there is no prediction, and the
+    ``predicted_*`` values are None.
+    """
+    model = model or get_model()
+    rows = list(
+        Item.objects
+        .filter(delivery_date=NO_DELIVERY_DATE)
+        .exclude(status__in=INACTIVE_STATUSES)
+        .order_by('id')
+        .values_list(*FEATURE_FIELDS, 'id', 'sid', 'expected_delivery')
+    )
+    if not rows:
+        return []
+    if not model.count:
+        return [
+            {'id': row[-3], 'sid': row[-2], 'expected_delivery': row[-1], 'predicted_delivery': None, 'predicted_days': None}
+            for row in rows
+        ]
+    columns = feature_columns([row[:len(FEATURE_FIELDS)] for row in rows])
+    requested = _days(columns['requested_date'])
+    today = _days([timezone.localdate()])[0]
+    predicted = np.maximum(requested + np.rint(model.predict_days(design_matrix(columns))).astype('int64'), today)
+    predicted_dates = predicted.astype('datetime64[D]').tolist()
+    return [
+        {
+            'id': row[-3],
+            'sid': row[-2],
+            'expected_delivery': row[-1],
+            'predicted_delivery': predicted_date,
+            'predicted_days': int(days),
+        }
+        for row, predicted_date, days in zip(rows, predicted_dates, predicted - requested)
+    ]
+
+
+def backtest(folds=5, ridge=None):
+    """
+    Walk-forward evaluation over the delivered Items.
+
+    Items are ordered by delivery date and split into ``folds + 1`` blocks;
+    each block after the first is predicted by a model trained on every
+    earlier block, mirroring how the model is used. Returns one dict per
+    fold with the model's mean absolute error and bias in days, next to the
+    error of the hand-entered ``expected_delivery`` for the same Items.
+    """
+    rows = sorted(
+        delivered_items().values_list(*FEATURE_FIELDS, 'expected_delivery', 'delivery_date', 'id'),
+        key=lambda row: row[-2],
+    )
+    bounds = np.linspace(0, len(rows), folds + 2).astype(int)
+    results = []
+    for start, end in zip(bounds[1:-1], bounds[2:]):
+        test = [row for row in rows[start:end] if row[-2] >= row[0]]
+        if not test:
+            continue
+        model = fit(rows[:start], ridge)
+        X, y = training_data(test)
+        error = model.predict_days(X) - y
+        manual_error = _days([row[-3] for row in test]) - _days([row[-2] for row in test])
+        results.append({
+            'trained_on': model.count,
+            'tested_on': len(y),
+            'mae_days': float(np.mean(np.abs(error))),
+            'bias_days': float(np.mean(error)),
+            'manual_mae_days': float(np.mean(np.abs(manual_error))),
+        })
+    return results
@@ -0,0 +1,257 @@
+"""
+Streaming spreadsheet exports of Items and Forecasts.
+
+Rows are read with ``values_list(...).iterator(chunk_size=...)``, so only
+one chunk of rows is held at a time and related names come from the same
+query. Both formats are written in blocks as the rows arrive, so the
+download starts straight away and memory use does not depend on the
+number of rows.
+
+Column headers match the import sheets (``ingestion.ITEM_COLUMNS`` and
+``FORECAST_COLUMNS``), so an exported workbook can be edited and uploaded
+again.
+"""
+import codecs
+import csv
+import datetime
+import io
+import re
+import zipfile
+from typing import Callable, NamedTuple
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+
+from .calendar_weeks import format_weeks
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+EXCEL_EPOCH = datetime.date(1899, 12, 30)
+ILLEGAL_XML_CHARACTERS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+SHEET_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+SHEET_FOOTER = '</sheetData></worksheet>'
+
+
+def _value(value):
+    return value
+
+
+class ExportColumn(NamedTuple):
+    header: str
+    lookups: tuple
+    formatter: Callable = _value
+
+
+def _column(header, *lookups, formatter=_value):
+    return ExportColumn(header, lookups or (header,), formatter)
+
+
+ITEM_EXPORT_COLUMNS = [
+    _column('sid'),
+    _column('requested_date'),
+    _column('flavour'),
+    _column('estimated_clients'),
+    _column('delivered_clients'),
+    _column('bfs'),
+    _column('t_shirt_size'),
+    _column('system_type'),
+    _column('hardware'),
+    _column('setup'),
+    _column('plo', 'plo__name'),
+    _column('processor1', 'processor1__name'),
+    _column('processor2', 'processor2__name'),
+    _column('status'),
+    _column('landscape'),
+    _column('description'),
+    _column('expected_delivery'),
+    _column('revised_delivery_date'),
+    _column('delivery_date'),
+    _column('delivery_delay_reason'),
+    _column('servicenow'),
+    _column('comments'),
+]
+
+FORECAST_EXPORT_COLUMNS = [
+    _column('sid'),
+    _column('clients'),
+    _column('bfs'),
+    _column('system_description'),
+    _column('time_weeks'),
+    _column('landscape'),
+    _column('frontend'),
+    _column('assigned_to'),
+    _column('requester', 'requester__name'),
+    _column('parallel_processing'),
+    _column('cw_request_plo', 'cw_request_plo', 'cw_request_plo_end', formatter=format_weeks),
+    _column('cw_delivered', 'cw_delivered', 'cw_delivered_end', formatter=format_weeks),
+    _column('comments'),
+]
+
+
+def get_chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def iter_rows(queryset, columns):
+    """Yield one list of cell values per row of ``queryset``, reading it in chunks."""
+    lookups = [lookup for column in columns for lookup in column.lookups]
+    rows = queryset.values_list(*lookups).iterator(chunk_size=get_chunk_size())
+    if all(len(column.lookups) == 1 and column.formatter is _value for column in columns):
+        yield from rows
+        return
+    slices = []
+    position = 0
+    for column in columns:
+        slices.append((column.formatter, position, position + len(column.lookups)))
+        position += len(column.lookups)
+    for values in rows:
+        yield [formatter(*values[start:end]) for formatter, start, end in slices]
+
+
+def stream_csv(rows, header, rows_per_block=1000):
+    """CSV text in blocks of ``rows_per_block`` rows, starting with a BOM so Excel reads it as UTF-8."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write(codecs.BOM_UTF8.decode())
+    writer.writerow(header)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % rows_per_block == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+class _Sink:
+    """Write-only file object collecting what ``zipfile`` writes until it is drained."""
+
+    def __init__(self):
+        self.blocks = []
+
+    def write(self, data):
+        self.blocks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.blocks)
+        self.blocks = []
+        return data
+
+
+def _cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c><v>{value}</v></c>'
+    if isinstance(value, datetime.date):
+        if isinstance(value, datetime.datetime):
+            value = value.date()
+        return f'<c s="1"><v>{(value - EXCEL_EPOCH).days}</v></c>'
+    text = ILLEGAL_XML_CHARACTERS.sub('', str(value))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def _row(values):
+    return '<row>' + ''.join(_cell(value) for value in values) + '</row>'
+
+
+def stream_xlsx(rows, header, title, rows_per_block=1000):
+    """
+    A one-sheet workbook, yielded while it is written.
+
+    openpyxl (even in write-only mode) only produces the archive once the
+    whole sheet is known, so the package is assembled here with ``zipfile``
+    writing to an unseekable sink: the fixed parts first, then the sheet
+    XML in blocks of ``rows_per_block`` rows as they are read. Strings are
+    stored inline and dates use the one date style in ``styles.xml``.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _package_parts(title).items():
+            archive.writestr(name, content)
+        yield sink.drain()
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(SHEET_HEADER.encode() + _row(header).encode())
+            block = []
+            for row in rows:
+                block.append(_row(row))
+                if len(block) == rows_per_block:
+                    sheet.write(''.join(block).encode())
+                    block = []
+                    yield sink.drain()
+            sheet.write((''.join(block) + SHEET_FOOTER).encode())
+    yield sink.drain()
+
+
+def _package_parts(title):
+    return {
+        '[Content_Types].xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '<Override PartName="/xl/styles.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            '</Types>'
+        ),
+        '_rels/.rels': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="xl/workbook.xml" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+            '</Relationships>'
+        ),
+        'xl/workbook.xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(title[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ),
+        'xl/_rels/workbook.xml.rels': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+            '<Relationship Id="rId2" Target="styles.xml" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+            '</Relationships>'
+        ),
+        'xl/styles.xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd"/></numFmts>'
+            '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+            '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+            '<fill><patternFill patternType="gray125"/></fill></fills>'
+            '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+            '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+            '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+            '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+            '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+            '</styleSheet>'
+        ),
+    }
+
+
+def stream_export(queryset, columns, export_format, title):
+    header = [column.header for column in columns]
+    rows = iter_rows(queryset, columns)
+    if export_format == 'csv':
+        return stream_csv(rows, header)
+    return stream_xlsx(rows, header, title)
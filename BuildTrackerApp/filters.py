@@ -0,0 +1,129 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q, Value
+from django.db.models.functions import Coalesce
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+
+from .calendar_weeks import parse_weeks
+
+
+# Sorts after every character, so ``value < prefix + PREFIX_END`` holds for every value starting with ``prefix``
+PREFIX_END = '\U0010ffff'
+
+
+class PrefixSearchFilter(filters.SearchFilter):
+    """
+    ``?search=AB`` keeps the rows where one of the view's ``search_fields``
+    starts with ``AB``; several space separated terms must all match.
+
+    Each prefix is a case-sensitive range, ``>= 'AB' AND < 'AB' || PREFIX_END``,
+    which SQLite answers with a search on the column's index. DRF's ``^``
+    prefix becomes a case-insensitive LIKE, which scans the whole table.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        fields = getattr(view, 'search_fields', None)
+        terms = self.get_search_terms(request)
+        if not fields or not terms:
+            return queryset
+        for term in terms:
+            condition = Q()
+            for name in fields:
+                condition |= Q(**{f'{name}__gte': term, f'{name}__lt': term + PREFIX_END})
+            queryset = queryset.filter(condition)
+        return queryset
+
+
+class FieldFilterBackend(filters.BaseFilterBackend):
+    """
+    Filter on the query parameters declared by the view:
+
+    * ``filter_fields``: exact match, ``?status=Installation``; a comma
+      separated value becomes an IN lookup, ``?status=Installation,REBUILD``.
+    * ``range_filter_fields``: inclusive bounds, ``?expected_delivery__gte=2024-01-01``
+      and ``?expected_delivery__lte=2024-03-31``.
+    * ``calendar_week_filter_fields``: maps a parameter to the first/last
+      columns of a calendar week range and keeps the rows overlapping the
+      given weeks, ``?cw_request=2026-W10..W14``.
+
+    Values are converted with the model field's ``to_python`` so the lookups
+    run in SQL against the column type; invalid values give a 400.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        lookups = {}
+        for name in getattr(view, 'filter_fields', []):
+            if params.get(name):
+                values = [self.to_python(queryset, name, value) for value in params[name].split(',')]
+                if len(values) == 1:
+                    lookups[name] = values[0]
+                else:
+                    lookups[f'{name}__in'] = values
+        for name in getattr(view, 'range_filter_fields', []):
+            for suffix in ('gte', 'lte'):
+                key = f'{name}__{suffix}'
+                if params.get(key):
+                    lookups[key] = self.to_python(queryset, name, params[key])
+        for name, (first, last) in getattr(view, 'calendar_week_filter_fields', {}).items():
+            if params.get(name):
+                try:
+                    start, end = parse_weeks(params[name])
+                except ValueError as e:
+                    raise ValidationError({name: [str(e)]})
+                lookups[f'{first}__lte'] = end
+                lookups[f'{last}__gte'] = start
+        return queryset.filter(**lookups) if lookups else queryset
+
+    def to_python(self, queryset, name, value):
+        field = queryset.model._meta.get_field(name)
+        try:
+            return field.to_python(value.strip())
+        except DjangoValidationError as e:
+            raise ValidationError({name: e.messages})
+
+
+def coalesced(name, sentinel):
+    """``name`` with NULL replaced by ``sentinel``, for ``ordering_expressions``."""
+    return Coalesce(name, Value(sentinel))
+
+
+class StableOrderingFilter(filters.OrderingFilter):
+    """
+    ``?ordering=a,-b`` with the primary key appended as a tie-breaker, so cursor pages are stable.
+
+    The cursor of the next page holds the first ordering column of the last
+    row as read from the instance, and the page starts after it with a
+    ``__gt``/``__lt`` lookup on that column. That fails for a foreign key (the
+    instance gives the related object) and for NULL, so the view's
+    ``ordering_expressions`` map such fields to an expression that is
+    annotated as ``ordering_<field>`` and ordered on instead: the related
+    object's name, or the column coalesced to a value sorting after (or
+    before) every stored one.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        expressions = getattr(view, 'ordering_expressions', {})
+        ordering = [
+            f"{'-' if term.startswith('-') else ''}ordering_{term.lstrip('-')}"
+            if term.lstrip('-') in expressions else term
+            for term in ordering
+        ]
+        if not {'id', '-id', 'pk', '-pk'} & set(ordering):
+            ordering.append('id')
+        return ordering
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if not ordering:
+            return queryset
+        names = {term.lstrip('-') for term in ordering}
+        annotations = {
+            f'ordering_{name}': expression
+            for name, expression in getattr(view, 'ordering_expressions', {}).items()
+            if f'ordering_{name}' in names
+        }
+        return queryset.annotate(**annotations).order_by(*ordering)
@@ -0,0 +1,153 @@
+"""
+Item status history and time-in-stage rollups.
+
+``record_transitions`` appends every status transition to the
+``ItemStatusChange`` log and, when an Item leaves a stage, folds the time it
+spent there into the matching ``StageDwellStat`` row. Reading the summary
+(``stage_dwell_summary``) therefore only touches the small rollup table,
+never the log. Percentiles are estimated from a fixed bucket histogram,
+interpolating within the bucket and clamped to the observed min/max.
+"""
+import bisect
+
+from django.db import transaction
+from django.db.models import Max
+
+from .models import Item, ItemStatusChange, StageDwellStat
+
+# Upper bounds of the dwell time histogram buckets, in hours; the last
+# bucket is open ended.
+DWELL_BUCKET_HOURS = [1, 2, 4, 8, 12, 24, 48, 72, 120, 168, 240, 336, 504, 720, 1080, 1440, 2160]
+
+GROUP_FIELDS = ('flavour', 't_shirt_size', 'hardware')
+PERCENTILES = (50, 90, 95)
+
+
+def _bucket(seconds):
+    return bisect.bisect_left(DWELL_BUCKET_HOURS, seconds / 3600)
+
+
+def _empty_histogram():
+    return [0] * (len(DWELL_BUCKET_HOURS) + 1)
+
+
+def record_transitions(transitions):
+    """Log ``transitions`` and roll completed stages into the dwell statistics."""
+    transitions = sorted(transitions, key=lambda transition: transition.at)
+    item_ids = {transition.item.pk for transition in transitions}
+    entered = dict(
+        ItemStatusChange.objects
+        .filter(item_id__in=item_ids)
+        .values('item_id')
+        .annotate(entered=Max('changed_at'))
+        .values_list('item_id', 'entered')
+    )
+
+    changes = []
+    dwell = {}  # (stage, flavour, t_shirt_size, hardware) -> [seconds, ...]
+    for transition in transitions:
+        item = transition.item
+        changes.append(ItemStatusChange(
+            item_id=item.pk, sid=item.sid,
+            from_status=transition.previous, to_status=transition.current, changed_at=transition.at,
+        ))
+        if transition.previous is not None and item.pk in entered:
+            key = (transition.previous, item.flavour, item.t_shirt_size, item.hardware)
+            seconds = max((transition.at - entered[item.pk]).total_seconds(), 0)
+            dwell.setdefault(key, []).append(seconds)
+        entered[item.pk] = transition.at
+
+    with transaction.atomic():
+        ItemStatusChange.objects.bulk_create(changes)
+        if dwell:
+            _add_dwell(dwell)
+
+
+def _add_dwell(dwell):
+    stats = {
+        (stat.stage, stat.flavour, stat.t_shirt_size, stat.hardware): stat
+        for stat in StageDwellStat.objects.filter(stage__in={key[0] for key in dwell})
+        if (stat.stage, stat.flavour, stat.t_shirt_size, stat.hardware) in dwell
+    }
+    to_create, to_update = [], []
+    for key, samples in dwell.items():
+        stat = stats.get(key)
+        if stat is None:
+            stage, flavour, t_shirt_size, hardware = key
+            stat = StageDwellStat(
+                stage=stage, flavour=flavour, t_shirt_size=t_shirt_size, hardware=hardware,
+                histogram=_empty_histogram(),
+            )
+            to_create.append(stat)
+        else:
+            to_update.append(stat)
+        for seconds in samples:
+            stat.histogram[_bucket(seconds)] += 1
+        stat.count += len(samples)
+        stat.total_seconds += sum(samples)
+        stat.min_seconds = min(samples + ([stat.min_seconds] if stat.min_seconds is not None else []))
+        stat.max_seconds = max(samples + ([stat.max_seconds] if stat.max_seconds is not None else []))
+    StageDwellStat.objects.bulk_create(to_create)
+    StageDwellStat.objects.bulk_update(
+        to_update, ['count', 'total_seconds', 'min_seconds', 'max_seconds', 'histogram'],
+    )
+
+
+def _percentile(histogram, count, low, high, percentile):
+    """Estimate a percentile in hours from bucket counts."""
+    rank = count * percentile / 100
+    seen = 0
+    for index, bucket_count in enumerate(histogram):
+        if bucket_count and seen + bucket_count >= rank:
+            lower = DWELL_BUCKET_HOURS[index - 1] if index else 0
+            upper = DWELL_BUCKET_HOURS[index] if index < len(DWELL_BUCKET_HOURS) else high
+            estimate = lower + (upper - lower) * (rank - seen) / bucket_count
+            return round(min(max(estimate, low), high), 2)
+        seen += bucket_count
+    return round(high, 2)
+
+
+def stage_dwell_summary(group_by=()):
+    """
+    Dwell time per stage, optionally split by any of ``GROUP_FIELDS``.
+
+    Returns a list of dicts with the group values, ``count``, ``mean_hours``,
+    ``min_hours``, ``max_hours`` and ``p50_hours``/``p90_hours``/``p95_hours``,
+    in pipeline order.
+    """
+    stage_order = {value: index for index, (value, _label) in enumerate(Item.STATUS_CHOICES)}
+    groups = {}
+    for stat in StageDwellStat.objects.all():
+        key = (stat.stage,) + tuple(getattr(stat, field) for field in group_by)
+        group = groups.setdefault(key, {
+            'count': 0, 'total_seconds': 0, 'min_seconds': None, 'max_seconds': None,
+            'histogram': _empty_histogram(),
+        })
+        group['count'] += stat.count
+        group['total_seconds'] += stat.total_seconds
+        group['histogram'] = [a + b for a, b in zip(group['histogram'], stat.histogram)]
+        if stat.min_seconds is None:
+            continue  # no completed stay yet
+        if group['min_seconds'] is None:
+            group['min_seconds'], group['max_seconds'] = stat.min_seconds, stat.max_seconds
+        else:
+            group['min_seconds'] = min(group['min_seconds'], stat.min_seconds)
+            group['max_seconds'] = max(group['max_seconds'], stat.max_seconds)
+
+    summary = []
+    for key in sorted(groups, key=lambda key: (stage_order.get(key[0], len(stage_order)),) + key[1:]):
+        group = groups[key]
+        if not group['count']:
+            continue
+        low, high = group['min_seconds'] / 3600, group['max_seconds'] / 3600
+        row = {'stage': key[0], **dict(zip(group_by, key[1:]))}
+        row.update({
+            'count': group['count'],
+            'mean_hours': round(group['total_seconds'] / group['count'] / 3600, 2),
+            'min_hours': round(low, 2),
+            'max_hours': round(high, 2),
+        })
+        for percentile in PERCENTILES:
+            row[f'p{percentile}_hours'] = _percentile(group['histogram'], group['count'], low, high, percentile)
+        summary.append(row)
+    return summary
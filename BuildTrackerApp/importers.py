@@ -0,0 +1,271 @@
+import logging
+
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import ingestion
+from .models import Item, Forecast
+from .references import plos, processors
+from .signals import StatusTransition, items_bulk_changed, status_transitioned
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+
+IMPORT_MODES = ('insert', 'upsert')
+
+# Model fields populated straight from the normalised frame.
+ITEM_VALUE_FIELDS = [
+    'requested_date', 'flavour', 'estimated_clients', 'delivered_clients', 'bfs',
+    't_shirt_size', 'system_type', 'hardware', 'setup', 'status', 'landscape',
+    'description', 'expected_delivery', 'revised_delivery_date', 'delivery_date',
+    'delivery_delay_reason', 'servicenow', 'comments',
+]
+FORECAST_VALUE_FIELDS = [
+    'sid', 'clients', 'bfs', 'system_description', 'time_weeks', 'landscape',
+    'frontend', 'assigned_to', 'parallel_processing', 'cw_request_plo',
+    'cw_request_plo_end', 'cw_delivered', 'cw_delivered_end', 'comments',
+]
+
+
+class ImportFileError(Exception):
+    """Raised when the uploaded sheet as a whole cannot be imported."""
+
+
+class ImportReport:
+    """Collects the outcome of an import, with errors keyed by spreadsheet row."""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = []
+        # Spreadsheet row of the last row in a committed batch, None until one commits
+        self.committed_through = None
+
+    def add_errors(self, row_errors, sids):
+        for index in sorted(row_errors):
+            self.errors.append({
+                'row': index + 2,  # 1-based, plus the header row
+                'sid': sids.get(index, ''),
+                'errors': row_errors[index],
+            })
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'errors': self.errors,
+        }
+
+
+def get_batch_size(batch_size=None):
+    return int(batch_size or getattr(settings, 'IMPORT_BATCH_SIZE', DEFAULT_BATCH_SIZE))
+
+
+def _flag(row_errors, mask, message):
+    """Attach ``message`` to every row where ``mask`` is True."""
+    for index in mask[mask].index:
+        row_errors.setdefault(index, []).append(message)
+
+
+def _ids(names, mapping):
+    """Map a column of names to ids; blank names map to None."""
+    return pd.Series([mapping.get(name) if name else None for name in names], index=names.index, dtype=object)
+
+
+def _same(stored, value):
+    """
+    True when a sheet value matches the stored one. Blank nullable text is
+    None from the sheet but '' when it was saved through the API, and
+    rewriting one as the other would be a change of nothing.
+    """
+    return stored == value or (stored in ('', None) and value in ('', None))
+
+
+def _normalise(df, columns):
+    missing = ingestion.missing_columns(df, columns)
+    if missing:
+        raise ImportFileError(f"Missing columns: {', '.join(missing)}")
+    frame, errors = ingestion.normalise(df, columns)
+    return frame, ingestion.describe_errors(df, errors, columns)
+
+
+def _run_batches(importer, frames, progress=None):
+    """
+    Feed ``frames`` (one DataFrame or an iterable of batches) to ``importer``.
+
+    Without ``progress`` the whole import runs in a single transaction. With
+    it, every batch is committed on its own and ``progress(report)`` is
+    called afterwards, so other connections can follow a long import; a
+    failure then keeps the batches already committed, up to the sheet row
+    in ``report.committed_through``.
+    """
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
+    if progress is None:
+        with transaction.atomic():
+            last_row = None
+            for df in frames:
+                importer.import_batch(df)
+                last_row = _last_row(df, last_row)
+        importer.report.committed_through = last_row
+        return
+    for df in frames:
+        with transaction.atomic():
+            importer.import_batch(df)
+        importer.report.committed_through = _last_row(df, importer.report.committed_through)
+        progress(importer.report)
+
+
+def _last_row(df, default):
+    return int(df.index[-1]) + 2 if len(df) else default
+
+
+class ItemImporter:
+    """
+    Validates Item sheets batch by batch and writes every valid row in bulk.
+
+    In ``insert`` mode a sid that already exists is reported as an error. In
+    ``upsert`` mode the existing Items of each batch are loaded with one
+    query keyed on sid and the rows are split into creates (``bulk_create``),
+    updates (``bulk_update`` restricted to the columns that actually changed)
+    and unchanged rows.
+
+    Foreign keys are resolved from the cached PLO and Processor tables
+    (references.py), so the number of queries grows with the number of
+    batches, not rows. Invalid
+    rows are skipped and reported instead of aborting the whole upload.
+    """
+
+    def __init__(self, mode='insert', batch_size=None):
+        if mode not in IMPORT_MODES:
+            raise ImportFileError(f"Unknown import mode '{mode}'.")
+        self.mode = mode
+        self.batch_size = get_batch_size(batch_size)
+        self.report = ImportReport()
+        self.seen_sids = set()
+        self.processor_mapping = processors.get().ids
+        self.plo_mapping = plos.get().ids
+
+    def run(self, frames, progress=None):
+        """Import one DataFrame or an iterable of DataFrame batches; see ``_run_batches``."""
+        _run_batches(self, frames, progress)
+        logger.info(
+            "Imported items (%s): %d created, %d updated, %d unchanged, %d rejected",
+            self.mode, self.report.created, self.report.updated, self.report.unchanged, len(self.report.errors),
+        )
+        return self.report
+
+    def import_batch(self, df):
+        frame, row_errors = _normalise(df, ingestion.ITEM_COLUMNS)
+        self.report.rows += len(frame)
+
+        sid = frame['sid']
+        _flag(row_errors, (sid != '') & (sid.duplicated() | sid.isin(self.seen_sids)), "Duplicate sid in file.")
+        _flag(row_errors, sid.isin(Item.RESERVED_SIDS), "This sid is reserved.")
+        incoming_sids = set(sid) - {''}
+        self.seen_sids |= incoming_sids
+        if self.mode == 'upsert':
+            existing = {item.sid: item for item in Item.objects.filter(sid__in=incoming_sids)}
+        else:
+            existing = set(Item.objects.filter(sid__in=incoming_sids).values_list('sid', flat=True))
+            _flag(row_errors, sid.isin(existing), "An item with this sid already exists.")
+
+        frame['plo_id'] = _ids(frame['plo'], self.plo_mapping)
+        _flag(row_errors, (frame['plo'] != '') & frame['plo_id'].isna(), "Unknown PLO.")
+        frame['processor1_id'] = _ids(frame['processor1'], self.processor_mapping)
+        _flag(row_errors, (frame['processor1'] != '') & frame['processor1_id'].isna(), "Unknown processor1.")
+        frame['processor2_id'] = _ids(frame['processor2'], self.processor_mapping)
+        _flag(row_errors, (frame['processor2'] != '') & frame['processor2_id'].isna(), "Unknown processor2.")
+
+        self.report.add_errors(row_errors, sid.to_dict())
+
+        to_create = []
+        to_update = {}  # changed field names -> items sharing exactly that change set
+        transitions = []
+        now = timezone.now()
+        fields = ITEM_VALUE_FIELDS + ['plo_id', 'processor1_id', 'processor2_id']
+        valid = frame[~frame.index.isin(list(row_errors))]
+        for sid_value, values in zip(valid['sid'], valid[fields].to_dict('records')):
+            item = existing.get(sid_value) if self.mode == 'upsert' else None
+            if item is None:
+                to_create.append(Item(sid=sid_value, **values))
+                continue
+
+            changed = tuple(name for name, value in values.items() if not _same(getattr(item, name), value))
+            if not changed:
+                self.report.unchanged += 1
+                continue
+            if 'status' in changed:
+                transitions.append(StatusTransition(item, item.status, values['status'], now))
+            for name in changed:
+                setattr(item, name, values[name])
+            to_update.setdefault(changed, []).append(item)
+
+        Item.objects.bulk_create(to_create, batch_size=self.batch_size)
+        for changed, items in to_update.items():
+            update_fields = [Item._meta.get_field(name).name for name in changed]
+            Item.objects.bulk_update(items, update_fields, batch_size=self.batch_size)
+        self.report.created += len(to_create)
+        self.report.updated += sum(len(items) for items in to_update.values())
+        if to_create or to_update:
+            items_bulk_changed.send(sender=Item)
+        transitions += [StatusTransition(item, None, item.status, now) for item in to_create]
+        if transitions:
+            status_transitioned.send(sender=Item, transitions=transitions)
+
+
+class ForecastImporter:
+    """
+    Validates Forecast sheets batch by batch and inserts every valid row with
+    ``bulk_create``.
+
+    Each row is linked to the Item with the same sid and ``requester`` is
+    resolved by PLO name, using one sid lookup per batch and a PLO map loaded
+    once per import.
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = get_batch_size(batch_size)
+        self.report = ImportReport()
+        self.plo_mapping = plos.get().ids
+
+    def run(self, frames, progress=None):
+        """Import one DataFrame or an iterable of DataFrame batches; see ``_run_batches``."""
+        _run_batches(self, frames, progress)
+        logger.info("Imported %d forecasts, rejected %d rows", self.report.created, len(self.report.errors))
+        return self.report
+
+    def import_batch(self, df):
+        frame, row_errors = _normalise(df, ingestion.FORECAST_COLUMNS)
+        self.report.rows += len(frame)
+
+        sid = frame['sid']
+        item_mapping = dict(Item.objects.filter(sid__in=set(sid) - {''}).values_list('sid', 'id'))
+        frame['item_id'] = _ids(sid, item_mapping)
+        _flag(row_errors, (sid != '') & frame['item_id'].isna(), "No item with this sid exists.")
+
+        frame['requester_id'] = _ids(frame['requester'], self.plo_mapping)
+        _flag(row_errors, (frame['requester'] != '') & frame['requester_id'].isna(), "Unknown requester.")
+
+        self.report.add_errors(row_errors, sid.to_dict())
+
+        fields = FORECAST_VALUE_FIELDS + ['item_id', 'requester_id']
+        valid = frame[~frame.index.isin(list(row_errors))]
+        forecasts = [Forecast(**values) for values in valid[fields].to_dict('records')]
+        Forecast.objects.bulk_create(forecasts, batch_size=self.batch_size)
+        self.report.created += len(forecasts)
+
+
+def import_items(frames, mode='insert', batch_size=None):
+    return ItemImporter(mode=mode, batch_size=batch_size).run(frames)
+
+
+def import_forecasts(frames, batch_size=None):
+    return ForecastImporter(batch_size=batch_size).run(frames)
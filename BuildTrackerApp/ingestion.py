@@ -0,0 +1,264 @@
+"""
+Column-wise normalisation of uploaded spreadsheets.
+
+Every column of a sheet is described by a ``Column`` and converted in one
+vectorized pass: dates with a single ``pd.to_datetime`` call per column,
+numbers with ``pd.to_numeric`` and choice columns with a membership test
+against the model's ``*_CHOICES``. Calendar week cells are parsed once per
+distinct value and fill two columns, ``<name>`` and ``<name>_end``. ``normalise`` returns the typed frame,
+holding plain Python values ready to be passed to a model constructor,
+together with a boolean mask marking the cells that failed validation.
+
+Large workbooks are read with ``iter_batches``, which streams rows from
+openpyxl's read-only mode in fixed-size DataFrames so memory use does not
+depend on the size of the sheet.
+"""
+import datetime
+from itertools import islice
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from .calendar_weeks import current_year, parse_weeks
+from .models import Item, Forecast
+
+TEXT = 'text'
+DATE = 'date'
+INTEGER = 'integer'
+BOOLEAN = 'boolean'
+CHOICE = 'choice'
+WEEKS = 'weeks'
+
+TRUE_VALUES = {'true', 'yes', 'y', '1', 'x'}
+FALSE_VALUES = {'false', 'no', 'n', '0', ''}
+# The range of the models' IntegerFields
+INTEGER_MIN, INTEGER_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+class Column:
+    def __init__(self, name, kind=TEXT, required=False, null=False, choices=None, max_length=None, default=None):
+        self.name = name
+        self.kind = kind
+        self.required = required
+        self.null = null  # store None rather than '' for blank text cells
+        self.choices = [value for value, _label in choices] if choices else None
+        self.max_length = max_length
+        self.default = default
+
+    def describe_error(self, missing):
+        if missing:
+            return f"{self.name} is required."
+        if self.kind == CHOICE:
+            return f"{self.name} must be one of: {', '.join(self.choices)}."
+        if self.kind == WEEKS:
+            return f"Invalid {self.name} (expected a calendar week such as 10, 2026-W10 or 10-14)."
+        if self.max_length is not None and self.kind == TEXT:
+            return f"Invalid {self.name} (at most {self.max_length} characters)."
+        return f"Invalid {self.name}."
+
+
+ITEM_COLUMNS = [
+    Column('sid', required=True, max_length=3),
+    Column('requested_date', DATE, required=True),
+    Column('flavour', CHOICE, required=True, choices=Item.FLAVOUR_CHOICES),
+    Column('estimated_clients', INTEGER, required=True),
+    Column('delivered_clients', INTEGER, null=True),
+    Column('bfs', CHOICE, required=True, choices=Item.BFS_CHOICES),
+    Column('t_shirt_size', CHOICE, required=True, choices=Item.TSHIRT_SIZE_CHOICES),
+    Column('system_type', required=True, max_length=300),
+    Column('hardware', CHOICE, required=True, choices=Item.HARDWARE_CHOICES),
+    Column('setup', required=True, max_length=100),
+    Column('plo', required=True),
+    Column('processor1', required=True),
+    Column('processor2'),
+    Column('status', CHOICE, required=True, choices=Item.STATUS_CHOICES),
+    Column('landscape', required=True, max_length=300),
+    Column('description', required=True, max_length=500),
+    Column('expected_delivery', DATE, required=True),
+    Column('revised_delivery_date', DATE, null=True),
+    Column('delivery_date', DATE, default=Item._meta.get_field('delivery_date').default),
+    Column('delivery_delay_reason', null=True, max_length=500),
+    Column('servicenow', max_length=800),
+    Column('comments', null=True, max_length=400),
+]
+
+FORECAST_COLUMNS = [
+    Column('sid', required=True, max_length=3),
+    Column('clients', INTEGER, null=True, default=0),
+    Column('bfs', CHOICE, required=True, choices=Item.BFS_CHOICES),
+    Column('system_description', max_length=300),
+    Column('time_weeks', INTEGER, null=True),
+    Column('landscape', max_length=300),
+    Column('frontend', max_length=100),
+    Column('assigned_to', CHOICE, required=True, choices=Forecast.ASSIGNED_TO_CHOICES),
+    Column('requester'),
+    Column('parallel_processing', BOOLEAN, default=False),
+    Column('cw_request_plo', WEEKS),
+    Column('cw_delivered', WEEKS),
+    Column('comments', null=True, max_length=400),
+]
+
+
+def missing_columns(df, columns):
+    return [column.name for column in columns if column.required and column.name not in df.columns]
+
+
+def _objects(values, valid):
+    """Object series holding ``values`` where ``valid`` and None elsewhere."""
+    return pd.Series(np.where(valid, values, None), index=valid.index, dtype=object)
+
+
+def _text(raw):
+    return raw.where(raw.notna(), '').astype(str).str.strip()
+
+
+def _normalise_column(raw, column):
+    """Return ``(values, blank, invalid)`` for one raw column."""
+    if column.kind == DATE:
+        blank = raw.isna() | (_text(raw) == '')
+        # Excel cells arrive as datetimes and are used as they are (pandas cannot
+        # hold years past 2262, such as the 9999-12-31 delivery date default);
+        # hand-typed ones are DD/MM/YYYY strings.
+        # (NaT is a datetime too, so empty cells of datetime64 columns must be excluded)
+        native = raw.notna() & raw.map(lambda value: isinstance(value, datetime.date)).astype(bool)
+        parsed = pd.to_datetime(raw.where(~blank & ~native), format='%d/%m/%Y', errors='coerce')
+        values = _objects(parsed.dt.date, parsed.notna())
+        values[native] = [value.date() if isinstance(value, datetime.datetime) else value for value in raw[native]]
+        invalid = ~blank & ~native & parsed.isna()
+        return values, blank, invalid
+
+    if column.kind == INTEGER:
+        blank = raw.isna() | (_text(raw) == '')
+        numbers = pd.to_numeric(raw.where(~blank), errors='coerce')
+        whole = (
+            numbers.notna() & np.isfinite(numbers) & (numbers % 1 == 0)
+            & numbers.between(INTEGER_MIN, INTEGER_MAX)
+        )
+        invalid = ~blank & ~whole
+        return _objects(numbers.where(whole, 0).astype('int64').astype(object), whole), blank, invalid
+
+    if column.kind == WEEKS:
+        blank = raw.isna() | (_text(raw) == '')
+        year = current_year()
+        parsed = {}
+        for value in raw[~blank].unique():
+            try:
+                parsed[value] = parse_weeks(value, year)
+            except ValueError:
+                parsed[value] = None
+        ranges = raw.map(parsed).where(~blank, None)
+        invalid = ~blank & ranges.isna()
+        return _objects(ranges, ranges.notna()), blank, invalid
+
+    if column.kind == BOOLEAN:
+        lowered = _text(raw).str.lower()
+        blank = lowered == ''
+        truthy = lowered.isin(TRUE_VALUES)
+        invalid = ~truthy & ~lowered.isin(FALSE_VALUES)
+        return _objects(truthy, ~blank & ~invalid), blank, invalid
+
+    text = _text(raw)
+    blank = text == ''
+    if column.kind == CHOICE:
+        # Case-insensitive match, stored with the model's canonical spelling.
+        canonical = {choice.lower(): choice for choice in column.choices}
+        matched = text.str.lower().map(canonical)
+        invalid = ~blank & matched.isna()
+        return _objects(matched, matched.notna()), blank, invalid
+
+    invalid = text.str.len() > column.max_length if column.max_length else pd.Series(False, index=raw.index)
+    values = _objects(text, ~blank) if column.null else text
+    return values, blank, invalid
+
+
+def normalise(df, columns):
+    """
+    Normalise ``df`` according to ``columns``.
+
+    Returns ``(frame, errors)``: ``frame`` holds one typed column per
+    ``Column``, two for calendar weeks (missing optional columns are filled
+    with their default), and
+    ``errors`` is a boolean frame of the same shape that is True wherever a
+    cell is invalid or a required cell is blank. Both keep ``df``'s index.
+    """
+    frame = pd.DataFrame(index=df.index)
+    errors = pd.DataFrame(False, index=df.index, columns=[column.name for column in columns])
+    for column in columns:
+        if column.name in df.columns:
+            raw = df[column.name]
+        else:
+            raw = pd.Series(None, index=df.index, dtype=object)
+        values, blank, invalid = _normalise_column(raw, column)
+        if column.default is not None:
+            values = values.where(~blank, column.default)
+        if column.kind == WEEKS:
+            for position, name in enumerate((column.name, f'{column.name}_end')):
+                frame[name] = pd.Series([weeks and weeks[position] for weeks in values], index=df.index, dtype=object)
+        else:
+            frame[column.name] = values
+        errors[column.name] = invalid | (blank & column.required)
+    return frame, errors
+
+
+def describe_errors(df, errors, columns):
+    """Turn an error mask into ``{row index: [message, ...]}``."""
+    row_errors = {}
+    for column in columns:
+        mask = errors[column.name]
+        if not mask.any():
+            continue
+        raw = df[column.name] if column.name in df.columns else pd.Series(None, index=df.index, dtype=object)
+        missing = raw.isna() | (_text(raw) == '')
+        for index in mask[mask].index:
+            row_errors.setdefault(index, []).append(column.describe_error(missing[index]))
+    return row_errors
+
+
+def iter_batches(file, extension, batch_size):
+    """
+    Yield the first sheet of an uploaded workbook as DataFrames of at most
+    ``batch_size`` rows, indexed by data row position (0 is the row below
+    the header).
+
+    ``.xlsx`` files are streamed with openpyxl in read-only mode, so only
+    one batch is held in memory at a time. The legacy ``.xls`` format has no
+    streaming reader and is loaded whole before being split into batches.
+    """
+    if hasattr(file, 'temporary_file_path'):
+        # Uploads spooled to disk by TemporaryFileUploadHandler are read in place.
+        file = file.temporary_file_path()
+    if extension == 'xls':
+        df = pd.read_excel(file, engine='xlrd', dtype={'sid': str})
+        for start in range(0, len(df), batch_size):
+            yield df.iloc[start:start + batch_size]
+        if df.empty:
+            yield df
+        return
+
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(name).strip() if name is not None else '' for name in header]
+        padding = (None,) * len(columns)
+        position = 0
+        empty = True
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                break
+            # Blank rows are skipped but still counted, so the index keeps matching the sheet.
+            index = [position + offset for offset, row in enumerate(chunk) if any(cell is not None for cell in row)]
+            # Sheets without size information come back with trailing empty cells cut off
+            records = [(chunk[i - position] + padding)[:len(columns)] for i in index]
+            position += len(chunk)
+            if records:
+                empty = False
+                yield pd.DataFrame.from_records(records, columns=columns, index=index)
+        if empty:
+            yield pd.DataFrame(columns=columns)
+    finally:
+        workbook.close()
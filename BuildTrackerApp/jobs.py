@@ -0,0 +1,164 @@
+"""
+Background processing of Excel uploads.
+
+The upload endpoints store the file and queue an ``ImportJob`` row; the
+``run_import_jobs`` management command drains the queue. Jobs are claimed
+with a conditional UPDATE, so several workers can share one SQLite
+database without an external broker. Progress is written after every
+committed batch and served by ``ImportJobDetailView``.
+
+Each batch commits on its own, so a job that fails halfway keeps the rows
+before the failing batch; its message names the sheet rows that landed. A
+running job whose worker died stops updating ``heartbeat_at`` and is queued
+again once it is IMPORT_JOB_TIMEOUT seconds old, until IMPORT_JOB_MAX_ATTEMPTS
+runs have been tried (an insert-mode Items job then reports the rows its
+first run committed as existing sids).
+"""
+import datetime
+import logging
+import time
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .importers import IMPORT_MODES, ForecastImporter, ImportFileError, ItemImporter
+from .ingestion import iter_batches
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+MAX_STORED_ERRORS = 1000
+
+
+def enqueue_import(kind, uploaded_file, mode='insert'):
+    """Store ``uploaded_file`` and queue it for import. Runs it immediately when IMPORT_JOBS_EAGER is set."""
+    if kind == ImportJob.ITEMS and mode not in IMPORT_MODES:
+        raise ImportFileError(f"Unknown import mode '{mode}'.")
+    job = ImportJob(kind=kind, mode=mode, file_name=uploaded_file.name)
+    job.file.save(uploaded_file.name, uploaded_file, save=False)
+    job.save()
+    logger.info("Queued %s", job)
+
+    if getattr(settings, 'IMPORT_JOBS_EAGER', False) and claim_job(job):
+        run_job(job)
+    return job
+
+
+def claim_job(job):
+    """Atomically move ``job`` from queued to running; False if another worker got it first."""
+    started_at = timezone.now()
+    claimed = ImportJob.objects.filter(pk=job.pk, status=ImportJob.QUEUED).update(
+        status=ImportJob.RUNNING, started_at=started_at, heartbeat_at=started_at, attempts=F('attempts') + 1,
+    )
+    if claimed:
+        job.status = ImportJob.RUNNING
+        job.started_at = job.heartbeat_at = started_at
+        job.attempts += 1
+    return bool(claimed)
+
+
+def requeue_stale_jobs():
+    """
+    Queue again the running jobs whose worker has not reported progress for
+    IMPORT_JOB_TIMEOUT seconds, or fail them after IMPORT_JOB_MAX_ATTEMPTS
+    runs; returns the number of jobs requeued and failed.
+    """
+    now = timezone.now()
+    stale = ImportJob.objects.filter(
+        status=ImportJob.RUNNING,
+        heartbeat_at__lt=now - datetime.timedelta(seconds=getattr(settings, 'IMPORT_JOB_TIMEOUT', 3600)),
+    )
+    max_attempts = getattr(settings, 'IMPORT_JOB_MAX_ATTEMPTS', 3)
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status=ImportJob.FAILED, finished_at=now,
+        message=f"The import worker stopped responding {max_attempts} times; upload the file again.",
+    )
+    requeued = stale.filter(attempts__lt=max_attempts).update(status=ImportJob.QUEUED)
+    if requeued or failed:
+        logger.warning("Requeued %d and failed %d stale import job(s)", requeued, failed)
+    return requeued, failed
+
+
+def claim_next_job():
+    while True:
+        job = ImportJob.objects.filter(status=ImportJob.QUEUED).order_by('id').first()
+        if job is None:
+            return None
+        if claim_job(job):
+            return job
+
+
+def _save_progress(job, report):
+    job.rows_processed = report.rows
+    job.created_count = report.created
+    job.updated_count = report.updated
+    job.unchanged_count = report.unchanged
+    job.error_count = len(report.errors)
+    job.heartbeat_at = timezone.now()
+    ImportJob.objects.filter(pk=job.pk).update(
+        rows_processed=job.rows_processed,
+        created_count=job.created_count,
+        updated_count=job.updated_count,
+        unchanged_count=job.unchanged_count,
+        error_count=job.error_count,
+        heartbeat_at=job.heartbeat_at,
+    )
+
+
+def _fail(job, message, report):
+    """Mark ``job`` failed, naming the sheet rows (and their errors) committed before the failure."""
+    committed_through = report.committed_through if report else None
+    if committed_through is None:
+        note = "; no rows were imported."
+        job.errors = []
+    else:
+        note = f"; rows 2-{committed_through} were imported before the failure."
+        job.errors = [error for error in report.errors if error['row'] <= committed_through][:MAX_STORED_ERRORS]
+    job.status = ImportJob.FAILED
+    job.message = message[:500 - len(note)] + note
+
+
+def run_job(job):
+    """Import a claimed job's file, committing and recording progress batch by batch."""
+    extension = job.file_name.split('.')[-1].lower()
+    importer = None
+    try:
+        if job.kind == ImportJob.ITEMS:
+            importer = ItemImporter(mode=job.mode)
+        else:
+            importer = ForecastImporter()
+        batches = iter_batches(job.file.path, extension, importer.batch_size)
+        report = importer.run(batches, progress=lambda report: _save_progress(job, report))
+        _save_progress(job, report)
+        job.errors = report.errors[:MAX_STORED_ERRORS]
+        job.status = ImportJob.SUCCEEDED
+    except ImportFileError as e:
+        _fail(job, str(e), importer and importer.report)
+    except Exception as e:
+        logger.exception("Import job %s failed", job.pk)
+        _fail(job, f"Failed to import data: {e}", importer and importer.report)
+    job.finished_at = timezone.now()
+    job.file.delete(save=False)
+    job.save()
+    logger.info("Finished %s", job)
+    return job
+
+
+def run_pending_jobs(max_jobs=None):
+    """Run queued jobs until the queue is empty or ``max_jobs`` have run; returns the count."""
+    requeue_stale_jobs()
+    count = 0
+    while max_jobs is None or count < max_jobs:
+        job = claim_next_job()
+        if job is None:
+            break
+        run_job(job)
+        count += 1
+    return count
+
+
+def work_forever(poll_interval=2.0):
+    while True:
+        if not run_pending_jobs():
+            time.sleep(poll_interval)
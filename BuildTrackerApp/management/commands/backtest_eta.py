@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from BuildTrackerApp.eta import backtest
+
+
+class Command(BaseCommand):
+    help = "Measure delivery date prediction accuracy with a walk-forward backtest over delivered items."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--folds', type=int, default=5, help="Number of test blocks.")
+        parser.add_argument('--ridge', type=float, default=None, help="Regularisation strength (default ETA_RIDGE).")
+
+    def handle(self, *args, **options):
+        results = backtest(folds=options['folds'], ridge=options['ridge'])
+        if not results:
+            self.stdout.write("Not enough delivered items to backtest.")
+            return
+        self.stdout.write(f"{'fold':>4} {'train':>6} {'test':>5} {'MAE':>7} {'bias':>7} {'manual MAE':>10}")
+        for number, result in enumerate(results, 1):
+            self.stdout.write(
+                f"{number:>4} {result['trained_on']:>6} {result['tested_on']:>5} "
+                f"{result['mae_days']:>7.1f} {result['bias_days']:>+7.1f} {result['manual_mae_days']:>10.1f}"
+            )
+        tested = sum(result['tested_on'] for result in results)
+        mae = sum(result['mae_days'] * result['tested_on'] for result in results) / tested
+        manual = sum(result['manual_mae_days'] * result['tested_on'] for result in results) / tested
+        self.stdout.write(f"Overall MAE {mae:.1f} days over {tested} items (hand-entered estimates: {manual:.1f} days).")
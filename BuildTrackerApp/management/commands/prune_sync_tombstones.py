@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from BuildTrackerApp.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = "Delete old sync tombstones. Clients whose token predates them get a full resync."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help="Keep tombstones this many days (default SYNC_TOMBSTONE_RETENTION_DAYS).")
+
+    def handle(self, *args, **options):
+        count = prune_tombstones(days=options['days'])
+        self.stdout.write(f"Pruned {count} tombstone(s).")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from BuildTrackerApp.replica import refresh_replica, work_forever
+
+
+class Command(BaseCommand):
+    help = "Copy the primary database into the read replica. Runs until stopped unless --once is given."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Refresh the replica once and exit.")
+        parser.add_argument('--interval', type=float, default=None,
+                            help="Seconds between refreshes (default REPLICA_REFRESH_INTERVAL).")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            try:
+                elapsed = refresh_replica()
+            except ValueError as e:
+                raise CommandError(e)
+            self.stdout.write(f"Refreshed the replica in {elapsed:.2f}s.")
+            return
+        self.stdout.write("Refreshing the replica...")
+        work_forever(interval=options['interval'])
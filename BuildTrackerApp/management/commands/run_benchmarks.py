@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment
+
+from BuildTrackerApp.benchmark import default_output_path, run, save
+
+
+class Command(BaseCommand):
+    help = "Benchmark every API route against the stored data and save the results as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help="Timed requests per route.")
+        parser.add_argument('--only', nargs='*', default=None,
+                            help="Only run cases whose name contains one of these words, e.g. item export.")
+        parser.add_argument('--upload-rows', type=int, default=200,
+                            help="Rows in the benchmarked upload files, 0 to skip the uploads.")
+        parser.add_argument('--output', default=None, help="JSON file to write (default benchmarks/<time>.json).")
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1.")
+        setup_test_environment()
+
+        self.stdout.write(f"{'case':<28} {'status':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+                          f"{'p99 ms':>8} {'queries':>7} {'peak KB':>9}")
+
+        def progress(result):
+            latency = result['latency_ms']
+            self.stdout.write(
+                f"{result['name']:<28} {result['status']:>6} {result['throughput_rps']:>8.1f} "
+                f"{latency['p50']:>8.1f} {latency['p95']:>8.1f} {latency['p99']:>8.1f} "
+                f"{result['queries']:>7} {result['peak_memory_kb']:>9.0f}"
+            )
+
+        try:
+            report = run(repeat=options['repeat'], only=options['only'],
+                         upload_rows=options['upload_rows'], progress=progress)
+        except ValueError as e:
+            raise CommandError(e)
+        output = options['output'] or default_output_path(settings.BASE_DIR)
+        save(report, output)
+        self.stdout.write(f"Saved {output}.")
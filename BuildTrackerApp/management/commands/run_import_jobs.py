@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from BuildTrackerApp.jobs import run_pending_jobs, work_forever
+
+
+class Command(BaseCommand):
+    help = "Process queued Excel import jobs. Runs until stopped unless --once is given."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the queue once and exit.")
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help="Seconds to wait between polls when the queue is empty.")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            count = run_pending_jobs()
+            self.stdout.write(f"Processed {count} import job(s).")
+            return
+        self.stdout.write("Waiting for import jobs...")
+        work_forever(poll_interval=options['poll_interval'])
@@ -0,0 +1,47 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from BuildTrackerApp.synthetic import seed, write_forecast_sheet, write_item_sheet
+
+
+class Command(BaseCommand):
+    help = "Insert a synthetic data set of PLOs, Processors, Items and Forecasts, and optionally upload files."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--plos', type=int, default=20)
+        parser.add_argument('--processors', type=int, default=30)
+        parser.add_argument('--items', type=int, default=5000, help="At most 46656, the number of 3-character SIDs.")
+        parser.add_argument('--forecasts', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0, help="Random seed; the same seed gives the same data.")
+        parser.add_argument('--excel-dir', default=None,
+                            help="Also write items.xlsx and forecasts.xlsx upload files to this directory.")
+        parser.add_argument('--excel-rows', type=int, default=500, help="Rows per upload file.")
+
+    def handle(self, *args, **options):
+        if min(options['plos'], options['processors']) < 1 and options['items']:
+            raise CommandError("Items need at least one PLO and one Processor.")
+        try:
+            plos, processors, items, forecasts = seed(
+                plos=options['plos'],
+                processors=options['processors'],
+                items=options['items'],
+                forecasts=options['forecasts'],
+                random_seed=options['seed'],
+            )
+        except ValueError as e:
+            raise CommandError(e)
+        self.stdout.write(
+            f"Created {len(plos)} PLO(s), {len(processors)} Processor(s), "
+            f"{len(items)} Item(s) and {len(forecasts)} Forecast(s)."
+        )
+
+        if options['excel_dir']:
+            os.makedirs(options['excel_dir'], exist_ok=True)
+            for name, writer in (('items.xlsx', write_item_sheet), ('forecasts.xlsx', write_forecast_sheet)):
+                path = os.path.join(options['excel_dir'], name)
+                try:
+                    writer(path, options['excel_rows'], random_seed=options['seed'])
+                except ValueError as e:
+                    raise CommandError(e)
+                self.stdout.write(f"Wrote {path}.")
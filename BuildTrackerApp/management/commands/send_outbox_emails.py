@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from BuildTrackerApp.outbox import send_due_emails, work_forever
+
+
+class Command(BaseCommand):
+    help = "Deliver queued outbox emails. Runs until stopped unless --once is given."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Send the currently due emails and exit.")
+        parser.add_argument('--poll-interval', type=float, default=5.0,
+                            help="Seconds to wait between polls when nothing is due.")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            sent, failed = send_due_emails()
+            self.stdout.write(f"Sent {sent} email(s), {failed} failed.")
+            return
+        self.stdout.write("Waiting for outbox emails...")
+        work_forever(poll_interval=options['poll_interval'])
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BuildTrackerApp', '0015_importjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='forecast',
+            index=models.Index(fields=['assigned_to', 'cw_request_plo'], name='forecast_assigned_cw_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='forecast',
+            index=models.Index(fields=['requester', 'cw_request_plo'], name='forecast_requester_cw_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='forecast',
+            index=models.Index(fields=['cw_request_plo'], name='forecast_cw_request_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='forecast',
+            index=models.Index(fields=['cw_delivered'], name='forecast_cw_delivered_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='forecast',
+            index=models.Index(fields=['sid'], name='forecast_sid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['status', 'expected_delivery'], name='item_status_expected_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['plo', 'status'], name='item_plo_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['hardware', 'flavour'], name='item_hardware_flavour_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['requested_date'], name='item_requested_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['expected_delivery'], name='item_expected_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['delivery_date'], name='item_delivery_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BuildTrackerApp', '0017_outboxemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxemail',
+            name='dedupe_key',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:36
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BuildTrackerApp', '0018_outboxemail_dedupe_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StageDwellStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(choices=[('Reviewing eCS', 'Reviewing eCS'), ('Backup from source', 'Backup from source'), ('OAT Simulation', 'OAT Simulation'), ('Server Provisioning', 'Server Provisioning'), ('DB Installation', 'DB Installation'), ('Installation', 'Installation'), ('Post Installation', 'Post Installation'), ('Client 000 Customization', 'Client 000 Customization'), ('with SLC for TMS', 'with SLC for TMS'), ('Back from SLC', 'Back from SLC'), ('Higher client customization', 'Higher client customization'), ('Quality Checks', 'Quality Checks'), ('Handedover to PLO', 'Handedover to PLO'), ('REBUILD', 'REBUILD'), ('Cancelled', 'Cancelled')], max_length=50)),
+                ('flavour', models.CharField(max_length=30)),
+                ('t_shirt_size', models.CharField(max_length=10)),
+                ('hardware', models.CharField(max_length=10)),
+                ('count', models.IntegerField(default=0)),
+                ('total_seconds', models.FloatField(default=0)),
+                ('min_seconds', models.FloatField(blank=True, null=True)),
+                ('max_seconds', models.FloatField(blank=True, null=True)),
+                ('histogram', models.JSONField(default=list)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('stage', 'flavour', 't_shirt_size', 'hardware'), name='unique_stage_dwell_group')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ItemStatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sid', models.CharField(max_length=3)),
+                ('from_status', models.CharField(blank=True, max_length=50, null=True)),
+                ('to_status', models.CharField(max_length=50)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('item', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='status_changes', to='BuildTrackerApp.item')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['item', 'changed_at'], name='status_change_item_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+from django.utils import timezone
+
+
+def seed_current_statuses(apps, schema_editor):
+    # Items that predate the history log have no record of when they entered
+    # their current stage; start measuring from now.
+    Item = apps.get_model('BuildTrackerApp', 'Item')
+    ItemStatusChange = apps.get_model('BuildTrackerApp', 'ItemStatusChange')
+    now = timezone.now()
+    ItemStatusChange.objects.bulk_create(
+        [
+            ItemStatusChange(item_id=item_id, sid=sid, from_status=None, to_status=status, changed_at=now)
+            for item_id, sid, status in Item.objects.values_list('id', 'sid', 'status').iterator()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BuildTrackerApp', '0019_item_status_history'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_current_statuses, migrations.RunPython.noop),
+    ]
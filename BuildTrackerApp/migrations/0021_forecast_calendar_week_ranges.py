@@ -0,0 +1,39 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BuildTrackerApp', '0020_seed_item_status_history'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='forecast',
+            name='forecast_cw_request_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='forecast',
+            name='forecast_cw_delivered_idx',
+        ),
+        migrations.AddField(
+            model_name='forecast',
+            name='cw_delivered_end',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='forecast',
+            name='cw_request_plo_end',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='forecast',
+            index=models.Index(fields=['cw_request_plo', 'cw_request_plo_end'], name='forecast_cw_request_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='forecast',
+            index=models.Index(fields=['cw_delivered', 'cw_delivered_end'], name='forecast_cw_delivered_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+import datetime
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def _encode(year, week):
+    # Week 53 only exists in some years; fall back to the last week of the year
+    try:
+        datetime.date.fromisocalendar(year, week, 1)
+    except ValueError:
+        week = datetime.date(year, 12, 28).isocalendar().week
+    return year * 100 + week
+
+
+def to_year_weeks(apps, schema_editor):
+    # Existing values are bare week numbers. The request week is placed in the
+    # ISO year the item was requested (the current year without an item); a
+    # delivery week lower than the request week belongs to the following year.
+    Forecast = apps.get_model('BuildTrackerApp', 'Forecast')
+    this_year = timezone.localdate().isocalendar().year
+    forecasts = []
+    for forecast in Forecast.objects.select_related('item').iterator():
+        year = forecast.item.requested_date.isocalendar().year if forecast.item else this_year
+        request_week = forecast.cw_request_plo if forecast.cw_request_plo in range(1, 54) else None
+        delivered_week = forecast.cw_delivered if forecast.cw_delivered in range(1, 54) else None
+        forecast.cw_request_plo = forecast.cw_request_plo_end = (
+            _encode(year, request_week) if request_week else None
+        )
+        if delivered_week:
+            rolled_over = request_week is not None and delivered_week < request_week
+            forecast.cw_delivered = forecast.cw_delivered_end = _encode(year + rolled_over, delivered_week)
+        else:
+            forecast.cw_delivered = forecast.cw_delivered_end = None
+        forecasts.append(forecast)
+    Forecast.objects.bulk_update(
+        forecasts, ['cw_request_plo', 'cw_request_plo_end', 'cw_delivered', 'cw_delivered_end'], batch_size=500,
+    )
+
+
+def to_week_numbers(apps, schema_editor):
+    Forecast = apps.get_model('BuildTrackerApp', 'Forecast')
+    forecasts = list(Forecast.objects.all())
+    for forecast in forecasts:
+        if forecast.cw_request_plo is not None:
+            forecast.cw_request_plo %= 100
+        if forecast.cw_delivered is not None:
+            forecast.cw_delivered %= 100
+    Forecast.objects.bulk_update(forecasts, ['cw_request_plo', 'cw_delivered'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BuildTrackerApp', '0021_forecast_calendar_week_ranges'),
+    ]
+
+    operations = [
+        migrations.RunPython(to_year_weeks, to_week_numbers),
+    ]
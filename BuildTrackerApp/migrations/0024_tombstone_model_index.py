@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BuildTrackerApp', '0023_sync_change_tracking'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='synctombstone',
+            index=models.Index(fields=['model', 'change_seq'], name='tombstone_model_seq_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.1 on 2026-10-18 03:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BuildTrackerApp', '0026_sqlite_wal'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='forecast',
+            index=models.Index(fields=['system_description'], name='forecast_description_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['description'], name='item_description_idx'),
+        ),
+    ]
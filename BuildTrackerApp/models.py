@@ -1,19 +1,90 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import F
 import datetime
+from django.utils import timezone
 
-class PLO(models.Model):
+class ChangeCounter(models.Model):
+    """
+    Single-row counter handing out the change sequence numbers stamped on
+    synced rows and tombstones (see sync.py).
+
+    Numbers are reserved inside the transaction that writes the row, and the
+    counter row stays locked until that transaction ends, so numbers become
+    visible in the order they were handed out.
+    """
+    value = models.BigIntegerField(default=0)
+    # Tombstones up to this number have been pruned; older tokens need a full resync
+    pruned_through = models.BigIntegerField(default=0)
+
+    @classmethod
+    def allocate(cls, count=1, using=None):
+        """Reserve ``count`` consecutive numbers and return the last one."""
+        using = using or router.db_for_write(cls)
+        with transaction.atomic(using=using, savepoint=False):
+            if not cls.objects.using(using).filter(pk=1).update(value=F('value') + count):
+                cls.objects.using(using).create(pk=1, value=count)
+            return cls.objects.using(using).values_list('value', flat=True).get(pk=1)
+
+
+class ChangeTrackedQuerySet(models.QuerySet):
+    """Stamps a fresh ``change_seq`` on rows written by the bulk methods and ``update()``."""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            _stamp(objs, self.db)
+            return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            _stamp(objs, self.db)
+            return super().bulk_update(objs, [*fields, 'change_seq'], *args, **kwargs)
+
+    def update(self, **kwargs):
+        with transaction.atomic(using=self.db, savepoint=False):
+            if 'change_seq' not in kwargs:  # bulk_update passes its own
+                kwargs['change_seq'] = ChangeCounter.allocate(using=self.db)
+            return super().update(**kwargs)
+
+
+def _stamp(objs, using):
+    if objs:
+        last = ChangeCounter.allocate(len(objs), using=using)
+        for seq, obj in enumerate(objs, last - len(objs) + 1):
+            obj.change_seq = seq
+
+
+class ChangeTracked(models.Model):
+    """Rows served by the incremental sync endpoint; every write takes the next ``change_seq``."""
+    change_seq = models.BigIntegerField(default=0, db_index=True, editable=False)
+
+    objects = ChangeTrackedQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, using=None, update_fields=None, **kwargs):
+        using = using or router.db_for_write(type(self), instance=self)
+        if update_fields:
+            update_fields = {*update_fields, 'change_seq'}
+        with transaction.atomic(using=using, savepoint=False):
+            self.change_seq = ChangeCounter.allocate(using=using)
+            super().save(*args, using=using, update_fields=update_fields, **kwargs)
+
+class PLO(ChangeTracked):
     def __str__(self):
         return self.name
 
     name = models.CharField(max_length=30)
 
-class Processor(models.Model):
+class Processor(ChangeTracked):
     def __str__(self):
         return self.name
 
     name = models.CharField(max_length=30)
 
-class Item(models.Model):
+class Item(ChangeTracked):
     def __str__(self):
         return self.sid
 
@@ -57,6 +128,8 @@ class Item(models.Model):
         ("REBUILD", "REBUILD"),
         ("Cancelled","Cancelled")
     ]
+    # Paths of the list actions under /item/ (views.ItemViewSet), which an Item with one as its sid would be hidden by
+    RESERVED_SIDS = ('bulk', 'eta', 'export', 'stage-stats', 'stats')
 
     requested_date = models.DateField()
     flavour = models.CharField(max_length=30, choices=FLAVOUR_CHOICES)
@@ -81,7 +154,24 @@ class Item(models.Model):
     servicenow = models.URLField(max_length=800, blank=True)
     comments = models.CharField(max_length=400,blank = True, null = True)
 
-class Forecast(models.Model):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Snapshot of the status as loaded, so a save can tell whether it actually changed
+        self._loaded_status = self.__dict__.get('status', models.DEFERRED)
+
+    class Meta:
+        # Composite indexes backing the list filters and orderings in ItemViewSet
+        indexes = [
+            models.Index(fields=['status', 'expected_delivery'], name='item_status_expected_idx'),
+            models.Index(fields=['plo', 'status'], name='item_plo_status_idx'),
+            models.Index(fields=['hardware', 'flavour'], name='item_hardware_flavour_idx'),
+            models.Index(fields=['requested_date'], name='item_requested_idx'),
+            models.Index(fields=['expected_delivery'], name='item_expected_idx'),
+            models.Index(fields=['delivery_date'], name='item_delivery_idx'),
+            models.Index(fields=['description'], name='item_description_idx'),  # prefix search
+        ]
+
+class Forecast(ChangeTracked):
     COE = 'COE'
     ODC = 'ODC'
     TBD = 'TBD'
@@ -105,8 +195,11 @@ class Forecast(models.Model):
     frontend = models.CharField(max_length=100)
     requester = models.ForeignKey(PLO, on_delete=models.SET_NULL, null=True, related_name='forecast_requester')
     parallel_processing = models.BooleanField(default=False, null=True, blank=True)  # Allow null/blank
+    # Calendar week ranges, first and last week encoded as year * 100 + week (see calendar_weeks.py)
     cw_request_plo = models.IntegerField(null=True, blank=True)  # Allow null/blank
+    cw_request_plo_end = models.IntegerField(null=True, blank=True)
     cw_delivered = models.IntegerField(null=True, blank=True)  # Allow null/blank
+    cw_delivered_end = models.IntegerField(null=True, blank=True)
     comments = models.CharField(max_length=400, blank=True, null=True)
     
     assigned_to = models.CharField(
@@ -114,3 +207,155 @@ class Forecast(models.Model):
         choices=ASSIGNED_TO_CHOICES,
         default=TBD,  # Default value set to TBD
     )
+
+    class Meta:
+        # Composite indexes backing the list filters and orderings in ForecastViewSet
+        indexes = [
+            models.Index(fields=['assigned_to', 'cw_request_plo'], name='forecast_assigned_cw_idx'),
+            models.Index(fields=['requester', 'cw_request_plo'], name='forecast_requester_cw_idx'),
+            models.Index(fields=['cw_request_plo', 'cw_request_plo_end'], name='forecast_cw_request_idx'),
+            models.Index(fields=['cw_delivered', 'cw_delivered_end'], name='forecast_cw_delivered_idx'),
+            models.Index(fields=['sid'], name='forecast_sid_idx'),
+            models.Index(fields=['system_description'], name='forecast_description_idx'),  # prefix search
+        ]
+
+class ImportJob(models.Model):
+    """An uploaded spreadsheet waiting for, or processed by, the import worker."""
+    ITEMS = 'items'
+    FORECASTS = 'forecasts'
+
+    KIND_CHOICES = [
+        (ITEMS, 'Items'),
+        (FORECASTS, 'Forecasts'),
+    ]
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    def __str__(self):
+        return f"{self.kind} import #{self.pk} ({self.status})"
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    mode = models.CharField(max_length=10, default='insert')
+    file = models.FileField(upload_to='import_jobs/')
+    file_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    rows_processed = models.IntegerField(default=0)
+    created_count = models.IntegerField(default=0)
+    updated_count = models.IntegerField(default=0)
+    unchanged_count = models.IntegerField(default=0)
+    error_count = models.IntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    message = models.CharField(max_length=500, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Bumped by the worker after every committed batch; a running job that
+    # stops beating was left behind by a dead worker and is queued again.
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.IntegerField(default=0)
+
+class OutboxEmail(models.Model):
+    """An email waiting to be delivered by the outbox worker."""
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENDING, 'Sending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+
+    def __str__(self):
+        return f"{self.subject} ({self.status})"
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    # Pending messages sharing a key are coalesced into one (e.g. one per SID)
+    dedupe_key = models.CharField(max_length=100, null=True, blank=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    # Set when a worker claims the message for sending; the token tells its rows from another run's
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    claim_token = models.CharField(max_length=32, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+class ItemStatusChange(models.Model):
+    """Append-only log of Item status transitions."""
+    def __str__(self):
+        return f"{self.sid}: {self.from_status} -> {self.to_status}"
+
+    # Kept when the item is deleted, so the history (and the sid) survives
+    item = models.ForeignKey(Item, on_delete=models.SET_NULL, null=True, related_name='status_changes')
+    sid = models.CharField(max_length=3)
+    from_status = models.CharField(max_length=50, null=True, blank=True)
+    to_status = models.CharField(max_length=50)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['item', 'changed_at'], name='status_change_item_idx'),
+        ]
+
+class StageDwellStat(models.Model):
+    """
+    Running totals of how long Items stayed in one status, per flavour,
+    t-shirt size and hardware. Updated incrementally as Items leave a stage;
+    ``histogram`` counts dwell times per ``history.DWELL_BUCKET_HOURS`` bucket.
+    """
+    def __str__(self):
+        return f"{self.stage} ({self.flavour}/{self.t_shirt_size}/{self.hardware})"
+
+    stage = models.CharField(max_length=50, choices=Item.STATUS_CHOICES)
+    flavour = models.CharField(max_length=30)
+    t_shirt_size = models.CharField(max_length=10)
+    hardware = models.CharField(max_length=10)
+    count = models.IntegerField(default=0)
+    total_seconds = models.FloatField(default=0)
+    min_seconds = models.FloatField(null=True, blank=True)
+    max_seconds = models.FloatField(null=True, blank=True)
+    histogram = models.JSONField(default=list)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['stage', 'flavour', 't_shirt_size', 'hardware'], name='unique_stage_dwell_group'),
+        ]
+
+class SyncTombstone(models.Model):
+    """A deleted Item, Forecast, PLO or Processor, kept so sync clients can drop it too."""
+    def __str__(self):
+        return f"{self.model} {self.sid or self.object_id} deleted"
+
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    sid = models.CharField(max_length=3, null=True, blank=True)  # Items are identified by sid
+    change_seq = models.BigIntegerField(db_index=True)
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'change_seq'], name='tombstone_model_seq_idx'),
+        ]
@@ -0,0 +1,166 @@
+"""
+Persistent email outbox.
+
+Code that wants to notify someone calls ``queue_email``, which only inserts
+an ``OutboxEmail`` row, so no request or signal handler ever waits on SMTP.
+The ``send_outbox_emails`` management command delivers due messages over a
+single reused connection per run. Messages that fail are retried with
+exponential backoff until OUTBOX_MAX_ATTEMPTS is reached.
+
+A run first claims the due messages by moving them from pending to
+sending with a conditional UPDATE, as ``jobs.claim_job`` does for imports,
+so overlapping runs never deliver the same message twice.
+"""
+import datetime
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+
+def queue_email(subject, body, recipients, html_body='', from_email=None):
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipients),
+    )
+
+
+def queue_coalesced_emails(messages, delay):
+    """
+    Queue ``messages`` (dicts with ``dedupe_key``, ``subject``, ``body`` and
+    ``recipients``), holding each back for ``delay`` seconds.
+
+    A message whose key already has a pending, never attempted row replaces
+    that row's content and restarts its delay instead of adding a second
+    email, so a burst of events for one key results in a single delivery.
+    Uses one lookup plus one bulk insert and one bulk update.
+    """
+    send_after = timezone.now() + datetime.timedelta(seconds=delay)
+    latest = {message['dedupe_key']: message for message in messages}
+    pending = {
+        outbox.dedupe_key: outbox
+        for outbox in OutboxEmail.objects.filter(
+            status=OutboxEmail.PENDING, attempts=0, dedupe_key__in=list(latest),
+        )
+    }
+    to_create, to_update = [], []
+    for key, message in latest.items():
+        outbox = pending.get(key) or OutboxEmail(dedupe_key=key, from_email=settings.DEFAULT_FROM_EMAIL)
+        outbox.subject = message['subject']
+        outbox.body = message['body']
+        outbox.html_body = message.get('html_body', '')
+        outbox.recipients = list(message['recipients'])
+        outbox.next_attempt_at = send_after
+        (to_update if outbox.pk else to_create).append(outbox)
+    OutboxEmail.objects.bulk_create(to_create)
+    OutboxEmail.objects.bulk_update(to_update, ['subject', 'body', 'html_body', 'recipients', 'next_attempt_at'])
+    return len(to_create), len(to_update)
+
+
+def _retry_delay(attempts):
+    base = getattr(settings, 'OUTBOX_RETRY_BASE_SECONDS', 60)
+    limit = getattr(settings, 'OUTBOX_RETRY_MAX_SECONDS', 3600)
+    return datetime.timedelta(seconds=min(base * 2 ** (attempts - 1), limit))
+
+
+def _record_failure(message, error):
+    message.attempts += 1
+    message.last_error = str(error)
+    if message.attempts >= getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5):
+        message.status = OutboxEmail.FAILED
+        logger.error("Giving up on outbox email %s after %d attempts: %s", message.pk, message.attempts, error)
+    else:
+        message.status = OutboxEmail.PENDING
+        message.next_attempt_at = timezone.now() + _retry_delay(message.attempts)
+        logger.warning("Outbox email %s failed (attempt %d), retrying at %s: %s",
+                       message.pk, message.attempts, message.next_attempt_at, error)
+    message.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+
+def requeue_stale_emails():
+    """
+    Return to pending the messages claimed more than OUTBOX_CLAIM_TIMEOUT
+    seconds ago by a worker that never recorded the outcome; returns how many.
+    """
+    cutoff = timezone.now() - datetime.timedelta(seconds=getattr(settings, 'OUTBOX_CLAIM_TIMEOUT', 600))
+    requeued = OutboxEmail.objects.filter(status=OutboxEmail.SENDING, claimed_at__lt=cutoff).update(
+        status=OutboxEmail.PENDING,
+    )
+    if requeued:
+        logger.warning("Requeued %d outbox email(s) left by a stopped worker", requeued)
+    return requeued
+
+
+def claim_due_emails(limit):
+    """
+    Claim up to ``limit`` due messages for this run and return them. Rows
+    another run claimed in the meantime are left out, since the conditional
+    UPDATE only tags the ones still pending with this run's token.
+    """
+    now = timezone.now()
+    due = OutboxEmail.objects.filter(status=OutboxEmail.PENDING, next_attempt_at__lte=now)
+    ids = list(due.order_by('next_attempt_at', 'id').values_list('id', flat=True)[:limit])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    if not due.filter(pk__in=ids).update(status=OutboxEmail.SENDING, claimed_at=now, claim_token=token):
+        return []
+    return list(OutboxEmail.objects.filter(pk__in=ids, claim_token=token).order_by('next_attempt_at', 'id'))
+
+
+def send_due_emails(limit=100):
+    """Deliver up to ``limit`` due messages over one connection; returns ``(sent, failed)``."""
+    requeue_stale_emails()
+    due = claim_due_emails(limit)
+    if not due:
+        return 0, 0
+
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        logger.error("Could not connect to the mail server: %s", e)
+        for message in due:
+            _record_failure(message, e)
+        return 0, len(due)
+
+    sent = failed = 0
+    try:
+        for message in due:
+            email = EmailMultiAlternatives(
+                message.subject, message.body, message.from_email, message.recipients,
+                connection=connection,
+            )
+            if message.html_body:
+                email.attach_alternative(message.html_body, 'text/html')
+            try:
+                email.send()
+            except Exception as e:
+                _record_failure(message, e)
+                failed += 1
+                continue
+            message.status = OutboxEmail.SENT
+            message.attempts += 1
+            message.sent_at = timezone.now()
+            message.save(update_fields=['status', 'attempts', 'sent_at'])
+            sent += 1
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def work_forever(poll_interval=5.0):
+    while True:
+        sent, failed = send_due_emails()
+        if not sent and not failed:
+            time.sleep(poll_interval)
@@ -0,0 +1,192 @@
+"""
+Per-request performance instrumentation.
+
+``PerfMiddleware`` measures every request:
+
+* ``total``: wall time through the rest of the middleware, the view and
+  response rendering;
+* ``db``: number of queries and time spent in them, counted by an
+  ``execute_wrapper`` on every database connection;
+* ``view``: time in the view outside SQL, which is where DRF serializers
+  build the response data;
+* ``render``: time turning that data into the response body (JSON);
+* the size of the body in bytes (None for streamed responses).
+
+The numbers go out as a ``Server-Timing`` header (shown by the browser's
+network tab), as one JSON line per request on the ``BuildTrackerApp.perf``
+logger, and into a fixed-size in-memory ring buffer per process, which
+``route_summary`` turns into p50/p95/p99 per route for ``/api/_perf/``.
+Streamed bodies (exports) are produced after the middleware returns, so
+their time is not included.
+
+``PerfLogFileHandler`` writes the log; it creates its directory when the
+first line is written, so loading the settings touches no files.
+"""
+import collections
+import contextlib
+import json
+import logging
+import logging.handlers
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 95, 99)
+
+
+class RequestTiming:
+    __slots__ = ('queries', 'db', 'view_start', 'view_db_start', 'view', 'render_start', 'render')
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.view_start = None
+        self.view_db_start = 0.0
+        self.view = None
+        self.render_start = None
+        self.render = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper: time every query the request runs
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - start
+            self.queries += 1
+
+    def view_started(self):
+        self.view_start = time.perf_counter()
+        self.view_db_start = self.db
+
+    def view_finished(self):
+        if self.view_start is not None and self.view is None:
+            elapsed = time.perf_counter() - self.view_start
+            self.view = max(elapsed - (self.db - self.view_db_start), 0.0)
+
+
+# One request in the ring buffer; times in seconds
+Sample = collections.namedtuple('Sample', 'route status total db queries view render size')
+
+
+class PerfLogFileHandler(logging.handlers.RotatingFileHandler):
+    """A rotating log file that is opened, and its directory created, on the first record."""
+
+    def __init__(self, filename, **kwargs):
+        super().__init__(filename, delay=True, **kwargs)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+def get_buffer_size():
+    return getattr(settings, 'PERF_BUFFER_SIZE', 10000)
+
+
+samples = collections.deque(maxlen=get_buffer_size())
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    name = (match.view_name or match.route) if match else 'unresolved'
+    return f'{request.method} {name}'
+
+
+class PerfMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timing = RequestTiming()
+        request._perf_timing = timing
+        start = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timing))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+        self.record(request, response, timing, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._perf_timing.view_started()
+
+    def process_template_response(self, request, response):
+        # Called after the view returned and before the response is rendered
+        timing = request._perf_timing
+        timing.view_finished()
+        timing.render_start = time.perf_counter()
+        response.add_post_render_callback(lambda rendered: self._rendered(timing))
+        return response
+
+    def _rendered(self, timing):
+        timing.render = time.perf_counter() - timing.render_start
+
+    def record(self, request, response, timing, total):
+        timing.view_finished()  # responses without a render step
+        view = timing.view or 0.0
+        size = None if response.streaming else len(response.content)
+        sample = Sample(_route(request), response.status_code, total, timing.db, timing.queries, view,
+                        timing.render, size)
+        samples.append(sample)
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={timing.db * 1000:.1f};desc="{timing.queries} queries"',
+            f'view;dur={view * 1000:.1f}',
+            f'render;dur={timing.render * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+        logger.info(json.dumps({
+            'at': timezone.now().isoformat(),
+            'method': request.method,
+            'path': request.path,
+            'route': sample.route,
+            'status': sample.status,
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(timing.db * 1000, 2),
+            'queries': timing.queries,
+            'view_ms': round(view * 1000, 2),
+            'render_ms': round(timing.render * 1000, 2),
+            'bytes': size,
+        }))
+
+
+def _percentiles(values, scale=1):
+    if not values:
+        return None
+    return {
+        f'p{percentile}': round(float(value) * scale, 2)
+        for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES))
+    }
+
+
+def route_summary():
+    """p50/p95/p99 of the buffered requests per route, slowest p95 first; times in milliseconds."""
+    by_route = collections.defaultdict(list)
+    for sample in list(samples):
+        by_route[sample.route].append(sample)
+    routes = []
+    for route, route_samples in by_route.items():
+        columns = Sample(*zip(*route_samples))
+        routes.append({
+            'route': route,
+            'count': len(route_samples),
+            'errors': sum(status >= 500 for status in columns.status),
+            'total_ms': _percentiles(columns.total, 1000),
+            'db_ms': _percentiles(columns.db, 1000),
+            'queries': _percentiles(columns.queries),
+            'view_ms': _percentiles(columns.view, 1000),
+            'render_ms': _percentiles(columns.render, 1000),
+            'bytes': _percentiles([size for size in columns.size if size is not None]),
+        })
+    routes.sort(key=lambda entry: entry['total_ms']['p95'], reverse=True)
+    return {'samples': sum(len(route_samples) for route_samples in by_route.values()),
+            'buffer_size': samples.maxlen, 'routes': routes}
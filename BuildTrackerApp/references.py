@@ -0,0 +1,129 @@
+"""
+In-process cache of the PLO and Processor reference tables.
+
+Both tables hold a few dozen rows and are read on nearly every write path:
+imports map names to ids, serializers resolve primary keys, and the
+handover email and capacity report print names. ``plos.get()`` and
+``processors.get()`` return a snapshot of the whole table with lookups by
+id and by name, so resolving a row against it never touches the database.
+
+Each process keeps its own snapshot, tagged with a version token kept in
+Django's cache, which all processes share. When a row is saved or deleted
+the signal handlers in signals.py replace the token as the transaction
+commits, so every process reloads the table on its next ``get()``; until
+then only the changing transaction sees its own version of the table.
+"""
+import threading
+import uuid
+import weakref
+
+from django.core.cache import cache
+from django.db import connections, router, transaction
+
+from .models import PLO, Processor
+
+
+class ReferenceData:
+    """An immutable snapshot of one reference table."""
+
+    def __init__(self, model, rows):
+        self.model = model
+        self.fields = [field.attname for field in model._meta.concrete_fields]
+        pk = self.fields.index(model._meta.pk.attname)
+        name = self.fields.index('name')
+        self.rows = {row[pk]: row for row in rows}
+        self.names = {row[pk]: row[name] for row in rows}
+        # Later rows win for duplicate names, as dict(values_list('name', 'id')) did
+        self.ids = {row[name]: row[pk] for row in rows}
+
+    def instance(self, pk):
+        """A fresh model instance for ``pk``, or None when there is no such row."""
+        row = self.rows.get(pk)
+        if row is None:
+            return None
+        return self.model.from_db(router.db_for_read(self.model), self.fields, row)
+
+
+class _PendingChange:
+    """
+    ``on_commit`` callback announcing a change to a table. Until then it
+    holds the changing transaction's own snapshot, which no other
+    transaction may see. Django drops it if the transaction (or the
+    savepoint that registered it) rolls back, and since the table only
+    keeps a weak reference it is gone from ``ReferenceTable.get`` with it.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.snapshot = None
+
+    def __call__(self):
+        self.table.publish()
+
+
+class ReferenceTable:
+
+    def __init__(self, model):
+        self.model = model
+        self.version_key = f'buildtracker:reference-version:{model._meta.model_name}'
+        self.snapshot = None
+        self.version = None
+        # Per thread, since connections are: alias -> weak references to _PendingChange
+        self.local = threading.local()
+
+    def current_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, uuid.uuid4().hex, None)
+            version = cache.get(self.version_key)
+        return version
+
+    def load(self, using=None):
+        # From the primary: a lagging replica's rows would be cached under the new version
+        using = using or router.db_for_write(self.model)
+        fields = [field.attname for field in self.model._meta.concrete_fields]
+        rows = self.model.objects.using(using).order_by('pk').values_list(*fields)
+        return ReferenceData(self.model, list(rows))
+
+    def pending_changes(self, alias):
+        if not hasattr(self.local, 'pending'):
+            self.local.pending = {}
+        return self.local.pending.setdefault(alias, [])
+
+    def pending_change(self, alias):
+        """The latest change of the current transaction that is neither committed nor rolled back."""
+        changes = self.pending_changes(alias)
+        changes[:] = [ref for ref in changes if ref() is not None]
+        return changes[-1]() if changes else None
+
+    def get(self):
+        """The table as of the last committed change, or as the current transaction changed it."""
+        connection = connections[router.db_for_write(self.model)]
+        pending = self.pending_change(connection.alias) if connection.in_atomic_block else None
+        if pending is not None:
+            if pending.snapshot is None:
+                pending.snapshot = self.load(connection.alias)
+            return pending.snapshot
+
+        version = self.current_version()
+        snapshot = self.snapshot
+        if snapshot is None or version != self.version:
+            snapshot = self.load()
+            self.snapshot, self.version = snapshot, version
+        return snapshot
+
+    def invalidate(self, using=None):
+        """Record a change to the table, announced to every process once it is committed."""
+        using = using or router.db_for_write(self.model)
+        pending = _PendingChange(self)
+        transaction.on_commit(pending, using=using)
+        self.pending_changes(using).append(weakref.ref(pending))
+
+    def publish(self):
+        self.snapshot = None
+        cache.set(self.version_key, uuid.uuid4().hex, None)
+
+
+plos = ReferenceTable(PLO)
+processors = ReferenceTable(Processor)
+REFERENCE_TABLES = {PLO: plos, Processor: processors}
@@ -0,0 +1,194 @@
+"""
+Read replica for the heavy read-only endpoints.
+
+The ``replica`` database is a copy of ``default`` kept up to date by
+``refresh_replica`` (``manage.py refresh_replica``), which copies the
+whole database file with SQLite's online backup API. In WAL mode the copy
+only holds a read snapshot of the primary, so writers carry on meanwhile,
+and readers of the replica see the old copy until the new one is complete.
+
+``ReplicaMiddleware`` sends the reads of a request to the replica when the
+view's action is listed in its ``replica_actions`` (list views, exports,
+dashboards) and the method is GET or HEAD; ``ReplicaRouter`` follows that
+choice and sends every write to ``default``. After a client writes
+anything it gets a signed cookie that keeps its reads on the primary for
+REPLICA_STICKY_SECONDS, so it sees its own changes before the next refresh
+copies them. Only requests that ran an INSERT, UPDATE or DELETE on the
+primary count as writes: a POST that only computes (the capacity what-if)
+leaves the client on the replica. Everything stays on the primary while the replica has not
+been refreshed within REPLICA_MAX_LAG seconds, or when it is the primary
+itself (the test mirror).
+"""
+import contextlib
+import contextvars
+import logging
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+REPLICA_DB_ALIAS = 'replica'
+STICKY_COOKIE = 'buildtracker_primary'
+SAFE_METHODS = ('GET', 'HEAD')
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+_read_from_replica = contextvars.ContextVar('read_from_replica', default=False)
+
+
+def get_sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 30)
+
+
+def get_max_lag():
+    return getattr(settings, 'REPLICA_MAX_LAG', 60)
+
+
+@contextlib.contextmanager
+def _reads(replica):
+    token = _read_from_replica.set(replica)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+def replica_reads():
+    """Send the reads inside the block to the replica."""
+    return _reads(True)
+
+
+def primary_reads():
+    """Read from the primary inside the block, e.g. for results that are cached beyond the request."""
+    return _reads(False)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        return REPLICA_DB_ALIAS if _read_from_replica.get() else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # both databases hold the same rows
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db != REPLICA_DB_ALIAS  # the schema comes with the copy
+
+
+def replica_path():
+    """The replica's database file, or None when there is no separate replica."""
+    if REPLICA_DB_ALIAS not in connections:
+        return None
+    path = connections[REPLICA_DB_ALIAS].settings_dict['NAME']
+    if str(path) == str(connections[DEFAULT_DB_ALIAS].settings_dict['NAME']):
+        return None
+    return path
+
+
+def replica_ready():
+    """True when the replica exists and was refreshed within REPLICA_MAX_LAG seconds."""
+    path = replica_path()
+    if path is None:
+        return False
+    try:
+        refreshed_at = os.path.getmtime(path)
+    except OSError:
+        return False
+    return time.time() - refreshed_at <= get_max_lag()
+
+
+def refresh_replica():
+    """Copy the primary database into the replica file; returns the seconds it took."""
+    target_path = replica_path()
+    if target_path is None:
+        raise ValueError("No separate replica database is configured.")
+    start = time.perf_counter()
+    source = sqlite3.connect(connections[DEFAULT_DB_ALIAS].settings_dict['NAME'])
+    target = sqlite3.connect(target_path, timeout=getattr(settings, 'SQLITE_BUSY_TIMEOUT', 20))
+    try:
+        # In one step: the source then holds a single read snapshot instead of restarting when written to
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    os.utime(target_path)  # the time of the refresh, read by replica_ready
+    elapsed = time.perf_counter() - start
+    logger.info("Refreshed replica %s in %.2fs", target_path, elapsed)
+    return elapsed
+
+
+def work_forever(interval=None):
+    interval = interval if interval is not None else getattr(settings, 'REPLICA_REFRESH_INTERVAL', 10)
+    while True:
+        try:
+            refresh_replica()
+        except sqlite3.Error:
+            logger.exception("Replica refresh failed")
+        time.sleep(interval)
+
+
+def _reads_from_replica(view_func, method):
+    view_class = getattr(view_func, 'cls', None)
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(method.lower()) or actions.get('get')
+    return action in getattr(view_class, 'replica_actions', ())
+
+
+class WriteDetector:
+    """Execute wrapper noting whether any statement changed rows."""
+
+    def __init__(self):
+        self.wrote = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self.wrote and sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS):
+            self.wrote = True
+        return execute(sql, params, many, context)
+
+
+class ReplicaMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request._replica_token = None
+        detector = WriteDetector()
+        if request.method in SAFE_METHODS:
+            response = self._get_response(request)
+        else:
+            with connections[DEFAULT_DB_ALIAS].execute_wrapper(detector):
+                response = self._get_response(request)
+        if detector.wrote and response.status_code < 400:
+            response.set_signed_cookie(
+                STICKY_COOKIE, '1', salt=STICKY_COOKIE, max_age=get_sticky_seconds(), httponly=True, samesite='Lax',
+            )
+        return response
+
+    def _get_response(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            if request._replica_token is not None:
+                _read_from_replica.reset(request._replica_token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method in SAFE_METHODS
+            and _reads_from_replica(view_func, request.method)
+            and not self.pinned(request)
+            and replica_ready()
+        ):
+            request._replica_token = _read_from_replica.set(True)
+
+    def pinned(self, request):
+        """True for a client that wrote within REPLICA_STICKY_SECONDS."""
+        return request.get_signed_cookie(
+            STICKY_COOKIE, default=None, salt=STICKY_COOKIE, max_age=get_sticky_seconds(),
+        ) is not None
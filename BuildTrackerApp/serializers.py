@@ -1,7 +1,13 @@
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
 from django.contrib.auth import get_user_model, authenticate
-from .models import PLO, Processor, Item, Forecast
+from .calendar_weeks import format_weeks, parse_weeks
+from .models import PLO, Processor, Item, Forecast, ImportJob
+from .references import REFERENCE_TABLES
+from .signals import StatusTransition, items_bulk_changed, status_transitioned
 from rest_framework_simplejwt.tokens import RefreshToken
 
 User = get_user_model()
@@ -46,9 +52,263 @@ class ProcessorSerializer(serializers.ModelSerializer):
         model = Processor
         fields = '__all__'
 
-class ItemSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Limit the serialized fields to the comma separated ``?fields=`` query
+    parameter on GET requests, e.g. ``?fields=sid,status``. Unknown names are
+    ignored; without the parameter every field is returned.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return
+        requested = request.query_params.get('fields')
+        if not requested:
+            return
+        allowed = {name.strip() for name in requested.split(',')}
+        for name in set(self.fields) - allowed:
+            self.fields.pop(name)
+
+
+class CalendarWeekRangeField(serializers.Field):
+    """
+    A calendar week range kept in two columns (first and last week, see
+    ``calendar_weeks``), rendered as ``2026-W10`` or ``2026-W10..2026-W14``.
+    Accepts anything ``parse_weeks`` does, including a list of weeks.
+    """
+
+    def __init__(self, first, last, **kwargs):
+        self.first, self.last = first, last
+        self.source_fields = (first, last)  # columns to load for list views
+        kwargs.setdefault('required', False)
+        super().__init__(source='*', **kwargs)
+
+    def validate_empty_values(self, data):
+        if data is None:
+            return False, None  # null clears the range
+        return super().validate_empty_values(data)
+
+    def to_representation(self, instance):
+        return format_weeks(getattr(instance, self.first), getattr(instance, self.last))
+
+    def to_internal_value(self, data):
+        try:
+            first, last = parse_weeks(data)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return {self.first: first, self.last: last}
+
+
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField that looks primary keys up without a query: in
+    the cached reference tables (references.py) for PLOs and Processors, and
+    in ``preloaded`` (pk -> instance) when a ``BulkListSerializer`` has
+    filled it. The reference table is read once per serializer, so a bulk
+    request checks its version once rather than once per record.
+    """
+    preloaded = None
+    reference = None
+
+    @property
+    def reference_table(self):
+        queryset = self.get_queryset()
+        if queryset is not None and not queryset.query.has_filters():
+            return REFERENCE_TABLES.get(queryset.model)
+        return None
+
+    def to_internal_value(self, data):
+        if self.reference is None and self.reference_table is not None:
+            self.reference = self.reference_table.get()
+        if self.reference is not None and not isinstance(data, bool):
+            try:
+                instance = self.reference.instance(int(data))
+            except (TypeError, ValueError):
+                instance = None
+            if instance is not None:
+                return instance
+        if self.preloaded is not None and not isinstance(data, bool):
+            try:
+                return self.preloaded[int(data)]
+            except (KeyError, TypeError, ValueError):
+                pass  # let the regular lookup produce the error message
+        return super().to_internal_value(data)
+
+
+def get_bulk_max_records():
+    return getattr(settings, 'BULK_MAX_RECORDS', 1000)
+
+
+def bulk_lookup_key(model, field_name, value):
+    """
+    ``value`` converted like the model field ``field_name``, for looking up a
+    record of a bulk request; a missing or malformed key (an object, a list,
+    text where an id is expected) raises a ValidationError for that record.
+    """
+    if value is None:
+        raise serializers.ValidationError({field_name: ["This field is required."]})
+    if isinstance(value, bool) or not isinstance(value, (str, int)):
+        raise serializers.ValidationError({field_name: ["Invalid value."]})
+    try:
+        return model._meta.get_field(field_name).to_python(value)
+    except ValidationError as e:
+        raise serializers.ValidationError({field_name: e.messages})
+
+
+def _scalar_values(records, name):
+    """The distinct text and number values of ``name`` in ``records``, leaving out malformed ones for validation."""
+    values = (record.get(name) for record in records)
+    return {value for value in values if isinstance(value, (str, int)) and not isinstance(value, bool)} - {''}
+
+
+def _stored_values(model, attrs):
+    """``attrs`` keyed by column attribute, with related objects replaced by their primary key."""
+    values = {}
+    for name, value in attrs.items():
+        field = model._meta.get_field(name)
+        if field.many_to_one:
+            values[field.attname] = value.pk if value is not None else None
+        else:
+            values[name] = value
+    return values
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    ``many=True`` serializer behind the bulk endpoints.
+
+    Each record is validated on its own and invalid records are reported in
+    ``results`` instead of failing the whole batch. Everything a per-record
+    validation would query is loaded once per batch: related objects,
+    values of unique fields and, for updates, the instances themselves
+    (``instance`` is a mapping of ``Meta.bulk_lookup_field`` to instance).
+    A child serializer may define ``preload(records)`` for its own lookups
+    and ``bulk_saved(created, updated)`` to react to the write, since
+    ``bulk_create``/``bulk_update`` send no ``post_save``.
+    """
+
+    @property
+    def lookup_field(self):
+        return getattr(self.child.Meta, 'bulk_lookup_field', 'id')
+
+    def _preload(self, records):
+        for field in self.child.fields.values():
+            if isinstance(field, PreloadedPrimaryKeyRelatedField) and not field.read_only and not field.reference_table:
+                pks = {record.get(field.field_name) for record in records}
+                pks = [pk for pk in pks if isinstance(pk, int) or (isinstance(pk, str) and pk.isdigit())]
+                field.preloaded = field.get_queryset().in_bulk(pks)
+
+        # Unique fields are checked with one query for the batch instead of one per record
+        self.unique_values = {}
+        for name, field in self.child.fields.items():
+            unique = [validator for validator in field.validators if isinstance(validator, UniqueValidator)]
+            if not unique or field.read_only:
+                continue
+            field.validators = [validator for validator in field.validators if validator not in unique]
+            values = _scalar_values(records, name)
+            self.unique_values[field.source] = dict(
+                unique[0].queryset.filter(**{f'{field.source}__in': values}).values_list(field.source, 'pk')
+            )
+        if hasattr(self.child, 'preload'):
+            self.child.preload(records)
+
+    def _check_unique(self, attrs, instance, seen):
+        errors = {}
+        for name, existing in self.unique_values.items():
+            if name not in attrs:
+                continue
+            value = attrs[name]
+            owner = existing.get(value)
+            if (owner is not None and (instance is None or owner != instance.pk)) or value in seen[name]:
+                errors[name] = [f"{self.child.Meta.model._meta.verbose_name} with this {name} already exists."]
+            seen[name].add(value)
+        if errors:
+            raise serializers.ValidationError(errors)
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError({'non_field_errors': ["Expected a list of records."]})
+        limit = get_bulk_max_records()
+        if len(data) > limit:
+            raise serializers.ValidationError({'non_field_errors': [f"At most {limit} records per request."]})
+        records = [record if isinstance(record, dict) else {} for record in data]
+        self._preload(records)
+
+        self.record_instances = []
+        self.record_errors = []
+        seen = {name: set() for name in self.unique_values}
+        validated = []
+        for record, raw in zip(records, data):
+            instance = None
+            try:
+                if not isinstance(raw, dict):
+                    raise serializers.ValidationError({'non_field_errors': ["Expected an object."]})
+                if self.instance is not None:
+                    key = bulk_lookup_key(self.child.Meta.model, self.lookup_field, record.get(self.lookup_field))
+                    instance = self.instance.get(key)
+                    if instance is None:
+                        raise serializers.ValidationError({self.lookup_field: ["Not found."]})
+                self.child.instance = instance
+                self.child.initial_data = record
+                attrs = self.child.run_validation(record)
+                self._check_unique(attrs, instance, seen)
+            except serializers.ValidationError as e:
+                attrs = None
+                self.record_errors.append(e.detail)
+            else:
+                self.record_errors.append(None)
+            self.record_instances.append(instance)
+            validated.append(attrs)
+        self.child.instance = None
+        return validated
+
+    def save(self, **kwargs):
+        """
+        Write every valid record with ``bulk_create``/``bulk_update`` and
+        return one result per record, in request order.
+        """
+        model = self.child.Meta.model
+        results, to_create, to_update = [], [], {}
+        for index, attrs in enumerate(self.validated_data):
+            instance = self.record_instances[index]
+            if attrs is None:
+                results.append({'index': index, 'status': 'error', 'errors': self.record_errors[index]})
+            elif instance is None:
+                instance = model(**attrs)
+                to_create.append(instance)
+                results.append({'index': index, 'status': 'created', 'instance': instance})
+            else:
+                # Foreign keys are compared by id, so the related objects are never loaded
+                values = _stored_values(model, attrs)
+                changed = tuple(name for name, value in values.items() if getattr(instance, name) != value)
+                for name in changed:
+                    setattr(instance, name, values[name])
+                if changed:
+                    to_update.setdefault(changed, []).append(instance)
+                results.append({'index': index, 'status': 'updated' if changed else 'unchanged', 'instance': instance})
+
+        model.objects.bulk_create(to_create)
+        for changed, instances in to_update.items():
+            model.objects.bulk_update(instances, [model._meta.get_field(name).name for name in changed])
+        if hasattr(self.child, 'bulk_saved'):
+            self.child.bulk_saved(to_create, [instance for instances in to_update.values() for instance in instances])
+
+        for result in results:
+            instance = result.pop('instance', None)
+            if instance is not None:
+                result[self.lookup_field] = getattr(instance, self.lookup_field)
+        return results
+
+
+class ItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    serializer_related_field = PreloadedPrimaryKeyRelatedField
+
     class Meta:
         model = Item
+        list_serializer_class = BulkListSerializer
+        bulk_lookup_field = 'sid'
         fields = [
             'requested_date', 'flavour', 'sid', 'estimated_clients', 'delivered_clients',
             'bfs', 't_shirt_size', 'landscape', 'hardware', 'setup',
@@ -57,16 +317,41 @@ class ItemSerializer(serializers.ModelSerializer):
             'delivery_delay_reason', 'servicenow', 'comments'
         ]
 
+    def validate_sid(self, value):
+        if value in Item.RESERVED_SIDS:
+            raise serializers.ValidationError(f"'{value}' is reserved and cannot be used as a sid.")
+        return value
+
+    def bulk_saved(self, created, updated):
+        # bulk_create/bulk_update skip post_save, so announce the write and any status changes here
+        now = timezone.now()
+        transitions = [StatusTransition(item, None, item.status, now) for item in created]
+        transitions += [
+            StatusTransition(item, item._loaded_status, item.status, now)
+            for item in updated if item._loaded_status != item.status
+        ]
+        for item in created + updated:
+            item._loaded_status = item.status
+        if created or updated:
+            items_bulk_changed.send(sender=Item)
+        if transitions:
+            status_transitioned.send(sender=Item, transitions=transitions)
+
 
 
 
 from django.shortcuts import get_object_or_404
 
-class ForecastSerializer(serializers.ModelSerializer):
+class ForecastSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     item_sid = serializers.CharField(source='item.sid', read_only=True)  # Ensure it is included in the response
+    cw_request_plo = CalendarWeekRangeField('cw_request_plo', 'cw_request_plo_end')
+    cw_delivered = CalendarWeekRangeField('cw_delivered', 'cw_delivered_end')
+    serializer_related_field = PreloadedPrimaryKeyRelatedField
+    items_by_sid = None  # filled by preload() for bulk writes
 
     class Meta:
         model = Forecast
+        list_serializer_class = BulkListSerializer
         fields = [
             'id', 'sid', 'clients', 'bfs', 'system_description',
             'time_weeks', 'landscape', 'frontend', 'assigned_to',
@@ -81,6 +366,22 @@ class ForecastSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError(f"Item with SID '{value}' does not exist.")
         return value
 
+    def preload(self, records):
+        """Resolve the ``item_sid`` of a whole bulk request with one query."""
+        sids = _scalar_values(records, 'item_sid')
+        self.items_by_sid = Item.objects.in_bulk([str(sid) for sid in sids], field_name='sid')
+
+    def validate(self, attrs):
+        # In bulk writes records link their item through ``item_sid``, like ForecastViewSet.update
+        if self.items_by_sid is not None and self.initial_data.get('item_sid'):
+            item = self.items_by_sid.get(str(self.initial_data['item_sid']))
+            if item is None:
+                raise serializers.ValidationError(
+                    {'item_sid': [f"Item with SID '{self.initial_data['item_sid']}' does not exist."]}
+                )
+            attrs['item'] = item
+        return attrs
+
     def create(self, validated_data):
         item_sid = validated_data.pop('item_sid', None)
         if item_sid:
@@ -102,7 +403,9 @@ class ForecastSerializer(serializers.ModelSerializer):
         instance.requester = validated_data.get('requester', instance.requester)
         instance.parallel_processing = validated_data.get('parallel_processing', instance.parallel_processing)
         instance.cw_request_plo = validated_data.get('cw_request_plo', instance.cw_request_plo)
+        instance.cw_request_plo_end = validated_data.get('cw_request_plo_end', instance.cw_request_plo_end)
         instance.cw_delivered = validated_data.get('cw_delivered', instance.cw_delivered)
+        instance.cw_delivered_end = validated_data.get('cw_delivered_end', instance.cw_delivered_end)
         instance.comments = validated_data.get('comments', instance.comments)
 
         if 'item_sid' in validated_data:
@@ -112,4 +415,30 @@ class ForecastSerializer(serializers.ModelSerializer):
         
         instance.assigned_to = validated_data.get('assigned_to', instance.assigned_to)
         instance.save()
-        return instance
\ No newline at end of file
+        return instance
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    elapsed_seconds = serializers.SerializerMethodField()
+    rows_per_second = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            'id', 'kind', 'mode', 'file_name', 'status', 'message',
+            'rows_processed', 'created_count', 'updated_count', 'unchanged_count',
+            'error_count', 'errors', 'elapsed_seconds', 'rows_per_second', 'attempts',
+            'created_at', 'started_at', 'finished_at',
+        ]
+
+    def get_elapsed_seconds(self, obj):
+        if obj.started_at is None:
+            return None
+        end = obj.finished_at or timezone.now()
+        return round((end - obj.started_at).total_seconds(), 3)
+
+    def get_rows_per_second(self, obj):
+        elapsed = self.get_elapsed_seconds(obj)
+        if not elapsed:
+            return None
+        return round(obj.rows_processed / elapsed, 1)
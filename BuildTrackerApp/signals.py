@@ -1,45 +1,145 @@
-from django.db.models.signals import post_save
-from django.dispatch import receiver
-from django.core.mail import send_mail
+from typing import NamedTuple
+import datetime
+
 from django.conf import settings
-from .models import Item
+from django.db import models, transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+from .authentication import invalidate_user
+from .history import record_transitions
+from .models import ChangeCounter, Forecast, Item, PLO, Processor, SyncTombstone
+from .outbox import queue_coalesced_emails
+from .references import REFERENCE_TABLES, plos, processors
+from .stats import invalidate_item_stats
+
+# Sent after Items are written in bulk (bulk_create/bulk_update), which
+# bypasses post_save. Receivers get ``sender=Item``.
+items_bulk_changed = Signal()
+
+# Sent with ``transitions=[StatusTransition, ...]`` whenever the stored status
+# of one or more Items actually changes, including the first status of a new
+# Item (``previous`` is None). Single saves and bulk writes both send it.
+status_transitioned = Signal()
+
+HANDED_OVER = 'Handedover to PLO'
+
+
+class StatusTransition(NamedTuple):
+    item: Item
+    previous: str | None
+    current: str
+    at: datetime.datetime
+
 
 @receiver(post_save, sender=Item)
-def send_email_on_status_change(sender, instance, **kwargs):
-    if instance.status == 'Handedover to PLO':
-        subject = 'Item Status Updated'
-        message = (
-            f'The item with SID "{instance.sid}" has been handed over to PLO.\n'
-            f'Flavour: {instance.flavour}\n'
-            f'Estimated Clients: {instance.estimated_clients}\n'
-            f'Delivered Clients: {instance.delivered_clients}\n'
-            f'BFS: {instance.bfs}\n'
-            f'T-Shirt Size: {instance.t_shirt_size}\n'
-            f'System Type: {instance.system_type}\n'
-            f'Hardware: {instance.hardware}\n'
-            f'Setup: {instance.setup}\n'
-            f'PLO: {instance.plo.name}\n'
-            f'Processor1: {instance.processor1.name}\n'
-            f'Processor2: {instance.processor2.name if instance.processor2 else "None"}\n'
-            f'Landscape: {instance.landscape}\n'
-            f'Description: {instance.description}\n'
-            f'Expected Delivery: {instance.expected_delivery}\n'
-            f'Revised Delivery Date: {instance.revised_delivery_date}\n'
-            f'Delivery Date: {instance.delivery_date}\n'
-            f'Delivery Delay Reason: {instance.delivery_delay_reason}\n'
-            f'Servicenow: {instance.servicenow}\n'
-            f'Comments: {instance.comments}\n'
-        )
-        from_email = settings.DEFAULT_FROM_EMAIL
-        recipient_list = ['pooja.gajghate@sap.com']  # Replace with actual recipient list
-
-        send_mail(subject, message, from_email, recipient_list)
-
-# Register the signal
-from django.apps import AppConfig
-
-class YourAppConfig(AppConfig):
-    name = 'BuildTrackerApp'
-
-    def ready(self):
-        import BuildTrackerApp.signals
+def detect_status_transition(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_loaded_status', models.DEFERRED)
+    if previous is not models.DEFERRED and previous != instance.status:
+        transition = StatusTransition(instance, previous, instance.status, timezone.now())
+        status_transitioned.send(sender=Item, transitions=[transition])
+    instance._loaded_status = instance.status
+
+
+def _handover_message(item, plo_names, processor_names):
+    return (
+        f'The item with SID "{item.sid}" has been handed over to PLO.\n'
+        f'Flavour: {item.flavour}\n'
+        f'Estimated Clients: {item.estimated_clients}\n'
+        f'Delivered Clients: {item.delivered_clients}\n'
+        f'BFS: {item.bfs}\n'
+        f'T-Shirt Size: {item.t_shirt_size}\n'
+        f'System Type: {item.system_type}\n'
+        f'Hardware: {item.hardware}\n'
+        f'Setup: {item.setup}\n'
+        f'PLO: {plo_names.get(item.plo_id)}\n'
+        f'Processor1: {processor_names.get(item.processor1_id)}\n'
+        f'Processor2: {processor_names.get(item.processor2_id, "None")}\n'
+        f'Landscape: {item.landscape}\n'
+        f'Description: {item.description}\n'
+        f'Expected Delivery: {item.expected_delivery}\n'
+        f'Revised Delivery Date: {item.revised_delivery_date}\n'
+        f'Delivery Date: {item.delivery_date}\n'
+        f'Delivery Delay Reason: {item.delivery_delay_reason}\n'
+        f'Servicenow: {item.servicenow}\n'
+        f'Comments: {item.comments}\n'
+    )
+
+
+@receiver(status_transitioned, sender=Item)
+def send_email_on_status_change(sender, transitions, **kwargs):
+    items = [transition.item for transition in transitions if transition.current == HANDED_OVER]
+    if not items:
+        return
+    plo_names = plos.get().names
+    processor_names = processors.get().names
+
+    recipient_list = ['pooja.gajghate@sap.com']  # Replace with actual recipient list
+    messages = [
+        {
+            'dedupe_key': f'item-status:{item.sid}',
+            'subject': 'Item Status Updated',
+            'body': _handover_message(item, plo_names, processor_names),
+            'recipients': recipient_list,
+        }
+        for item in items
+    ]
+    # Queued rather than sent, so saving an item never waits on SMTP; held back
+    # briefly so repeated transitions of one SID collapse into a single email
+    queue_coalesced_emails(messages, delay=getattr(settings, 'STATUS_NOTIFICATION_DEBOUNCE_SECONDS', 60))
+
+
+@receiver(status_transitioned, sender=Item)
+def record_status_history(sender, transitions, **kwargs):
+    record_transitions(transitions)
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+@receiver(items_bulk_changed, sender=Item)
+@receiver(post_save, sender=PLO)
+@receiver(post_delete, sender=PLO)
+@receiver(post_save, sender=Processor)
+@receiver(post_delete, sender=Processor)
+def invalidate_item_stats_on_change(sender, **kwargs):
+    # Drop the cached dashboard numbers once the write is visible to other readers
+    transaction.on_commit(invalidate_item_stats)
+
+
+@receiver(post_delete, sender=Item)
+@receiver(post_delete, sender=Forecast)
+@receiver(post_delete, sender=PLO)
+@receiver(post_delete, sender=Processor)
+def record_sync_tombstone(sender, instance, using, **kwargs):
+    # Lets sync clients drop the row; Items are known to them by sid
+    SyncTombstone.objects.using(using).create(
+        model=sender._meta.model_name,
+        object_id=instance.pk,
+        sid=instance.sid if sender is Item else None,
+        change_seq=ChangeCounter.allocate(using=using),
+    )
+
+
+@receiver(pre_delete, sender=PLO)
+def touch_forecasts_of_deleted_requester(sender, instance, using, **kwargs):
+    # on_delete=SET_NULL is applied with a plain UPDATE that skips change tracking
+    Forecast.objects.using(using).filter(requester=instance).update(
+        change_seq=ChangeCounter.allocate(using=using),
+    )
+
+
+@receiver(post_save, sender=PLO)
+@receiver(post_delete, sender=PLO)
+@receiver(post_save, sender=Processor)
+@receiver(post_delete, sender=Processor)
+def invalidate_reference_table(sender, using, **kwargs):
+    REFERENCE_TABLES[sender].invalidate(using)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_claims(sender, instance, using, **kwargs):
+    # Staff flags, username changes and deletions take effect on the next request
+    invalidate_user(instance.pk, using)
@@ -0,0 +1,65 @@
+"""
+Dashboard aggregates over Items.
+
+``get_item_stats`` answers from Django's cache; on a miss the numbers are
+computed from one grouped query and rolled up in Python. The signal
+handlers in ``signals.py`` drop the cached copy whenever Items (or the PLO
+and Processor names they are reported under) change.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, F, Value, When
+from django.utils import timezone
+
+from .models import Item
+from .replica import primary_reads
+
+ITEM_STATS_CACHE_KEY = 'buildtracker:item-stats'
+NO_DELIVERY_DATE = Item._meta.get_field('delivery_date').default
+
+
+def compute_item_stats():
+    today = timezone.localdate()
+    timeliness = Case(
+        When(delivery_date=NO_DELIVERY_DATE, expected_delivery__lt=today, then=Value('overdue')),
+        When(delivery_date=NO_DELIVERY_DATE, then=Value('open')),
+        When(delivery_date__gt=F('expected_delivery'), then=Value('delayed')),
+        default=Value('on_time'),
+        output_field=CharField(),
+    )
+    rows = (
+        Item.objects
+        .annotate(timeliness=timeliness)
+        .values('status', 'plo__name', 'processor1__name', 'processor2__name', 'timeliness')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+
+    stats = {
+        'total': 0,
+        'by_status': {value: 0 for value, _label in Item.STATUS_CHOICES},
+        'by_plo': {},
+        'by_processor': {},
+        'delivery': {'on_time': 0, 'delayed': 0, 'open': 0, 'overdue': 0},
+    }
+    for row in rows:
+        count = row['count']
+        stats['total'] += count
+        stats['by_status'][row['status']] = stats['by_status'].get(row['status'], 0) + count
+        stats['by_plo'][row['plo__name']] = stats['by_plo'].get(row['plo__name'], 0) + count
+        # An item counts once for each distinct processor working on it
+        for name in {row['processor1__name'], row['processor2__name']} - {None}:
+            stats['by_processor'][name] = stats['by_processor'].get(name, 0) + count
+        stats['delivery'][row['timeliness']] += count
+    return stats
+
+
+def get_item_stats():
+    timeout = getattr(settings, 'ITEM_STATS_CACHE_TIMEOUT', 300)
+    # Cached until the next write, so computed from the primary rather than a lagging replica
+    with primary_reads():
+        return cache.get_or_set(ITEM_STATS_CACHE_KEY, compute_item_stats, timeout)
+
+
+def invalidate_item_stats():
+    cache.delete(ITEM_STATS_CACHE_KEY)
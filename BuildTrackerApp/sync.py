@@ -0,0 +1,139 @@
+"""
+Incremental sync of Items, Forecasts, PLOs and Processors.
+
+Every write to one of these tables stamps the row with the next number of
+a global change sequence (``models.ChangeTracked``) and every delete leaves
+a ``SyncTombstone`` with its own number. A client keeps the token of its
+last sync, which is simply the highest number it has seen, and asks for
+what changed since: an indexed range scan on ``change_seq`` per table.
+
+A client applies ``deleted`` before ``changed``, so an Item deleted and
+created again under the same sid ends up present. When the tombstones a
+token relies on have been pruned, the response is a full snapshot flagged
+``reset`` and the client replaces what it holds.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Subquery
+from django.utils import timezone
+
+from .models import PLO, ChangeCounter, Forecast, Item, Processor, SyncTombstone
+from .serializers import ForecastSerializer, ItemSerializer, PLOSerializer, ProcessorSerializer
+
+# Model name (as stored on tombstones) -> (serializer, queryset factory)
+SYNC_MODELS = {
+    'item': (ItemSerializer, lambda: Item.objects.all()),
+    'forecast': (ForecastSerializer, lambda: Forecast.objects.select_related('item')),
+    'plo': (PLOSerializer, lambda: PLO.objects.all()),
+    'processor': (ProcessorSerializer, lambda: Processor.objects.all()),
+}
+
+
+def get_page_size():
+    return getattr(settings, 'SYNC_PAGE_SIZE', 5000)
+
+
+def parse_token(value):
+    """The sequence number in a sync token, None for no token; raises ValueError otherwise."""
+    if value is None or value == '':
+        return None
+    if not value.isdigit():
+        raise ValueError("since must be a token returned by a previous sync.")
+    return int(value)
+
+
+def table_version(*models):
+    """
+    A fingerprint of the current contents of ``models``: the last change
+    number written to each table and the last one deleted from it, read in
+    one query of index lookups. It changes with every write to the tables.
+    """
+    columns = {}
+    for model in models:
+        name = model._meta.model_name
+        columns[f'{name}_written'] = Subquery(model.objects.order_by('-change_seq').values('change_seq')[:1])
+        columns[f'{name}_deleted'] = Subquery(
+            SyncTombstone.objects.filter(model=name).order_by('-change_seq').values('change_seq')[:1]
+        )
+    row = ChangeCounter.objects.filter(pk=1).annotate(**columns).values_list(*columns).first()
+    return '.'.join(str(value or 0) for value in row or ())
+
+
+def _page(queryset, since, upper, limit):
+    """
+    Rows with ``since < change_seq <= upper`` in sequence order, at most
+    ``limit`` of them unless one sequence number is shared by more rows
+    (``QuerySet.update``), and the last number the page is complete up to.
+    """
+    window = queryset.filter(change_seq__gt=since, change_seq__lte=upper).order_by('change_seq', 'pk')
+    rows = list(window[:limit + 1])
+    if len(rows) <= limit:
+        return rows, upper
+    # Stop before the first row left out, so rows sharing its number arrive together
+    cut = rows[limit].change_seq - 1
+    if cut <= since:
+        cut = rows[limit].change_seq
+        rows = list(window.filter(change_seq__lte=cut))
+    return [row for row in rows if row.change_seq <= cut], cut
+
+
+def changes_since(since=None, limit=None):
+    """
+    Everything changed after token ``since`` (a full snapshot when None).
+
+    Only rows numbered up to the counter value read first are returned, and
+    those were all committed by then (writers take numbers one transaction
+    at a time), so the tables agree without a transaction around the reads,
+    which would hold the write lock (IMMEDIATE transactions). A row changed
+    meanwhile carries a higher number and comes with the next sync.
+
+    Each table contributes at most about ``limit`` rows (SYNC_PAGE_SIZE); when
+    one has more, the token stops where every table is complete and ``more``
+    tells the client to ask again straight away.
+    """
+    limit = limit or get_page_size()
+    counter = ChangeCounter.objects.filter(pk=1).first() or ChangeCounter(value=0)
+    reset = since is None or since < counter.pruned_through
+    if reset:
+        since = 0
+    upper = counter.value
+    pages = {}
+    for name, (_serializer, queryset) in SYNC_MODELS.items():
+        pages[name], upper = _page(queryset(), since, upper, limit)
+    tombstones = []
+    if not reset:
+        tombstones, upper = _page(SyncTombstone.objects.all(), since, upper, limit)
+
+    changed = {}
+    for name, (serializer, _queryset) in SYNC_MODELS.items():
+        rows = [row for row in pages[name] if row.change_seq <= upper]
+        changed[name] = serializer(rows, many=True).data
+    deleted = {name: [] for name in SYNC_MODELS}
+    for tombstone in tombstones:
+        if tombstone.change_seq <= upper:
+            deleted[tombstone.model].append(tombstone.sid if tombstone.model == 'item' else tombstone.object_id)
+    return {
+        'token': str(upper),
+        'reset': reset,
+        'more': upper < counter.value,
+        'changed': changed,
+        'deleted': deleted,
+    }
+
+
+def prune_tombstones(days=None):
+    """
+    Delete tombstones older than ``days`` (SYNC_TOMBSTONE_RETENTION_DAYS);
+    clients with an older token get a full resync. Returns the number deleted.
+    """
+    days = days if days is not None else getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 30)
+    with transaction.atomic():
+        expired = SyncTombstone.objects.filter(deleted_at__lt=timezone.now() - datetime.timedelta(days=days))
+        last = expired.aggregate(last=Max('change_seq'))['last']
+        if last is None:
+            return 0
+        ChangeCounter.objects.filter(pk=1, pruned_through__lt=last).update(pruned_through=last)
+        count, _deleted = expired.delete()
+    return count
@@ -0,0 +1,208 @@
+"""
+Synthetic PLOs, Processors, Items and Forecasts for load testing.
+
+``seed`` writes a data set of a given size with ``bulk_create``; values
+are drawn from a seeded NumPy generator, so the same arguments give the
+same data. Every field holds a value its model and the importers accept:
+choices come from the model, SIDs are unique three-character codes and
+calendar weeks use the year * 100 + week encoding.
+
+``write_item_sheet`` and ``write_forecast_sheet`` produce upload files in
+the import format (the same columns as the export), for benchmarking
+``upload_excel`` and ``upload_excel_forecast``.
+"""
+import datetime
+import string
+
+import numpy as np
+from django.db import transaction
+
+from .calendar_weeks import encode
+from .exports import FORECAST_EXPORT_COLUMNS, ITEM_EXPORT_COLUMNS, stream_xlsx
+from .models import PLO, Forecast, Item, Processor
+from .references import REFERENCE_TABLES
+from .signals import items_bulk_changed
+
+SID_ALPHABET = string.ascii_uppercase + string.digits
+SID_SPACE = len(SID_ALPHABET) ** 3
+NO_DELIVERY_DATE = Item._meta.get_field('delivery_date').default
+OPEN_STATUSES = [value for value, _label in Item.STATUS_CHOICES if value not in ('Handedover to PLO', 'Cancelled')]
+
+
+def _choices(field_choices):
+    return [value for value, _label in field_choices]
+
+
+def _sid(code):
+    first, rest = divmod(code, len(SID_ALPHABET) ** 2)
+    second, third = divmod(rest, len(SID_ALPHABET))
+    return SID_ALPHABET[first] + SID_ALPHABET[second] + SID_ALPHABET[third]
+
+
+def free_sids(count, rng, taken=()):
+    """``count`` random three-character SIDs not in ``taken`` or stored; ValueError if too few are left."""
+    taken = set(taken) | set(Item.objects.values_list('sid', flat=True))
+    sids = []
+    for code in rng.permutation(SID_SPACE):
+        sid = _sid(int(code))
+        if sid not in taken:
+            sids.append(sid)
+            if len(sids) == count:
+                return sids
+    if len(sids) < count:
+        raise ValueError(f"Only {len(sids)} unused SIDs are left, {count} requested.")
+    return sids
+
+
+def _week(date):
+    year, week, _day = date.isocalendar()
+    return encode(year, week)
+
+
+def build_items(sids, plos, processors, rng, today=None):
+    """Unsaved Items for ``sids``, about half of them delivered."""
+    today = today or datetime.date.today()
+    count = len(sids)
+    flavours = rng.choice(_choices(Item.FLAVOUR_CHOICES), count)
+    sizes = rng.choice(_choices(Item.TSHIRT_SIZE_CHOICES), count, p=[0.2, 0.5, 0.3])
+    bfs = rng.choice(_choices(Item.BFS_CHOICES), count)
+    hardware = rng.choice(_choices(Item.HARDWARE_CHOICES), count)
+    requested_ago = rng.integers(0, 720, count)
+    # Larger systems take longer to build
+    build_days = rng.gamma(4.0, np.where(sizes == 'Large', 12, np.where(sizes == 'Medium', 8, 5))).astype(int) + 7
+    slack = rng.integers(-5, 15, count)
+    setups = rng.integers(1, 25, count)
+    clients = rng.integers(1, 9, count)
+    delivered = rng.random(count) < 0.5
+    cancelled = ~delivered & (rng.random(count) < 0.05)
+    open_status = rng.choice(OPEN_STATUSES, count)
+    plo_index = rng.integers(0, len(plos), count)
+    processor1 = rng.integers(0, len(processors), count)
+    processor2 = rng.integers(-len(processors), len(processors), count)  # negative: no second processor
+
+    items = []
+    for index, sid in enumerate(sids):
+        requested = today - datetime.timedelta(days=int(requested_ago[index]))
+        expected = requested + datetime.timedelta(days=int(build_days[index] + slack[index]))
+        is_delivered = delivered[index] and requested + datetime.timedelta(days=int(build_days[index])) <= today
+        items.append(Item(
+            sid=sid,
+            requested_date=requested,
+            flavour=flavours[index],
+            estimated_clients=int(clients[index]),
+            delivered_clients=int(clients[index]) if is_delivered else None,
+            bfs=bfs[index],
+            t_shirt_size=sizes[index],
+            system_type='Synthetic',
+            hardware=hardware[index],
+            setup=f'Setup {setups[index]}',
+            plo=plos[plo_index[index]],
+            processor1=processors[processor1[index]],
+            processor2=processors[processor2[index]] if processor2[index] >= 0 else None,
+            status=(
+                'Handedover to PLO' if is_delivered
+                else 'Cancelled' if cancelled[index]
+                else open_status[index]
+            ),
+            landscape='Synthetic',
+            description=f'Synthetic system {sid}',
+            expected_delivery=expected,
+            delivery_date=(
+                requested + datetime.timedelta(days=int(build_days[index])) if is_delivered else NO_DELIVERY_DATE
+            ),
+            servicenow='',
+        ))
+    return items
+
+
+def build_forecasts(count, items, plos, rng):
+    """``count`` unsaved Forecasts, each linked to a random Item of ``items``."""
+    owners = rng.integers(0, len(items), count)
+    weeks = rng.integers(1, 13, count)
+    spans = rng.integers(0, 3, count)
+    teams = rng.choice(_choices(Forecast.ASSIGNED_TO_CHOICES), count)
+    requesters = rng.integers(0, len(plos), count)
+    forecasts = []
+    for index in range(count):
+        item = items[owners[index]]
+        start = item.requested_date
+        end = start + datetime.timedelta(weeks=int(spans[index]))
+        delivered = item.delivery_date if item.delivery_date != NO_DELIVERY_DATE else None
+        forecasts.append(Forecast(
+            item=item,
+            sid=item.sid,
+            clients=item.estimated_clients,
+            bfs=item.bfs,
+            system_description=f'Forecast for {item.sid}',
+            time_weeks=int(weeks[index]),
+            landscape=item.landscape,
+            frontend='Fiori',
+            requester=plos[requesters[index]],
+            parallel_processing=bool(index % 3 == 0),
+            cw_request_plo=_week(start),
+            cw_request_plo_end=_week(end),
+            cw_delivered=_week(delivered) if delivered else None,
+            cw_delivered_end=_week(delivered) if delivered else None,
+            assigned_to=teams[index],
+        ))
+    return forecasts
+
+
+def seed(plos=20, processors=30, items=5000, forecasts=5000, random_seed=0, batch_size=1000):
+    """
+    Insert a synthetic data set next to whatever is already stored and
+    return the created ``(plos, processors, items, forecasts)``.
+    """
+    rng = np.random.default_rng(random_seed)
+    with transaction.atomic():
+        suffix = PLO.objects.count() + Processor.objects.count()
+        plo_rows = PLO.objects.bulk_create([PLO(name=f'PLO {suffix + index}') for index in range(plos)])
+        processor_rows = Processor.objects.bulk_create(
+            [Processor(name=f'Processor {suffix + index}') for index in range(processors)]
+        )
+        item_rows = Item.objects.bulk_create(
+            build_items(free_sids(items, rng), plo_rows, processor_rows, rng), batch_size=batch_size,
+        )
+        forecast_rows = Forecast.objects.bulk_create(
+            build_forecasts(forecasts, item_rows, plo_rows, rng) if item_rows else [], batch_size=batch_size,
+        )
+        # bulk_create sends no post_save: refresh the cached reference tables and item stats
+        for table in REFERENCE_TABLES.values():
+            table.invalidate()
+        items_bulk_changed.send(sender=Item)
+    return plo_rows, processor_rows, item_rows, forecast_rows
+
+
+def _cell(obj, lookup):
+    for name in lookup.split('__'):
+        obj = getattr(obj, name) if obj is not None else None
+    return obj
+
+
+def _write_sheet(path, objects, columns, title):
+    rows = (
+        [column.formatter(*(_cell(obj, lookup) for lookup in column.lookups)) for column in columns]
+        for obj in objects
+    )
+    with open(path, 'wb') as sheet:
+        for block in stream_xlsx(rows, [column.header for column in columns], title):
+            sheet.write(block)
+
+
+def write_item_sheet(path, count, random_seed=0):
+    """An Item upload file of ``count`` new Items (SIDs not yet stored) for the stored PLOs and Processors."""
+    rng = np.random.default_rng(random_seed)
+    plos, processors = list(PLO.objects.all()), list(Processor.objects.all())
+    if not plos or not processors:
+        raise ValueError("Seed PLOs and Processors before writing an item sheet.")
+    _write_sheet(path, build_items(free_sids(count, rng), plos, processors, rng), ITEM_EXPORT_COLUMNS, 'items')
+
+
+def write_forecast_sheet(path, count, random_seed=0):
+    """A Forecast upload file of ``count`` Forecasts for stored Items."""
+    rng = np.random.default_rng(random_seed)
+    plos = list(PLO.objects.all())
+    items = list(Item.objects.order_by('?')[:max(count, 1)])
+    if not plos or not items:
+        raise ValueError("Seed Items and PLOs before writing a forecast sheet.")
+    _write_sheet(path, build_forecasts(count, items, plos, rng), FORECAST_EXPORT_COLUMNS, 'forecasts')
@@ -1,3 +1,1543 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import zipfile
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import openpyxl
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.db import connection, connections, router, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .authentication import _claims, clear_user_cache, user_claims
+from .calendar_weeks import parse_weeks
+from .capacity import apply_scenario, load_demand, simulate
+from .eta import design_matrix, feature_columns, get_model, predict_open_items
+from .exports import ITEM_EXPORT_COLUMNS
+from .importers import ImportFileError, ItemImporter
+from .jobs import enqueue_import, requeue_stale_jobs, run_pending_jobs
+from .ingestion import INTEGER_MAX, ITEM_COLUMNS, describe_errors, iter_batches, normalise
+from .history import record_transitions, stage_dwell_summary
+from .models import PLO, Processor, Item, Forecast, ImportJob, ItemStatusChange, OutboxEmail, SyncTombstone
+from . import benchmark, perf, replica
+from .outbox import queue_email, send_due_emails
+from .references import plos, processors
+from .signals import StatusTransition
+from .sync import changes_since, prune_tombstones
+from .views import ForecastViewSet, ItemViewSet
+
+
+def create_items(count, plo, processor, start=0):
+    return Item.objects.bulk_create([
+        Item(
+            requested_date=datetime.date(2024, 1, 1),
+            flavour='S/4H OP',
+            sid=f'{start + index:03d}',
+            estimated_clients=2,
+            bfs='Single',
+            t_shirt_size='Small',
+            system_type='Test',
+            hardware='GCP',
+            setup='Standard',
+            plo=plo,
+            processor1=processor,
+            processor2=processor,
+            status='Installation',
+            landscape='Test',
+            description='Test system',
+            expected_delivery=datetime.date(2024, 2, 1),
+        )
+        for index in range(count)
+    ])
+
+
+def create_forecasts(items, plo):
+    return Forecast.objects.bulk_create([
+        Forecast(
+            item=item,
+            sid=item.sid,
+            clients=2,
+            bfs='Single',
+            system_description='Test',
+            time_weeks=4,
+            landscape='Test',
+            frontend='Fiori',
+            requester=plo,
+            cw_request_plo=202610,
+            cw_request_plo_end=202610,
+        )
+        for item in items
+    ])
+
+
+def item_row(sid, **values):
+    """One row of an Item upload sheet, as read from the workbook."""
+    row = {
+        'sid': sid, 'requested_date': '01/01/2024', 'flavour': 'S/4H OP', 'estimated_clients': 2,
+        'delivered_clients': None, 'bfs': 'Single', 't_shirt_size': 'Small', 'system_type': 'Test',
+        'hardware': 'GCP', 'setup': 'Standard', 'plo': 'PLO', 'processor1': 'Processor', 'processor2': None,
+        'status': 'Installation', 'landscape': 'Test', 'description': 'Test system',
+        'expected_delivery': '01/02/2024', 'revised_delivery_date': None, 'delivery_date': None,
+        'delivery_delay_reason': None, 'servicenow': '', 'comments': None,
+    }
+    row.update(values)
+    return row
+
+
+class NormaliseTests(TestCase):
+
+    def test_datetime64_columns_with_empty_cells(self):
+        # The .xls reader gives datetime64 columns, with NaT for empty cells
+        df = pd.DataFrame([item_row('AAA'), item_row('AAB')])
+        df['requested_date'] = pd.to_datetime(['2024-01-01', None])
+        df['revised_delivery_date'] = pd.to_datetime([None, '2024-03-01'])
+        frame, errors = normalise(df, ITEM_COLUMNS)
+
+        self.assertEqual(list(frame['requested_date']), [datetime.date(2024, 1, 1), None])
+        self.assertEqual(list(frame['revised_delivery_date']), [None, datetime.date(2024, 3, 1)])
+        self.assertEqual(list(errors['requested_date']), [False, True])  # required
+        self.assertFalse(errors['revised_delivery_date'].any())
+
+
+    def test_dates_choices_and_integers(self):
+        df = pd.DataFrame([
+            item_row('AAA', requested_date='15/03/2024', flavour='s/4h op', hardware=' gcp ', estimated_clients='3'),
+            item_row('AAB', requested_date='2024-03-15', flavour='Unknown', estimated_clients=2.5),
+            item_row('AAC', requested_date=datetime.datetime(2024, 3, 15, 10, 0), estimated_clients=float('inf')),
+            item_row('AAD', estimated_clients=10 ** 20, delivered_clients=''),
+        ])
+        frame, errors = normalise(df, ITEM_COLUMNS)
+
+        self.assertEqual(frame['requested_date'][0], datetime.date(2024, 3, 15))
+        self.assertEqual(frame['requested_date'][2], datetime.date(2024, 3, 15))
+        self.assertEqual((frame['flavour'][0], frame['hardware'][0]), ('S/4H OP', 'GCP'))  # canonical spelling
+        self.assertEqual(frame['estimated_clients'][0], 3)
+        self.assertIsNone(frame['delivered_clients'][3])
+        self.assertEqual(frame['delivery_date'][0], Item._meta.get_field('delivery_date').default)
+        self.assertEqual(
+            {name: list(errors.index[errors[name]]) for name in errors.columns if errors[name].any()},
+            {'requested_date': [1], 'flavour': [1], 'estimated_clients': [1, 2, 3]},
+        )
+        self.assertEqual(describe_errors(df, errors, ITEM_COLUMNS)[1], [
+            'Invalid requested_date.',
+            'flavour must be one of: S/4H Private, S/4H Public, S/4 Cloud, S/4H OP.',
+            'Invalid estimated_clients.',
+        ])
+
+
+def workbook_bytes(rows, dimension=True):
+    """An .xlsx file of ``rows``; without ``dimension`` the sheet has no size information, as some writers leave it."""
+    workbook = openpyxl.Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    output = io.BytesIO()
+    workbook.save(output)
+    if dimension:
+        return output.getvalue()
+    stripped = io.BytesIO()
+    with zipfile.ZipFile(output) as source, zipfile.ZipFile(stripped, 'w') as target:
+        for entry in source.infolist():
+            content = source.read(entry)
+            if entry.filename.startswith('xl/worksheets/'):
+                content = re.sub(rb'<dimension [^>]*/>', b'', content)
+            target.writestr(entry, content)
+    return stripped.getvalue()
+
+
+class IterBatchesTests(TestCase):
+    rows = [
+        ['sid', ' status ', 'comments'],
+        ['AAA', 'Installation', 'First'],
+        [],
+        ['AAB'],
+        ['AAC', 'Installation'],
+        [None, None, None],
+        ['AAD', 'Installation', 'Last'],
+    ]
+
+    def test_batches_skip_blank_rows_and_keep_sheet_positions(self):
+        frames = list(iter_batches(io.BytesIO(workbook_bytes(self.rows)), 'xlsx', 2))
+
+        self.assertEqual([list(frame.index) for frame in frames], [[0], [2, 3], [5]])
+        self.assertEqual(list(frames[0].columns), ['sid', 'status', 'comments'])
+        self.assertEqual(frames[2].loc[5].tolist(), ['AAD', 'Installation', 'Last'])
+
+    def test_short_rows_are_padded(self):
+        frames = list(iter_batches(io.BytesIO(workbook_bytes(self.rows, dimension=False)), 'xlsx', 2))
+
+        self.assertEqual([list(frame.index) for frame in frames], [[0], [2, 3], [5]])
+        self.assertEqual(frames[1].loc[2].tolist(), ['AAB', None, None])
+        self.assertEqual(frames[1].loc[3].tolist(), ['AAC', 'Installation', None])
+
+    def test_sheet_without_data_rows(self):
+        frames = list(iter_batches(io.BytesIO(workbook_bytes([['sid', 'status']])), 'xlsx', 2))
+
+        self.assertEqual(len(frames), 1)
+        self.assertTrue(frames[0].empty)
+        self.assertEqual(list(frames[0].columns), ['sid', 'status'])
+        self.assertEqual(list(iter_batches(io.BytesIO(workbook_bytes([])), 'xlsx', 2)), [])
+
+
+class ItemImporterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plo = PLO.objects.create(name='PLO')
+        cls.processor = Processor.objects.create(name='Processor')
+        create_items(1, cls.plo, cls.processor)  # sid '000'
+
+    def test_insert_reports_bad_rows_by_sheet_row(self):
+        df = pd.DataFrame([
+            item_row('AAA'),
+            item_row('000'),
+            item_row('AAB', plo='Nobody', processor2='Nothing'),
+            item_row('AAA', status='Unknown'),
+            item_row('AAC', bfs=''),
+        ])
+        report = ItemImporter().run(df)
+
+        self.assertEqual((report.rows, report.created), (5, 1))
+        self.assertEqual(report.errors, [
+            {'row': 3, 'sid': '000', 'errors': ['An item with this sid already exists.']},
+            {'row': 4, 'sid': 'AAB', 'errors': ['Unknown PLO.', 'Unknown processor2.']},
+            {'row': 5, 'sid': 'AAA', 'errors': [
+                'status must be one of: ' + ', '.join(value for value, _ in Item.STATUS_CHOICES) + '.',
+                'Duplicate sid in file.',
+            ]},
+            {'row': 6, 'sid': 'AAC', 'errors': ['bfs is required.']},
+        ])
+        item = Item.objects.get(sid='AAA')
+        self.assertEqual((item.plo_id, item.processor1_id, item.processor2_id), (self.plo.pk, self.processor.pk, None))
+
+    def test_duplicates_across_batches(self):
+        report = ItemImporter().run([pd.DataFrame([item_row('AAA')]), pd.DataFrame([item_row('AAA')], index=[1])])
+        self.assertEqual(report.created, 1)
+        self.assertEqual(report.errors, [{'row': 3, 'sid': 'AAA', 'errors': [
+            'Duplicate sid in file.', 'An item with this sid already exists.',
+        ]}])
+
+    def test_sids_of_list_actions_are_rejected(self):
+        report = ItemImporter().run(pd.DataFrame([item_row('eta'), item_row('AAA')]))
+        self.assertEqual(report.created, 1)
+        self.assertEqual(report.errors, [{'row': 2, 'sid': 'eta', 'errors': ['This sid is reserved.']}])
+
+    def test_missing_columns(self):
+        with self.assertRaisesMessage(ImportFileError, 'Missing columns: sid'):
+            ItemImporter().run(pd.DataFrame([item_row('AAA')]).drop(columns=['sid']))
+
+    def test_one_query_set_per_batch(self):
+        df = pd.DataFrame([item_row(f'A{index:02d}') for index in range(50)])
+        with CaptureQueriesContext(connection) as queries:
+            ItemImporter().run(df)
+        self.assertEqual(Item.objects.count(), 51)
+        self.assertLess(len(queries), 15)
+
+    def test_upsert_splits_creates_updates_and_unchanged(self):
+        ItemImporter().run(pd.DataFrame([item_row('AAA'), item_row('AAB')]))
+        df = pd.DataFrame([
+            item_row('AAA'),
+            item_row('AAB', status='Handedover to PLO', comments='Done'),
+            item_row('AAC'),
+        ])
+        report = ItemImporter(mode='upsert').run(df)
+
+        self.assertEqual((report.created, report.updated, report.unchanged, report.errors), (1, 1, 1, []))
+        updated = Item.objects.get(sid='AAB')
+        self.assertEqual((updated.status, updated.comments), ('Handedover to PLO', 'Done'))
+        self.assertEqual(
+            list(ItemStatusChange.objects.filter(sid='AAB').values_list('from_status', 'to_status')),
+            [(None, 'Installation'), ('Installation', 'Handedover to PLO')],
+        )
+
+    def test_upsert_of_an_unchanged_sheet_writes_nothing(self):
+        ItemImporter().run(pd.DataFrame([item_row('AAA')]))
+        # Saved through the API, blank optional text is '' rather than None
+        Item.objects.filter(sid='AAA').update(comments='', delivery_delay_reason='')
+        change_seq = Item.objects.get(sid='AAA').change_seq
+
+        with CaptureQueriesContext(connection) as queries:
+            report = ItemImporter(mode='upsert').run(pd.DataFrame([item_row('AAA')]))
+
+        self.assertEqual((report.updated, report.unchanged), (0, 1))
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE')])
+        self.assertEqual(Item.objects.get(sid='AAA').change_seq, change_seq)
+
+@override_settings(IMPORT_BATCH_SIZE=2)
+class ImportJobTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        PLO.objects.create(name='PLO')
+        Processor.objects.create(name='Processor')
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+
+    def queue_items(self, sids):
+        rows = [item_row(sid) for sid in sids]
+        content = workbook_bytes([list(rows[0])] + [list(row.values()) for row in rows])
+        return enqueue_import(ImportJob.ITEMS, SimpleUploadedFile('items.xlsx', content))
+
+    def test_failure_reports_the_committed_rows(self):
+        job = self.queue_items(['AAA', '', 'AAC', 'AAD', 'AAE'])
+        import_batch = ItemImporter.import_batch
+        calls = []
+
+        def fail_second_batch(importer, df):
+            calls.append(df)
+            if len(calls) == 2:
+                raise RuntimeError("disk full")
+            return import_batch(importer, df)
+
+        with mock.patch.object(ItemImporter, 'import_batch', fail_second_batch), \
+                self.assertLogs('BuildTrackerApp.jobs', 'ERROR'):
+            self.assertEqual(run_pending_jobs(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.FAILED)
+        self.assertEqual(job.message, "Failed to import data: disk full; rows 2-3 were imported before the failure.")
+        self.assertEqual([error['row'] for error in job.errors], [3])  # the blank sid
+        self.assertEqual((job.rows_processed, job.created_count), (2, 1))
+        self.assertEqual(list(Item.objects.values_list('sid', flat=True)), ['AAA'])
+
+    def test_failure_before_any_commit(self):
+        job = enqueue_import(ImportJob.ITEMS, SimpleUploadedFile('items.xlsx', workbook_bytes([['sid'], ['AAA']])))
+        run_pending_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.FAILED)
+        self.assertTrue(job.message.startswith("Missing columns:"), job.message)
+        self.assertTrue(job.message.endswith("; no rows were imported."))
+
+    @override_settings(IMPORT_JOB_TIMEOUT=60, IMPORT_JOB_MAX_ATTEMPTS=2)
+    def test_stale_running_jobs_are_requeued(self):
+        abandoned = self.queue_items(['AAA', 'AAB', 'AAC'])
+        long_ago = timezone.now() - datetime.timedelta(minutes=5)
+        ImportJob.objects.filter(pk=abandoned.pk).update(status=ImportJob.RUNNING, heartbeat_at=long_ago, attempts=1)
+        running = ImportJob.objects.create(
+            kind=ImportJob.ITEMS, file_name='running.xlsx', status=ImportJob.RUNNING,
+            heartbeat_at=timezone.now(), attempts=1,
+        )
+        exhausted = ImportJob.objects.create(
+            kind=ImportJob.ITEMS, file_name='exhausted.xlsx', status=ImportJob.RUNNING,
+            heartbeat_at=long_ago, attempts=2,
+        )
+
+        with self.assertLogs('BuildTrackerApp.jobs', 'WARNING') as logs:
+            self.assertEqual(run_pending_jobs(), 1)
+
+        self.assertIn("Requeued 1 and failed 1 stale import job(s)", logs.output[0])
+        abandoned.refresh_from_db()
+        self.assertEqual((abandoned.status, abandoned.attempts, abandoned.created_count), (ImportJob.SUCCEEDED, 2, 3))
+        running.refresh_from_db()
+        self.assertEqual(running.status, ImportJob.RUNNING)
+        exhausted.refresh_from_db()
+        self.assertEqual(exhausted.status, ImportJob.FAILED)
+        self.assertIsNotNone(exhausted.finished_at)
+        self.assertEqual(requeue_stale_jobs(), (0, 0))
+
+
+class ListQueryCountTests(TestCase):
+    """
+    Guards against N+1 regressions: every list endpoint must run the same
+    number of queries whether it returns a handful of rows or a full page.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plo = PLO.objects.create(name='PLO')
+        cls.processor = Processor.objects.create(name='Processor')
+        items = create_items(60, cls.plo, cls.processor)
+        create_forecasts(items, cls.plo)
+
+    def assertListQueries(self, url, num):
+        for page_size in (5, 50):
+            # ``num`` counts the list itself; every list also reads its ETag version first
+            with self.assertNumQueries(num + 1):
+                response = self.client.get(url, {'page_size': page_size})
+            self.assertEqual(response.status_code, 200)
+
+    def test_item_list(self):
+        self.assertListQueries('/api/api/item/', 1)
+
+    def test_item_list_with_sparse_fields(self):
+        self.assertListQueries('/api/api/item/?fields=sid,status,plo', 1)
+
+    def test_forecast_list(self):
+        self.assertListQueries('/api/api/forecast/', 1)
+        response = self.client.get('/api/api/forecast/', {'page_size': 5})
+        self.assertEqual(response.json()['results'][0]['item_sid'], '000')
+
+    def test_forecast_list_with_sparse_fields(self):
+        self.assertListQueries('/api/api/forecast/?fields=id,item_sid', 1)
+
+    def test_reference_lists(self):
+        self.assertListQueries('/api/api/plo/', 1)
+        self.assertListQueries('/api/api/processor/', 1)
+
+
+class ListOrderingAndFilterTests(TestCase):
+    """Every ordering field walked through several cursor pages, and the list filters and search."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # PLO names do not follow their ids, so ordering on the name differs from ordering on plo_id
+        cls.plos = [PLO.objects.create(name=name) for name in ('Beta', 'Alpha', 'Gamma')]
+        processor = Processor.objects.create(name='Processor')
+        items = create_items(8, cls.plos[0], processor)
+        statuses = ['Installation', 'REBUILD', 'Cancelled', 'Quality Checks']
+        for index, item in enumerate(items):
+            item.plo = cls.plos[index % 3]
+            item.status = statuses[index % 4]
+            item.hardware = ('GCP', 'Azure')[index % 2]
+            item.flavour = ('S/4H OP', 'S/4 Cloud', 'S/4H Public')[index % 3]
+            item.requested_date = datetime.date(2024, 1, 1 + (index * 5) % 8)
+            item.expected_delivery = datetime.date(2024, 2, 1) + datetime.timedelta(weeks=index % 3)
+            item.revised_delivery_date = None if index % 3 == 0 else datetime.date(2024, 3, index)
+            item.delivery_date = datetime.date(2024, 4, 8 - index)
+            item.description = 'Rack system' if index < 2 else 'Test system'
+        Item.objects.bulk_update(items, [
+            'plo', 'status', 'hardware', 'flavour', 'requested_date', 'expected_delivery',
+            'revised_delivery_date', 'delivery_date', 'description',
+        ])
+        forecasts = create_forecasts(items, cls.plos[0])
+        for index, forecast in enumerate(forecasts):
+            forecast.assigned_to = ('COE', 'ODC', 'TBD')[index % 3]
+            forecast.requester = None if index % 4 == 0 else cls.plos[index % 3]
+            forecast.cw_request_plo = forecast.cw_request_plo_end = 202610 + index % 5
+            forecast.cw_delivered = forecast.cw_delivered_end = None if index % 2 else 202620 - index
+            forecast.time_weeks = None if index % 3 == 1 else index
+        Forecast.objects.bulk_update(forecasts, [
+            'assigned_to', 'requester', 'cw_request_plo', 'cw_request_plo_end',
+            'cw_delivered', 'cw_delivered_end', 'time_weeks',
+        ])
+
+    def walk(self, url, params):
+        """Follow the next links from the first page; returns the rows and the number of pages."""
+        rows, pages = [], 0
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200, response.content)
+            pages += 1
+            rows += response.json()['results']
+            if not response.json()['next']:
+                return rows, pages
+            response = self.client.get(response.json()['next'])
+
+    def assertOrderedPages(self, url, model, fields, keys, id_field='id'):
+        for name in fields:
+            key = keys.get(name, lambda obj, name=name: getattr(obj, name))
+            for descending in (False, True):
+                with self.subTest(ordering=name, descending=descending):
+                    ordering = f"{'-' if descending else ''}{name}"
+                    rows, pages = self.walk(url, {'ordering': ordering, 'page_size': 3})
+                    # Ties are broken on the id, ascending either way
+                    expected = sorted(model.objects.order_by('id'), key=key, reverse=descending)
+                    self.assertGreaterEqual(pages, 3)
+                    self.assertEqual([row[id_field] for row in rows], [getattr(obj, id_field) for obj in expected])
+
+    def test_item_orderings_walk_cursor_pages(self):
+        self.assertOrderedPages('/api/api/item/', Item, ItemViewSet.ordering_fields, {
+            'plo': lambda item: item.plo.name,
+            'revised_delivery_date': lambda item: item.revised_delivery_date or datetime.date.max,
+        }, id_field='sid')
+
+    def test_forecast_orderings_walk_cursor_pages(self):
+        def nulls_last(name):
+            return lambda forecast: INTEGER_MAX if getattr(forecast, name) is None else getattr(forecast, name)
+
+        self.assertOrderedPages('/api/api/forecast/', Forecast, ForecastViewSet.ordering_fields, {
+            'requester': lambda forecast: forecast.requester.name if forecast.requester else '',
+            **{name: nulls_last(name) for name in ('cw_request_plo', 'cw_delivered', 'time_weeks')},
+        })
+
+    def sids(self, url, params):
+        rows, _pages = self.walk(url, params)
+        return sorted(row['sid'] for row in rows)
+
+    def test_item_filters(self):
+        self.assertEqual(self.sids('/api/api/item/', {'status': 'REBUILD'}), ['001', '005'])
+        self.assertEqual(self.sids('/api/api/item/', {'status': 'REBUILD,Cancelled'}), ['001', '002', '005', '006'])
+        self.assertEqual(self.sids('/api/api/item/', {'plo': self.plos[1].pk, 'hardware': 'Azure'}), ['001', '007'])
+        self.assertEqual(
+            self.sids('/api/api/item/', {'expected_delivery__gte': '2024-02-08', 'delivery_date__lte': '2024-04-05'}),
+            ['004', '005', '007'],
+        )
+        response = self.client.get('/api/api/item/', {'requested_date__gte': 'soon'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('requested_date', response.json())
+
+    def test_forecast_filters(self):
+        self.assertEqual(self.sids('/api/api/forecast/', {'assigned_to': 'COE', 'time_weeks__gte': 1}), ['003', '006'])
+        self.assertEqual(self.sids('/api/api/forecast/', {'cw_request': '2026-W13..W14'}), ['003', '004'])
+        self.assertEqual(self.client.get('/api/api/forecast/', {'cw_request': 'W99'}).status_code, 400)
+
+    def test_prefix_search(self):
+        self.assertEqual(self.sids('/api/api/item/', {'search': '00'}), [f'{n:03d}' for n in range(8)])
+        self.assertEqual(self.sids('/api/api/item/', {'search': '007'}), ['007'])
+        self.assertEqual(self.sids('/api/api/item/', {'search': 'Rack'}), ['000', '001'])
+        self.assertEqual(self.sids('/api/api/item/', {'search': 'system'}), [])  # prefix, not substring
+        self.assertEqual(self.sids('/api/api/item/', {'search': 'Rack 001'}), ['001'])  # every term matches
+
+    def test_prefix_search_uses_the_indexes(self):
+        for url, table in (('/api/api/item/', 'item'), ('/api/api/forecast/', 'forecast')):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url, {'search': 'Ra'})
+            sql = queries[-1]['sql']
+            self.assertNotIn(' LIKE ', sql)
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = ' | '.join(row[-1] for row in cursor.fetchall())
+            self.assertIn('MULTI-INDEX OR', plan, plan)
+            self.assertNotIn(f'SCAN BuildTrackerApp_{table}', plan, plan)
+
+
+class CountingEmailBackend(EmailBackend):
+    """locmem backend that records how many connections were opened."""
+    opened = 0
+
+    def open(self):
+        CountingEmailBackend.opened += 1
+        return True
+
+
+class FailingEmailBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionError("mail server unavailable")
+
+
+class OutboxTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.plo = PLO.objects.create(name='PLO')
+        cls.processor = Processor.objects.create(name='Processor')
+
+    def test_handover_is_queued_not_sent(self):
+        item = create_items(1, self.plo, self.processor)[0]
+        item.status = 'Handedover to PLO'
+        item.save()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxEmail.objects.filter(status=OutboxEmail.PENDING).count(), 1)
+
+    def test_only_status_transitions_notify(self):
+        item = create_items(1, self.plo, self.processor)[0]
+        item.comments = 'Edited before handover'
+        item.save()
+        self.assertFalse(OutboxEmail.objects.exists())
+
+        item.status = 'Handedover to PLO'
+        item.save()
+        item = Item.objects.get(pk=item.pk)
+        item.comments = 'Edited after handover'
+        item.save()
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+
+    def test_notifications_are_coalesced_per_sid(self):
+        item = create_items(1, self.plo, self.processor)[0]
+        for status in ('Handedover to PLO', 'REBUILD', 'Handedover to PLO'):
+            item.status = status
+            item.save()
+        message = OutboxEmail.objects.get()
+        self.assertEqual(message.dedupe_key, f'item-status:{item.sid}')
+        self.assertGreater(message.next_attempt_at, timezone.now())
+
+    @override_settings(EMAIL_BACKEND='BuildTrackerApp.tests.CountingEmailBackend')
+    def test_due_emails_share_one_connection(self):
+        CountingEmailBackend.opened = 0
+        for index in range(3):
+            queue_email(f'Subject {index}', 'Body', ['someone@example.com'], html_body='<p>Body</p>')
+
+        self.assertEqual(send_due_emails(), (3, 0))
+        self.assertEqual(CountingEmailBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+        self.assertFalse(OutboxEmail.objects.exclude(status=OutboxEmail.SENT).exists())
+
+    @override_settings(
+        EMAIL_BACKEND='BuildTrackerApp.tests.FailingEmailBackend',
+        OUTBOX_RETRY_BASE_SECONDS=60, OUTBOX_MAX_ATTEMPTS=2,
+    )
+    def test_failures_back_off_then_give_up(self):
+        message = queue_email('Subject', 'Body', ['someone@example.com'])
+
+        self.assertEqual(send_due_emails(), (0, 1))
+        message.refresh_from_db()
+        self.assertEqual(message.status, OutboxEmail.PENDING)
+        self.assertEqual(message.attempts, 1)
+        self.assertGreater(message.next_attempt_at, timezone.now() + datetime.timedelta(seconds=50))
+
+        # Not due yet, so nothing is attempted
+        self.assertEqual(send_due_emails(), (0, 0))
+
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(send_due_emails(), (0, 1))
+        message.refresh_from_db()
+        self.assertEqual(message.status, OutboxEmail.FAILED)
+
+    def test_messages_claimed_by_another_run_are_not_sent(self):
+        taken, free = (queue_email(subject, 'Body', ['someone@example.com']) for subject in ('Taken', 'Free'))
+
+        def competing_run(execute, sql, params, many, context):
+            # Another worker claims one of the rows between this run's select and its claim
+            if sql.startswith('UPDATE') and 'claim_token' in sql and not competing_run.done:
+                competing_run.done = True
+                OutboxEmail.objects.filter(pk=taken.pk).update(status=OutboxEmail.SENDING, claimed_at=timezone.now())
+            return execute(sql, params, many, context)
+        competing_run.done = False
+
+        with connection.execute_wrapper(competing_run):
+            self.assertEqual(send_due_emails(), (1, 0))
+        self.assertEqual([email.subject for email in mail.outbox], ['Free'])
+        self.assertEqual(OutboxEmail.objects.get(pk=taken.pk).status, OutboxEmail.SENDING)
+        self.assertEqual(send_due_emails(), (0, 0))
+
+    @override_settings(OUTBOX_CLAIM_TIMEOUT=600)
+    def test_claims_of_a_stopped_worker_are_requeued(self):
+        message = queue_email('Subject', 'Body', ['someone@example.com'])
+        OutboxEmail.objects.update(
+            status=OutboxEmail.SENDING, claimed_at=timezone.now() - datetime.timedelta(seconds=300),
+        )
+        self.assertEqual(send_due_emails(), (0, 0))
+
+        OutboxEmail.objects.update(claimed_at=timezone.now() - datetime.timedelta(seconds=900))
+        with self.assertLogs('BuildTrackerApp.outbox', 'WARNING'):
+            self.assertEqual(send_due_emails(), (1, 0))
+        message.refresh_from_db()
+        self.assertEqual(message.status, OutboxEmail.SENT)
+
+
+class StageDwellTests(TestCase):
+
+    def setUp(self):
+        plo = PLO.objects.create(name='PLO')
+        processor = Processor.objects.create(name='Processor')
+        self.items = create_items(3, plo, processor)
+        self.start = timezone.now() - datetime.timedelta(days=10)
+        record_transitions([StatusTransition(item, None, 'Installation', self.start) for item in self.items])
+
+    def move(self, item, status, hours):
+        record_transitions([StatusTransition(item, item.status, status, self.start + datetime.timedelta(hours=hours))])
+        item.status = status
+
+    def test_transitions_are_logged(self):
+        self.move(self.items[0], 'Post Installation', 5)
+        self.assertEqual(
+            list(self.items[0].status_changes.order_by('changed_at').values_list('from_status', 'to_status')),
+            [(None, 'Installation'), ('Installation', 'Post Installation')],
+        )
+
+    def test_dwell_summary(self):
+        for item, hours in zip(self.items, (3, 10, 30)):
+            self.move(item, 'Post Installation', hours)
+        self.move(self.items[0], 'Handedover to PLO', 3 + 48)
+
+        with self.assertNumQueries(1):
+            summary = stage_dwell_summary()
+        installation, post_installation = summary
+        self.assertEqual(installation['stage'], 'Installation')
+        self.assertEqual(installation['count'], 3)
+        self.assertAlmostEqual(installation['mean_hours'], 43 / 3, places=2)
+        self.assertEqual((installation['min_hours'], installation['max_hours']), (3, 30))
+        self.assertTrue(8 <= installation['p50_hours'] <= 12)
+        self.assertEqual(post_installation['count'], 1)
+        self.assertEqual(post_installation['p95_hours'], 48)
+
+    def test_summary_merges_the_groups_it_does_not_split_by(self):
+        self.items[1].flavour = 'S/4 Cloud'
+        for item, hours in zip(self.items, (3, 10, 30)):
+            self.move(item, 'Post Installation', hours)
+
+        installation = stage_dwell_summary()[0]
+        self.assertEqual((installation['min_hours'], installation['max_hours']), (3, 30))
+        by_flavour = {row['flavour']: (row['min_hours'], row['max_hours'])
+                      for row in stage_dwell_summary(['flavour']) if row['stage'] == 'Installation'}
+        self.assertEqual(by_flavour, {'S/4H OP': (3, 30), 'S/4 Cloud': (10, 10)})
+
+    def test_endpoint_groups_by_dimension(self):
+        self.move(self.items[0], 'Post Installation', 5)
+        response = self.client.get('/api/api/item/stage-stats/', {'group_by': 'flavour,hardware'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['flavour'], 'S/4H OP')
+        self.assertEqual(response.json()[0]['hardware'], 'GCP')
+        response = self.client.get('/api/api/item/stage-stats/', {'group_by': 'status'})
+        self.assertEqual(response.status_code, 400)
+
+
+class EtaTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.plo = PLO.objects.create(name='PLO')
+        self.processor = Processor.objects.create(name='Processor')
+
+    def deliver(self, items, size, days):
+        for item in items:
+            item.t_shirt_size = size
+            item.status = 'Handedover to PLO'
+            item.delivery_date = item.requested_date + datetime.timedelta(days=days)
+        Item.objects.bulk_update(items, ['t_shirt_size', 'status', 'delivery_date'])
+
+    def test_predicts_duration_by_size(self):
+        items = create_items(40, self.plo, self.processor)
+        self.deliver(items[:20], 'Small', 10)
+        self.deliver(items[20:38], 'Large', 40)
+        Item.objects.filter(pk=items[39].pk).update(t_shirt_size='Large')
+
+        predictions = {row['sid']: row for row in predict_open_items()}
+        self.assertEqual(set(predictions), {items[38].sid, items[39].sid})
+        # Requested in 2024, so both are overdue and expected today at the earliest
+        self.assertEqual(predictions[items[38].sid]['predicted_delivery'], timezone.localdate())
+        self.assertAlmostEqual(predictions[items[38].sid]['predicted_days'], predictions[items[39].sid]['predicted_days'])
+
+        model = get_model()
+        X = design_matrix(feature_columns([
+            (datetime.date(2024, 1, 1), 2, 'Standard', 'S/4H OP', size, 'GCP', 'Single') for size in ('Small', 'Large')
+        ]))
+        small, large = model.predict_days(X)
+        self.assertAlmostEqual(small, 10, delta=1)
+        self.assertAlmostEqual(large, 40, delta=1)
+
+    def test_newly_delivered_items_are_folded_in(self):
+        items = create_items(30, self.plo, self.processor)
+        self.deliver(items[:10], 'Small', 10)
+        get_model()
+        self.deliver(items[10:20], 'Large', 40)
+        with self.assertNumQueries(2):
+            incremental = get_model()
+        self.assertEqual(incremental.count, 20)
+        cache.clear()
+        np.testing.assert_allclose(incremental.coef, get_model().coef, atol=1e-9)
+
+    def test_edits_to_learned_items_refit_the_model(self):
+        items = create_items(30, self.plo, self.processor)
+        self.deliver(items[:20], 'Small', 10)
+        get_model()
+        self.deliver(items[:20], 'Small', 30)
+        refitted = get_model()
+        self.assertEqual(refitted.count, 20)
+        self.assertAlmostEqual(refitted.predict_days(design_matrix(feature_columns([
+            (datetime.date(2024, 1, 1), 2, 'Standard', 'S/4H OP', 'Small', 'GCP', 'Single'),
+        ])))[0], 30, delta=1)
+        with self.assertNumQueries(1):
+            get_model()
+
+    def test_no_prediction_without_delivered_items(self):
+        items = create_items(2, self.plo, self.processor)
+        response = self.client.get('/api/api/item/eta/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['sid'], row['predicted_delivery'], row['predicted_days']) for row in response.json()],
+            [(items[0].sid, None, None), (items[1].sid, None, None)],
+        )
+
+    def test_backtest_command(self):
+        items = create_items(30, self.plo, self.processor)
+        for index, item in enumerate(items):
+            self.deliver([item], 'Small', 10 + index % 3)
+        out = io.StringIO()
+        call_command('backtest_eta', folds=3, stdout=out)
+        self.assertIn('Overall MAE', out.getvalue())
+
+
+class CapacityTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plo = PLO.objects.create(name='PLO')
+        cls.processor = Processor.objects.create(name='Processor')
+        cls.other = Processor.objects.create(name='Other')
+        items = create_items(4, cls.plo, cls.processor)
+        Item.objects.filter(pk=items[3].pk).update(processor2=cls.other)
+        cls.forecasts = create_forecasts(items, cls.plo)
+        # Weeks 10-13 for three COE forecasts, 12-13 for one ODC forecast with two parallel clients
+        Forecast.objects.filter(pk__in=[f.pk for f in cls.forecasts[:3]]).update(assigned_to='COE')
+        Forecast.objects.filter(pk=cls.forecasts[3].pk).update(
+            assigned_to='ODC', cw_request_plo=202612, cw_request_plo_end=202612, time_weeks=None,
+            cw_delivered=202613, cw_delivered_end=202613, parallel_processing=True,
+        )
+
+    @override_settings(CAPACITY_TEAM_SLOTS={'COE': 2, 'ODC': 2}, CAPACITY_PROCESSOR_SLOTS=3)
+    def test_load_profile(self):
+        plan = simulate(load_demand())
+        self.assertEqual(plan['weeks'], ['2026-W10', '2026-W11', '2026-W12', '2026-W13'])
+        self.assertEqual(plan['teams']['COE']['load'], [3, 3, 3, 3])
+        self.assertEqual(plan['teams']['COE']['overcommitted_weeks'], plan['weeks'])
+        self.assertEqual(plan['teams']['ODC']['load'], [0, 0, 2, 2])
+        self.assertEqual(plan['teams']['ODC']['overcommitted_weeks'], [])
+        self.assertEqual(plan['teams']['TBD']['capacity'], None)
+        # The last item shares its two slots between both processors
+        self.assertEqual(plan['processors']['Processor']['load'], [3, 3, 4, 4])
+        self.assertEqual(plan['processors']['Processor']['overcommitted_weeks'], ['2026-W12', '2026-W13'])
+        self.assertEqual(plan['processors']['Other']['load'], [0, 0, 1, 1])
+
+    @override_settings(CAPACITY_TEAM_SLOTS={'COE': 2, 'ODC': 2})
+    def test_what_if(self):
+        response = self.client.post('/api/api/forecast/capacity/', {
+            'changes': [{'id': self.forecasts[0].pk, 'assigned_to': 'ODC', 'cw_request_plo': '2026-W52'}],
+            'add': [{'assigned_to': 'COE', 'cw_request_plo': '2026-W11', 'time_weeks': 1, 'processor1': 'Other'}],
+            'remove': [self.forecasts[1].pk],
+            'team_capacity': {'ODC': 3},
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        plan = response.json()
+        # Four weeks from 2026-W52 run into the next year; 2026 has 53 weeks
+        self.assertEqual(plan['weeks'][-4:], ['2026-W52', '2026-W53', '2027-W01', '2027-W02'])
+        self.assertEqual(len(plan['weeks']), 46)
+        self.assertEqual(plan['teams']['COE']['load'][:5], [1, 2, 1, 1, 0])
+        self.assertEqual(plan['teams']['ODC']['load'][-4:], [1, 1, 1, 1])
+        self.assertEqual(plan['teams']['ODC']['capacity'], 3)
+        self.assertEqual(Forecast.objects.get(pk=self.forecasts[0].pk).assigned_to, 'COE')
+
+        response = self.client.post('/api/api/forecast/capacity/', {
+            'changes': [{'id': self.forecasts[0].pk, 'processor1': 'Nobody'}],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_what_if_is_fast_for_thousands_of_forecasts(self):
+        items = create_items(300, self.plo, self.processor, start=100)
+        Forecast.objects.bulk_create([
+            Forecast(item=items[index % 300], sid=items[index % 300].sid, bfs='Single', assigned_to='COE',
+                     cw_request_plo=202601 + index % 50, time_weeks=1 + index % 8, clients=index % 4,
+                     parallel_processing=bool(index % 2))
+            for index in range(3000)
+        ])
+        demand = load_demand()
+        started = time.perf_counter()
+        for week in range(20):
+            plan = simulate(apply_scenario(demand, changes=[{'id': int(demand['id'][0]), 'cw_request_plo': week + 1}]))
+        self.assertLess((time.perf_counter() - started) / 20, 0.1)
+        self.assertEqual(plan['forecasts'], 3004)
+
+
+class CalendarWeekTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        plo = PLO.objects.create(name='PLO')
+        processor = Processor.objects.create(name='Processor')
+        cls.forecasts = create_forecasts(create_items(4, plo, processor), plo)
+        for forecast, (first, last) in zip(cls.forecasts, [(202608, 202609), (202609, 202611), (202614, 202620), (202652, 202702)]):
+            forecast.cw_request_plo, forecast.cw_request_plo_end = first, last
+        Forecast.objects.bulk_update(cls.forecasts, ['cw_request_plo', 'cw_request_plo_end'])
+
+    def test_parse_weeks(self):
+        self.assertEqual(parse_weeks('10', 2026), (202610, 202610))
+        self.assertEqual(parse_weeks('CW 10-14', 2026), (202610, 202614))
+        self.assertEqual(parse_weeks('10,11,12', 2026), (202610, 202612))
+        self.assertEqual(parse_weeks('2026-W52..W02'), (202652, 202702))
+        self.assertEqual(parse_weeks(['10', 11], 2026), (202610, 202611))
+        self.assertEqual(parse_weeks(''), (None, None))
+        with self.assertRaises(ValueError):
+            parse_weeks('2025-W53')
+        with self.assertRaises(ValueError):
+            parse_weeks('soon')
+
+    def test_range_query_returns_overlapping_forecasts(self):
+        response = self.client.get('/api/api/forecast/', {'cw_request': '2026-W10..W14'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row['cw_request_plo'] for row in response.json()['results']],
+            ['2026-W09..2026-W11', '2026-W14..2026-W20'],
+        )
+        response = self.client.get('/api/api/forecast/', {'cw_request': '2027-W01'})
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.forecasts[3].pk])
+        self.assertEqual(self.client.get('/api/api/forecast/', {'cw_request': 'W99'}).status_code, 400)
+
+    def test_serializer_accepts_week_ranges(self):
+        forecast = self.forecasts[0]
+        response = self.client.patch(
+            f'/api/api/forecast/{forecast.pk}/', {'partial': True, 'cw_request_plo': '2026-W30..W32', 'cw_delivered': ['2026-W33', '2026-W34']},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        forecast.refresh_from_db()
+        self.assertEqual((forecast.cw_request_plo, forecast.cw_request_plo_end), (202630, 202632))
+        self.assertEqual((forecast.cw_delivered, forecast.cw_delivered_end), (202633, 202634))
+
+
+class ItemStatsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.plo = PLO.objects.create(name='PLO')
+        self.processor = Processor.objects.create(name='Processor')
+        self.items = create_items(4, self.plo, self.processor)
+        Item.objects.filter(sid='001').update(delivery_date=datetime.date(2024, 1, 20))
+        Item.objects.filter(sid='002').update(delivery_date=datetime.date(2024, 3, 1))
+        Item.objects.filter(sid='003').update(
+            expected_delivery=datetime.date(2999, 1, 1), processor2=Processor.objects.create(name='Second'),
+        )
+
+    def stats(self):
+        response = self.client.get('/api/api/item/stats/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_stats(self):
+        stats = self.stats()
+
+        self.assertEqual(stats['total'], 4)
+        self.assertEqual(stats['by_status']['Installation'], 4)
+        self.assertEqual(stats['by_status']['REBUILD'], 0)
+        self.assertEqual(stats['by_plo'], {'PLO': 4})
+        self.assertEqual(stats['by_processor'], {'Processor': 4, 'Second': 1})
+        self.assertEqual(stats['delivery'], {'on_time': 1, 'delayed': 1, 'open': 1, 'overdue': 1})
+
+    def test_served_from_cache_until_a_write_commits(self):
+        self.stats()
+        Item.objects.filter(sid='000').update(status='REBUILD')  # no signal: the cached numbers stay
+        self.assertEqual(self.stats()['by_status']['REBUILD'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            item = Item.objects.get(sid='001')
+            item.status = 'Cancelled'
+            item.save()
+        stats = self.stats()
+        self.assertEqual((stats['by_status']['REBUILD'], stats['by_status']['Cancelled']), (1, 1))
+
+    def test_bulk_import_invalidates(self):
+        self.stats()
+        with self.captureOnCommitCallbacks(execute=True):
+            ItemImporter().run(pd.DataFrame([item_row('AAA'), item_row('AAB')]))
+        self.assertEqual(self.stats()['total'], 6)
+
+    def test_bulk_update_invalidates(self):
+        self.stats()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                '/api/api/item/bulk/', [{'sid': '000', 'status': 'REBUILD'}], content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stats()['by_status']['REBUILD'], 1)
+
+    def test_delete_invalidates(self):
+        self.stats()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete('/api/api/item/003/').status_code, 204)
+        stats = self.stats()
+        self.assertEqual((stats['total'], stats['by_processor']), (3, {'Processor': 3}))
+
+
+class BulkWriteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plo = PLO.objects.create(name='PLO')
+        cls.processor = Processor.objects.create(name='Processor')
+        cls.items = create_items(60, cls.plo, cls.processor)
+        cls.forecasts = create_forecasts(cls.items, cls.plo)
+
+    def send(self, method, url, records):
+        return getattr(self.client, method)(url, records, content_type='application/json')
+
+    def item_record(self, sid, **values):
+        record = {
+            'sid': sid, 'requested_date': '2024-01-01', 'flavour': 'S/4H OP', 'estimated_clients': 1,
+            'bfs': 'Single', 't_shirt_size': 'Small', 'landscape': 'Test', 'hardware': 'GCP',
+            'setup': 'Standard', 'plo': self.plo.pk, 'processor1': self.processor.pk, 'status': 'Installation',
+            'description': 'New', 'expected_delivery': '2024-02-01', 'system_type': 'Test',
+        }
+        record.update(values)
+        return record
+
+    def test_create_reports_each_record(self):
+        response = self.send('post', '/api/api/item/bulk/', [
+            self.item_record('N01'),
+            self.item_record('000'),  # taken
+            self.item_record('N02', plo=9999),
+            self.item_record('N01'),  # duplicate in the request
+            self.item_record('N03'),
+        ])
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['created'], body['error']), (2, 3))
+        self.assertEqual([result['status'] for result in body['results']], ['created', 'error', 'error', 'error', 'created'])
+        self.assertIn('sid', body['results'][1]['errors'])
+        self.assertIn('plo', body['results'][2]['errors'])
+        self.assertTrue(Item.objects.filter(sid__in=['N01', 'N03']).count() == 2)
+        self.assertEqual(ItemStatusChange.objects.filter(sid='N01').count(), 1)
+
+    def test_sids_of_list_actions_are_rejected(self):
+        response = self.client.post('/api/api/item/', self.item_record('eta'), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('sid', response.json())
+        body = self.send('post', '/api/api/item/bulk/', [self.item_record('eta'), self.item_record('N01')]).json()
+        self.assertEqual([result['status'] for result in body['results']], ['error', 'created'])
+        # The detail route never matches an action path, whatever Items exist
+        self.assertEqual(reverse('item-detail', kwargs={'sid': '000'}), '/api/api/item/000/')
+        with self.assertRaises(NoReverseMatch):
+            reverse('item-detail', kwargs={'sid': 'eta'})
+
+    def test_update_query_count_does_not_grow_with_records(self):
+        def update(items, status):
+            records = [{'sid': item.sid, 'status': status, 'delivered_clients': 2} for item in items]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.send('patch', '/api/api/item/bulk/', records)
+            self.assertEqual(response.json()['updated'], len(items))
+            return len(queries)
+
+        self.assertEqual(update(self.items[:5], 'Post Installation'), update(self.items[5:55], 'Post Installation'))
+        self.assertEqual(Item.objects.filter(status='Post Installation').count(), 55)
+        self.assertEqual(ItemStatusChange.objects.filter(to_status='Post Installation').count(), 55)
+
+    def test_patch_compares_foreign_keys_without_loading_them(self):
+        other = PLO.objects.create(name='Other')
+        plos.get()  # warm the reference cache, like a running server
+        records = [{'sid': item.sid, 'plo': other.pk} for item in self.items[:30]]
+        records += [{'sid': item.sid, 'plo': self.plo.pk} for item in self.items[30:]]
+        # items by sid + taken sids + savepoint + change sequence (2) + bulk update + release; no PLO per record
+        with self.assertNumQueries(7):
+            response = self.send('patch', '/api/api/item/bulk/', records)
+        body = response.json()
+        self.assertEqual((body['updated'], body['unchanged']), (30, 30))
+        self.assertEqual(Item.objects.filter(plo=other).count(), 30)
+
+    def test_malformed_lookup_values_are_record_errors(self):
+        response = self.send('patch', '/api/api/item/bulk/', [
+            {'sid': ['000'], 'comments': 'List'},
+            {'sid': {'sid': '001'}, 'comments': 'Object'},
+            {'comments': 'Missing'},
+            {'sid': '002', 'comments': 'Valid'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([result['status'] for result in body['results']], ['error', 'error', 'error', 'updated'])
+        self.assertEqual(body['results'][0]['errors'], {'sid': ['Invalid value.']})
+        self.assertEqual(body['results'][2]['errors'], {'sid': ['This field is required.']})
+
+        response = self.send('delete', '/api/api/forecast/bulk/', [
+            [self.forecasts[0].pk], {'id': 'abc'}, str(self.forecasts[1].pk), True,
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], ['error', 'error', 'deleted', 'error'])
+        self.assertIn('id', results[1]['errors'])
+        self.assertEqual(Forecast.objects.count(), 59)
+
+    def test_forecast_patch_resolves_item_sids_in_one_query(self):
+        records = [
+            {'id': forecast.pk, 'item_sid': self.items[-1 - index].sid, 'clients': 7}
+            for index, forecast in enumerate(self.forecasts[:20])
+        ]
+        records.append({'id': self.forecasts[20].pk, 'item_sid': 'ZZZ'})
+        records.append({'id': 0, 'clients': 1})
+        # savepoint + forecasts + items by sid + change sequence (2) + bulk update + release
+        with self.assertNumQueries(7):
+            response = self.send('patch', '/api/api/forecast/bulk/', records)
+        body = response.json()
+        self.assertEqual((body['updated'], body['error']), (20, 2))
+        self.assertEqual(body['results'][20]['errors'], {'item_sid': ["Item with SID 'ZZZ' does not exist."]})
+        self.assertEqual(Forecast.objects.get(pk=self.forecasts[0].pk).item_id, self.items[-1].pk)
+
+    @override_settings(BULK_MAX_RECORDS=50)
+    def test_every_method_is_capped(self):
+        for method, records in (
+            ('post', [self.item_record(f'N{index:02d}') for index in range(51)]),
+            ('patch', [{'sid': item.sid, 'comments': 'Capped'} for item in self.items[:51]]),
+            ('delete', [item.sid for item in self.items[:51]]),
+        ):
+            with self.subTest(method=method):
+                response = self.send(method, '/api/api/item/bulk/', records)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': "At most 50 records per request."})
+        self.assertEqual(Item.objects.count(), 60)
+        self.assertFalse(Item.objects.filter(comments='Capped').exists())
+
+    def test_delete(self):
+        response = self.send('delete', '/api/api/forecast/bulk/', [self.forecasts[0].pk, self.forecasts[1].pk, 0])
+        self.assertEqual([result['status'] for result in response.json()['results']], ['deleted', 'deleted', 'error'])
+        self.assertEqual(Forecast.objects.count(), 58)
+
+
+class ExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plo = PLO.objects.create(name='PLO')
+        cls.processor = Processor.objects.create(name='Processor')
+        cls.items = create_items(30, cls.plo, cls.processor)
+        Item.objects.filter(pk__in=[item.pk for item in cls.items[:10]]).update(status='REBUILD')
+        create_forecasts(cls.items, cls.plo)
+
+    def download(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_honours_list_filters(self):
+        content = self.download('/api/api/item/export/', format='csv', status='REBUILD', ordering='-sid')
+        rows = list(csv.reader(io.StringIO(content.decode('utf-8-sig'))))
+        self.assertEqual(rows[0][:3], ['sid', 'requested_date', 'flavour'])
+        self.assertEqual([row[0] for row in rows[1:]], [f'{index:03d}' for index in range(9, -1, -1)])
+        self.assertEqual(rows[1][10], 'PLO')
+
+    def test_xlsx_round_trips_through_the_importer(self):
+        content = self.download('/api/api/item/export/', format='xlsx')
+        frames = iter_batches(io.BytesIO(content), 'xlsx', 500)
+        report = ItemImporter(mode='upsert').run(frames)
+        self.assertEqual((report.rows, report.unchanged, report.errors), (30, 30, []))
+
+    def test_forecast_export_formats_calendar_weeks(self):
+        content = self.download('/api/api/forecast/export/', format='xlsx')
+        sheet = openpyxl.load_workbook(io.BytesIO(content), read_only=True).active
+        header, first = list(sheet.iter_rows(max_row=2, values_only=True))
+        self.assertEqual(dict(zip(header, first))['cw_request_plo'], '2026-W10')
+
+    def test_unknown_format(self):
+        response = self.client.get('/api/api/item/export/', {'format': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('format', response.json()['error'])
+
+
+class SyncTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plo = PLO.objects.create(name='PLO')
+        cls.processor = Processor.objects.create(name='Processor')
+        cls.items = create_items(20, cls.plo, cls.processor)
+        cls.forecasts = create_forecasts(cls.items, cls.plo)
+
+    def sync(self, since=None):
+        response = self.client.get('/api/sync/', {} if since is None else {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_returns_only_what_changed_since_the_token(self):
+        first = self.sync()
+        self.assertTrue(first['reset'])
+        self.assertEqual((len(first['changed']['item']), len(first['changed']['forecast'])), (20, 20))
+
+        item = Item.objects.get(sid='003')
+        item.comments = 'Updated'
+        item.save()
+        deleted_forecast = self.forecasts[0].pk
+        self.forecasts[0].delete()
+        Item.objects.filter(sid__in=['010', '011']).update(status='REBUILD')
+
+        second = self.sync(first['token'])
+        self.assertFalse(second['reset'])
+        self.assertEqual(sorted(row['sid'] for row in second['changed']['item']), ['003', '010', '011'])
+        self.assertEqual(second['changed']['forecast'], [])
+        self.assertEqual(second['deleted']['forecast'], [deleted_forecast])
+        self.assertEqual(self.sync(second['token'])['changed']['item'], [])
+
+    def test_pages_keep_rows_sharing_a_number_together(self):
+        token = changes_since()['token']
+        Item.objects.filter(sid__lt='005').update(comments='Same change')  # one number for five rows
+        Item.objects.filter(sid='010').delete()
+        pages = [changes_since(int(token), limit=2)]
+        while pages[-1]['more']:
+            pages.append(changes_since(int(pages[-1]['token']), limit=2))
+        self.assertEqual([len(page['changed']['item']) for page in pages], [5, 0])
+        self.assertEqual([page['deleted']['item'] for page in pages], [[], ['010']])
+        self.assertEqual(len(pages[1]['deleted']['forecast']), 1)
+
+    def test_pruned_tombstones_force_a_full_resync(self):
+        token = self.sync()['token']
+        self.forecasts[1].delete()
+        SyncTombstone.objects.update(deleted_at=timezone.now() - datetime.timedelta(days=40))
+        self.assertEqual(prune_tombstones(days=30), 1)
+        result = self.sync(token)
+        self.assertTrue(result['reset'])
+        self.assertEqual(len(result['changed']['forecast']), 19)
+
+    def test_rejects_malformed_token(self):
+        response = self.client.get('/api/sync/', {'since': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plo = PLO.objects.create(name='PLO')
+        cls.processor = Processor.objects.create(name='Processor')
+        cls.items = create_items(5, cls.plo, cls.processor)
+        create_forecasts(cls.items, cls.plo)
+
+    def test_unchanged_lookup_list_costs_one_query(self):
+        etag = self.client.get('/api/api/plo/')['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/api/plo/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        PLO.objects.create(name='Other')
+        response = self.client.get('/api/api/plo/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_tag_follows_every_table_in_the_response(self):
+        url = '/api/api/forecast/'
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(self.client.get(url, {'sid': '001'})['ETag'], etag)
+
+        item = self.items[1]
+        item.sid = 'X01'
+        item.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        etag = self.client.get(url)['ETag']
+        Forecast.objects.filter(item=item).delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_detail(self):
+        etag = self.client.get('/api/api/item/002/')['ETag']
+        self.assertEqual(self.client.get('/api/api/item/002/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertFalse(self.client.get('/api/api/item/ZZZ/').has_header('ETag'))
+
+
+class ReferenceTableTests(TransactionTestCase):
+    """Committed rows, since an uncommitted change is only ever seen by its own transaction."""
+
+    def setUp(self):
+        self.plo = PLO.objects.create(name='PLO')
+        self.processor = Processor.objects.create(name='Processor')
+        create_items(5, self.plo, self.processor)
+
+    def tearDown(self):
+        # The flush after each test sends no delete signals
+        plos.publish()
+        processors.publish()
+
+    def reference_queries(self, queries):
+        return [query['sql'] for query in queries if '"BuildTrackerApp_plo"' in query['sql']
+                or '"BuildTrackerApp_processor"' in query['sql']]
+
+    def test_writes_resolve_references_without_queries(self):
+        plos.get(), processors.get()
+        content = b''.join(self.client.get('/api/api/item/export/', {'format': 'xlsx'}).streaming_content)
+        record = {
+            'sid': 'NEW', 'requested_date': '2024-01-01', 'flavour': 'S/4H OP', 'estimated_clients': 1,
+            'bfs': 'Single', 't_shirt_size': 'Small', 'landscape': 'Test', 'hardware': 'GCP', 'setup': 'Standard',
+            'plo': self.plo.pk, 'processor1': self.processor.pk, 'processor2': self.processor.pk,
+            'status': 'Installation', 'description': 'New', 'expected_delivery': '2024-02-01', 'system_type': 'Test',
+        }
+        with CaptureQueriesContext(connection) as queries:
+            report = ItemImporter(mode='upsert').run(iter_batches(io.BytesIO(content), 'xlsx', 500))
+            response = self.client.post('/api/api/item/', record, content_type='application/json')
+        self.assertEqual((report.unchanged, response.status_code), (5, 201))
+        self.assertEqual(self.reference_queries(queries), [])
+
+    def test_bulk_writes_check_the_version_once(self):
+        records = [{
+            'sid': f'N{index:02d}', 'requested_date': '2024-01-01', 'flavour': 'S/4H OP', 'estimated_clients': 1,
+            'bfs': 'Single', 't_shirt_size': 'Small', 'landscape': 'Test', 'hardware': 'GCP', 'setup': 'Standard',
+            'plo': self.plo.pk, 'processor1': self.processor.pk, 'processor2': self.processor.pk,
+            'status': 'Installation', 'description': 'New', 'expected_delivery': '2024-02-01', 'system_type': 'Test',
+        } for index in range(20)]
+        with mock.patch('BuildTrackerApp.references.cache.get', wraps=cache.get) as cache_get:
+            response = self.client.post('/api/api/item/bulk/', records, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Item.objects.filter(sid__startswith='N').count(), 20)
+        keys = [call.args[0] for call in cache_get.call_args_list]
+        # One read per foreign key field: plo, processor1 and processor2
+        self.assertEqual((keys.count(plos.version_key), keys.count(processors.version_key)), (1, 2))
+
+    def test_changes_are_seen_immediately(self):
+        self.assertEqual(plos.get().ids, {'PLO': self.plo.pk})
+        self.plo.name = 'Renamed'
+        self.plo.save()
+        Processor.objects.create(name='Second')
+        self.assertEqual(plos.get().names, {self.plo.pk: 'Renamed'})
+        self.assertEqual(set(processors.get().ids), {'Processor', 'Second'})
+        self.assertEqual(plos.get().instance(self.plo.pk).name, 'Renamed')
+
+    def test_rolled_back_changes_are_never_cached(self):
+        with transaction.atomic():
+            self.plo.name = 'Uncommitted'
+            self.plo.save()
+            self.assertEqual(plos.get().names, {self.plo.pk: 'Uncommitted'})
+            transaction.set_rollback(True)
+        self.assertEqual(plos.get().names, {self.plo.pk: 'PLO'})
+
+    def test_changes_rolled_back_to_a_savepoint_are_forgotten(self):
+        with transaction.atomic():
+            self.plo.name = 'Kept'
+            self.plo.save()
+            with transaction.atomic():
+                Processor.objects.create(name='Dropped')
+                transaction.set_rollback(True)
+            self.assertEqual(plos.get().names, {self.plo.pk: 'Kept'})
+            self.assertEqual(set(processors.get().ids), {'Processor'})
+        self.assertEqual(plos.get().names, {self.plo.pk: 'Kept'})
+
+
+class PerfMiddlewareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        PLO.objects.create(name='PLO')
+        cls.admin = User.objects.create_user('admin', password='x', is_staff=True)
+
+    def setUp(self):
+        perf.samples.clear()
+
+    def test_server_timing_header(self):
+        response = self.client.get('/api/api/plo/')
+        metrics = dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+        self.assertEqual(set(metrics), {'db', 'view', 'render', 'total'})
+        self.assertIn('desc="2 queries"', metrics['db'])  # ETag version + list
+
+    def test_summary_per_route(self):
+        for _ in range(3):
+            self.client.get('/api/api/plo/')
+        self.client.get('/api/api/processor/')
+        self.assertEqual(self.client.get('/api/_perf/').status_code, 401)
+
+        token = RefreshToken.for_user(self.admin).access_token
+        summary = self.client.get('/api/_perf/', HTTP_AUTHORIZATION=f'Bearer {token}').json()
+        routes = {entry['route']: entry for entry in summary['routes']}
+        self.assertEqual(routes['GET plo-list']['count'], 3)
+        self.assertEqual(routes['GET plo-list']['queries']['p50'], 2)
+        self.assertEqual(set(routes['GET processor-list']['total_ms']), {'p50', 'p95', 'p99'})
+        self.assertGreater(routes['GET plo-list']['bytes']['p50'], 0)
+
+    def test_log_directory_is_created_with_the_first_line(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, 'logs', 'perf.log')
+            handler = perf.PerfLogFileHandler(path, maxBytes=1024, backupCount=1)
+            self.assertFalse(os.path.exists(os.path.dirname(path)))
+            handler.emit(logging.makeLogRecord({'msg': '{}'}))
+            handler.close()
+            with open(path) as log:
+                self.assertEqual(log.read(), '{}\n')
+
+
+class SyntheticDataTests(TestCase):
+
+    def test_seed_data(self):
+        with tempfile.TemporaryDirectory() as excel_dir:
+            call_command('seed_data', plos=3, processors=4, items=200, forecasts=150,
+                         excel_dir=excel_dir, excel_rows=20, stdout=io.StringIO())
+            sheet = openpyxl.load_workbook(os.path.join(excel_dir, 'items.xlsx')).active
+            rows = list(sheet.values)
+
+        self.assertEqual((PLO.objects.count(), Processor.objects.count()), (3, 4))
+        self.assertEqual((Item.objects.count(), Forecast.objects.count()), (200, 150))
+        sids = list(Item.objects.values_list('sid', flat=True))
+        self.assertEqual(len(set(sids)), 200)
+        self.assertTrue(all(len(sid) == 3 for sid in sids))
+        self.assertFalse(set(Item.objects.values_list('status', flat=True)) - {value for value, _ in Item.STATUS_CHOICES})
+        self.assertEqual(list(rows[0]), [column.header for column in ITEM_EXPORT_COLUMNS])
+        self.assertEqual(len(rows), 21)
+        self.assertFalse({row[0] for row in rows[1:]} & set(sids))  # new items only
+
+    def test_benchmark_report(self):
+        call_command('seed_data', plos=2, processors=2, items=30, forecasts=30, stdout=io.StringIO())
+        before = Item.objects.count()
+        report = benchmark.run(repeat=2, only=['plo list', 'item bulk create', 'upload items'], upload_rows=5)
+
+        results = {result['name']: result for result in report['results']}
+        self.assertEqual(set(results), {'plo list', 'item bulk create', 'upload items'})
+        self.assertEqual(results['item bulk create']['status'], 200)
+        self.assertEqual(results['upload items']['status'], 202)
+        self.assertEqual(set(results['plo list']['latency_ms']), {'p50', 'p95', 'p99', 'mean', 'max'})
+        self.assertGreater(results['plo list']['queries'], 0)
+        self.assertEqual(report['data']['Item'], before)  # writes are rolled back
+        self.assertEqual(Item.objects.count(), before)
+        self.assertFalse(User.objects.filter(username=benchmark.BENCHMARK_USERNAME).exists())
+
+
+class SQLiteConcurrencyTests(TransactionTestCase):
+    """Runs against the file test database, with the production pragmas and WAL set by its migration."""
+
+    def setUp(self):
+        self.plo = PLO.objects.create(name='PLO')
+        self.processor = Processor.objects.create(name='Processor')
+        create_items(5, self.plo, self.processor)
+
+    def start_import(self):
+        """Write 100 Items in a thread and keep its transaction open until the returned event is set."""
+        importing, release = threading.Event(), threading.Event()
+
+        def run_import():
+            try:
+                with transaction.atomic():
+                    create_items(100, self.plo, self.processor, start=100)
+                    importing.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=run_import)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+        self.assertTrue(importing.wait(10))
+        return release
+
+    def test_profile_pragmas(self):
+        values = {}
+        with connection.cursor() as cursor:
+            for pragma in ('journal_mode', 'synchronous', 'temp_store', 'busy_timeout'):
+                cursor.execute(f'PRAGMA {pragma}')
+                values[pragma] = cursor.fetchone()[0]
+        self.assertEqual(values, {'journal_mode': 'wal', 'synchronous': 1, 'temp_store': 2, 'busy_timeout': 20000})
+
+    def test_readers_are_not_blocked_by_an_import(self):
+        release = self.start_import()
+        start = time.perf_counter()
+        response = self.client.get('/api/api/item/')
+        changes = changes_since()
+        elapsed = time.perf_counter() - start
+        release.set()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 5)  # the import is not committed yet
+        self.assertEqual(len(changes['changed']['item']), 5)
+        self.assertLess(elapsed, 2)
+
+    def test_writers_wait_for_an_import(self):
+        release = self.start_import()
+        threading.Timer(0.3, release.set).start()
+        start = time.perf_counter()
+        Item.objects.filter(sid='000').update(comments='Edited')  # would fail with "database is locked"
+        self.assertGreaterEqual(time.perf_counter() - start, 0.2)
+        self.assertEqual(Item.objects.count(), 105)
+
+
+class ReplicaTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        # In tests the replica mirrors the primary; point it at a file of its own
+        replica_connection = connections[replica.REPLICA_DB_ALIAS]
+        mirror_settings = replica_connection.settings_dict
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        replica_connection.close()
+        replica_connection.settings_dict = {**mirror_settings, 'NAME': os.path.join(directory.name, 'replica.sqlite3')}
+
+        def restore():
+            replica_connection.close()
+            replica_connection.settings_dict = mirror_settings
+        self.addCleanup(restore)
+
+        plo = PLO.objects.create(name='PLO')
+        processor = Processor.objects.create(name='Processor')
+        self.items = create_items(3, plo, processor)
+
+    def test_router(self):
+        self.assertEqual(router.db_for_read(Item), 'default')
+        with replica.replica_reads():
+            self.assertEqual(router.db_for_read(Item), 'replica')
+            self.assertEqual(router.db_for_write(Item), 'default')
+            with replica.primary_reads():
+                self.assertEqual(router.db_for_read(Item), 'default')
+
+    def test_lists_read_the_replica_until_the_client_writes(self):
+        self.assertFalse(replica.replica_ready())
+        call_command('refresh_replica', once=True, stdout=io.StringIO())
+        self.assertTrue(replica.replica_ready())
+        Item.objects.filter(pk=self.items[0].pk).update(comments='Not copied yet')
+
+        response = self.client.get('/api/api/item/')
+        self.assertEqual(response.json()['results'][0]['comments'], None)  # served by the replica
+        detail = self.client.get(f'/api/api/item/{self.items[0].sid}/')
+        self.assertEqual(detail.json()['comments'], 'Not copied yet')  # detail views read the primary
+
+        response = self.client.patch(
+            f'/api/api/item/{self.items[1].sid}/', {'comments': 'Mine', 'partial': True}, content_type='application/json',
+        )
+        self.assertIn(replica.STICKY_COOKIE, response.cookies)
+        rows = self.client.get('/api/api/item/').json()['results']
+        self.assertEqual([row['comments'] for row in rows[:2]], ['Not copied yet', 'Mine'])
+
+        self.client.cookies.clear()
+        call_command('refresh_replica', once=True, stdout=io.StringIO())
+        rows = self.client.get('/api/api/item/').json()['results']
+        self.assertEqual([row['comments'] for row in rows[:2]], ['Not copied yet', 'Mine'])
+
+    def test_requests_that_write_nothing_keep_the_replica(self):
+        response = self.client.post(
+            '/api/api/forecast/capacity/', {'team_capacity': {'COE': 1}}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(replica.STICKY_COOKIE, response.cookies)
+
+        response = self.client.patch('/api/api/item/bulk/', [{'sid': 'ZZZ'}], content_type='application/json')
+        self.assertEqual(response.status_code, 400)  # nothing found to update
+        self.assertNotIn(replica.STICKY_COOKIE, response.cookies)
+
+        response = self.client.delete('/api/api/item/bulk/', [self.items[0].sid], content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(replica.STICKY_COOKIE, response.cookies)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        PLO.objects.create(name='PLO')
+        cls.admin = User.objects.create_user('admin', password='x', is_superuser=True)
+        cls.user = User.objects.create_user('user', email='user@example.com', password='x')
+
+    def setUp(self):
+        # Rolling back a test's changes to users sends no signals
+        clear_user_cache()
+
+    def bearer(self, user):
+        return {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(user).access_token}'}
+
+    def test_authenticated_get_needs_no_user_query(self):
+        auth = self.bearer(self.user)
+        self.client.get('/api/api/plo/', **auth)  # loads the claims
+        with self.assertNumQueries(2):  # ETag version + list, as for anonymous requests
+            response = self.client.get('/api/api/plo/', **auth)
+        self.assertEqual(response.status_code, 200)
+
+    def test_staff_change_applies_to_the_next_request(self):
+        auth = self.bearer(self.user)
+        self.assertEqual(self.client.get('/api/_perf/', **auth).status_code, 403)
+        response = self.client.post(
+            '/api/update_staff_status/', {'username': 'user', 'is_staff': True}, **self.bearer(self.admin),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/_perf/', **auth).status_code, 200)
+
+    @override_settings(AUTH_USER_CACHE_SIZE=2)
+    def test_cache_keeps_the_most_recently_seen_users(self):
+        other = User.objects.create_user('other', password='x')
+        user_claims(self.admin.pk)
+        user_claims(self.user.pk)
+        user_claims(self.admin.pk)
+        user_claims(other.pk)
+        self.assertEqual(list(_claims), [self.admin.pk, other.pk])
+        with self.assertNumQueries(0):
+            self.assertEqual(user_claims(self.admin.pk)['username'], 'admin')
+
+    def test_expired_entries_are_dropped_on_insert(self):
+        user_claims(self.admin.pk)
+        with mock.patch('time.monotonic', return_value=time.monotonic() + 3600):
+            user_claims(self.user.pk)
+        self.assertEqual(list(_claims), [self.user.pk])
+
+    def test_deleted_user_is_rejected(self):
+        auth = self.bearer(self.user)
+        self.assertEqual(self.client.get('/api/user/', **auth).json()['email'], 'user@example.com')
+        response = self.client.delete(
+            '/api/delete_user/', {'username': 'user', 'oldPassword': 'x'}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/user/', **auth).status_code, 401)
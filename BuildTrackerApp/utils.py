@@ -1,9 +1,9 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from email.utils import formataddr
 
+from .outbox import queue_email
+
 def send_status_update_email(sid, status, item_details):
+    """Queue the status update email; the outbox worker delivers it."""
     sender = 'noreply+dlmsystembuild@sap.corp'
     recipient = ['pooja.gajghate@sap.com'] 
     subject = f'Status Update for System <strong>{sid}</strong>'
@@ -18,22 +18,8 @@ def send_status_update_email(sid, status, item_details):
     else:
         body = f'<p>The status for system <strong>{sid}</strong> has been updated to "<strong>{status}</strong>".</p>'
 
-    # Create a multipart email message
-    msg = MIMEMultipart("alternative")
-    msg['From'] = formataddr(('DLM System Build', sender))
-    msg['To'] = ', '.join(recipient)
-    msg['Subject'] = subject
-    msg.attach(MIMEText(body, 'html'))
-
-    try:
-        with smtplib.SMTP('mail.sap.corp', 587) as server:
-            server.starttls()  # Secure the connection
-            server.login('dlmsystembuild-mails', 'DLMops@4')  # Authenticate
-            server.sendmail(sender, recipient, msg.as_string())
-            print("Email sent successfully!")
-
-    except Exception as e:
-        print(f"Failed to send email: {e}")
+    text = f'The status for system {sid} has been updated to "{status}".'
+    return queue_email(subject, text, recipient, html_body=body, from_email=formataddr(('DLM System Build', sender)))
 
 def format_item_details_as_html(original_item):
     # Ensure that original_item is a dictionary
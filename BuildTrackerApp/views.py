@@ -2,35 +2,43 @@
 from django.contrib.auth import authenticate, get_user_model, update_session_auth_hash, logout
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
 from rest_framework import generics, status, permissions, serializers, viewsets
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenViewBase
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.decorators import api_view
+from rest_framework.decorators import action, api_view
 from django.contrib import messages
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 import pandas as pd
-from django.shortcuts import render, redirect
+from django.shortcuts import get_object_or_404, render, redirect
 
 
 # Local imports
-from .models import PLO, Processor, Item,Forecast
+from .models import PLO, Processor, Item, Forecast, ImportJob
 from .serializers import (
     PLOSerializer, ProcessorSerializer, ItemSerializer,
-    UserRegisterSerializer, UserLoginSerializer, UserSerializer, ForecastSerializer
+    UserRegisterSerializer, UserLoginSerializer, UserSerializer, ForecastSerializer,
+    ImportJobSerializer, bulk_lookup_key, get_bulk_max_records,
 )
 
 
 # Other imports
+import datetime
+import hashlib
 import json
+import re
 from django.conf import settings
+from django.utils.http import parse_etags, quote_etag
 import logging
 
 logger = logging.getLogger(__name__)
@@ -44,6 +52,20 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.utils import formataddr
 from .utils import send_status_update_email
+from .importers import ImportFileError
+from .jobs import enqueue_import
+from .filters import FieldFilterBackend, PrefixSearchFilter, StableOrderingFilter, coalesced
+from .ingestion import INTEGER_MAX
+from .pagination import IdCursorPagination
+from .stats import get_item_stats
+from .history import GROUP_FIELDS, stage_dwell_summary
+from .eta import predict_open_items
+from .calendar_weeks import parse_weeks
+from .exports import EXPORT_FORMATS, FORECAST_EXPORT_COLUMNS, ITEM_EXPORT_COLUMNS, stream_export
+from .capacity import ScenarioError, apply_scenario, load_demand, simulate
+from .sync import changes_since, parse_token, table_version
+from .perf import route_summary
+from .authentication import CachedJWTAuthentication
 
 @api_view(['POST'])
 def send_email_notification(request):
@@ -57,10 +79,10 @@ def send_email_notification(request):
     try:
         send_status_update_email(sid, status_value, item_details)
     except Exception as e:
-        print(f"Error sending email: {e}")
+        print(f"Error queueing email: {e}")
         return Response({"error": "Failed to send email."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    return Response({"message": "Email sent successfully"}, status=status.HTTP_200_OK)
+    return Response({"message": "Email queued successfully"}, status=status.HTTP_200_OK)
 
 class UpdateUserStaffStatusView(APIView):
     permission_classes = [IsAuthenticated]
@@ -154,10 +176,11 @@ def delete_user(request):
 class UserDetailView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
 
     def get_object(self):
-        return self.request.user
+        # request.user only carries the token claims (see authentication.py)
+        return get_object_or_404(User, pk=self.request.user.id)
 
     def put(self, request, *args, **kwargs):
         user = self.get_object()
@@ -237,18 +260,221 @@ def user_logout(request):
 
 
 
-class PLOViewSet(viewsets.ModelViewSet):
+class ProjectedListMixin:
+    """
+    Restrict list querysets to the columns the serializer renders, following
+    ``?fields=`` when given. Related columns read through a dotted ``source``
+    (e.g. ``item.sid``) are selected in the same query; fields built from
+    several columns list them in ``source_fields``.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            return queryset
+        columns = {'id'}
+        for field in self.get_serializer().fields.values():
+            if field.source != '*':
+                columns.add(field.source.replace('.', '__'))
+            columns.update(getattr(field, 'source_fields', ()))
+        return queryset.only(*columns)
+
+
+class BulkWriteMixin:
+    """
+    ``bulk/`` endpoint taking a JSON list: POST creates the records, PATCH
+    partially updates existing ones (identified by the serializer's
+    ``Meta.bulk_lookup_field``) and DELETE removes those whose lookup values
+    are listed. Valid records are written in a single transaction with
+    ``bulk_create``/``bulk_update``; the response holds one result per
+    record, so a bad row does not cost the rest of the batch.
+    """
+
+    @action(detail=False, methods=['post', 'patch', 'delete'])
+    def bulk(self, request):
+        serializer_class = self.get_serializer_class()
+        model = serializer_class.Meta.model
+        lookup_field = getattr(serializer_class.Meta, 'bulk_lookup_field', 'id')
+        if not isinstance(request.data, list):
+            return Response({'error': 'Expected a list.'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = get_bulk_max_records()
+        if len(request.data) > limit:
+            return Response({'error': f"At most {limit} records per request."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.method == 'DELETE':
+            raw_keys = [record.get(lookup_field) if isinstance(record, dict) else record for record in request.data]
+            keys, key_errors = [], []
+            for raw in raw_keys:
+                try:
+                    keys.append(bulk_lookup_key(model, lookup_field, raw))
+                    key_errors.append(None)
+                except serializers.ValidationError as e:
+                    keys.append(None)
+                    key_errors.append(e.detail)
+            with transaction.atomic():
+                existing = self.get_queryset().filter(**{f'{lookup_field}__in': [key for key in keys if key is not None]})
+                found = set(existing.values_list(lookup_field, flat=True))
+                existing.delete()
+            results = []
+            for index, (raw, key, errors) in enumerate(zip(raw_keys, keys, key_errors)):
+                result = {'index': index, lookup_field: raw, 'status': 'deleted'}
+                if errors is not None:
+                    result.update(status='error', errors=errors)
+                elif key not in found:
+                    result.update(status='error', errors={lookup_field: ['Not found.']})
+                results.append(result)
+        else:
+            instances = None
+            if request.method == 'PATCH':
+                keys = []
+                for record in request.data:
+                    if isinstance(record, dict):
+                        try:
+                            keys.append(bulk_lookup_key(model, lookup_field, record.get(lookup_field)))
+                        except serializers.ValidationError:
+                            pass  # reported for the record by the serializer
+                instances = self.get_queryset().in_bulk(keys, field_name=lookup_field)
+            serializer = self.get_serializer(instances, data=request.data, many=True, partial=request.method == 'PATCH')
+            serializer.is_valid(raise_exception=True)
+            with transaction.atomic():
+                results = serializer.save()
+
+        summary = {outcome: 0 for outcome in ('created', 'updated', 'unchanged', 'deleted', 'error')}
+        for result in results:
+            summary[result['status']] += 1
+        applied = len(results) - summary['error']
+        return Response(
+            {**summary, 'results': results},
+            status=status.HTTP_200_OK if applied or not results else status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class ExportMixin:
+    """
+    ``export/?format=csv|xlsx`` streams every row matching the list filters,
+    search and ordering as a spreadsheet with ``export_columns``.
+    """
+    export_columns = None
+    export_name = None
+
+    def perform_content_negotiation(self, request, force=False):
+        # Here ``?format=`` names the file type, not a DRF renderer; errors are still sent as JSON
+        if self.action == 'export':
+            renderer = JSONRenderer()
+            return renderer, renderer.media_type
+        return super().perform_content_negotiation(request, force)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        export_format = request.query_params.get('format', 'xlsx').lower()
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        queryset = self.filter_queryset(self.get_queryset())
+        if not queryset.ordered:
+            queryset = queryset.order_by('id')
+        # The rows are read while the response streams, after the request's database routing ended
+        queryset = queryset.using(queryset.db)
+        response = StreamingHttpResponse(
+            stream_export(queryset, self.export_columns, export_format, self.export_name),
+            content_type=EXPORT_FORMATS[export_format],
+        )
+        filename = f'{self.export_name}-{timezone.localdate():%Y%m%d}.{export_format}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    Strong ETags on ``list`` and ``retrieve``, derived from the change
+    numbers of ``etag_models`` (every table the response is built from, see
+    ``sync.table_version``) and the request itself. A matching
+    ``If-None-Match`` is answered with 304 after that one query, before the
+    queryset is read or serialized.
+    """
+    etag_models = ()
+
+    def get_etag(self, request):
+        fingerprint = f'{table_version(*self.etag_models)}|{request.get_full_path()}|{request.accepted_media_type}'
+        return quote_etag(hashlib.sha1(fingerprint.encode()).hexdigest())
+
+    def _conditional(self, handler, request, *args, **kwargs):
+        # Taken before the response is built, so a concurrent write can only make the tag older, never newer
+        etag = self.get_etag(request)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            response['Cache-Control'] = 'no-cache'  # may be stored, but must be revalidated
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(super().retrieve, request, *args, **kwargs)
+
+
+class PLOViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = PLOSerializer
     queryset = PLO.objects.all()
+    etag_models = (PLO,)
 
-class ProcessorViewSet(viewsets.ModelViewSet):
+class ProcessorViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = ProcessorSerializer
     queryset = Processor.objects.all()
+    etag_models = (Processor,)
 
-class ItemViewSet(viewsets.ModelViewSet):
+class ItemViewSet(ConditionalGetMixin, ProjectedListMixin, BulkWriteMixin, ExportMixin, viewsets.ModelViewSet):
     serializer_class = ItemSerializer
     queryset = Item.objects.all()
+    etag_models = (Item,)
+    replica_actions = ('list', 'export', 'stats', 'stage_stats', 'eta')
+    export_columns = ITEM_EXPORT_COLUMNS
+    export_name = 'items'
     lookup_field = 'sid'
+    # Any sid but the paths of the list actions below, so /item/eta/ is never taken for an Item
+    lookup_value_regex = '(?!(?:{})/)[^/.]+'.format('|'.join(map(re.escape, Item.RESERVED_SIDS)))
+    pagination_class = IdCursorPagination
+    filter_backends = [FieldFilterBackend, PrefixSearchFilter, StableOrderingFilter]
+    filter_fields = ['status', 'plo', 'processor1', 'processor2', 'hardware', 'flavour', 'bfs', 't_shirt_size']
+    range_filter_fields = ['requested_date', 'expected_delivery', 'revised_delivery_date', 'delivery_date']
+    search_fields = ['sid', 'description']  # prefix, case-sensitive
+    ordering_fields = [
+        'sid', 'status', 'plo', 'hardware', 'flavour', 'requested_date',
+        'expected_delivery', 'revised_delivery_date', 'delivery_date',
+    ]
+    # Cursor-safe stand-ins for ordering on a relation or a nullable column (see StableOrderingFilter)
+    ordering_expressions = {
+        'plo': F('plo__name'),
+        'revised_delivery_date': coalesced('revised_delivery_date', datetime.date.max),
+    }
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """Counts per status, PLO and processor plus delivery timeliness, served from the cache."""
+        return Response(get_item_stats())
+
+    @action(detail=False, methods=['get'], url_path='stage-stats')
+    def stage_stats(self, request):
+        """Time spent per status, optionally split by ``?group_by=flavour,t_shirt_size,hardware``."""
+        group_by = [name for name in request.query_params.get('group_by', '').split(',') if name]
+        unknown = set(group_by) - set(GROUP_FIELDS)
+        if unknown:
+            return Response(
+                {'error': f"Cannot group by: {', '.join(sorted(unknown))}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(stage_dwell_summary(group_by))
+
+    @action(detail=False, methods=['get'])
+    def eta(self, request):
+        """Predicted delivery date of every open item, from the model trained on delivered ones."""
+        return Response(predict_open_items())
 
     def update(self, request, *args, **kwargs):
         partial = request.data.get('partial', False)  # Check if partial update
@@ -264,17 +490,6 @@ class ItemViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
 
-def parse_date(date_value):
-    """Convert a date value to a Python date, handling NaT and errors."""
-    if pd.notna(date_value):
-        try:
-            # Attempt to parse the date in DD/MM/YYYY format
-            return pd.to_datetime(date_value, format='%d/%m/%Y', errors='coerce').date()
-        except Exception as e:
-            logger.error(f"Date conversion error for value {date_value}: {e}")
-            return None
-    return None
-import datetime
 @api_view(['POST'])
 def upload_excel(request):
     if not request.FILES.get('file'):
@@ -289,77 +504,72 @@ def upload_excel(request):
             logger.error("Invalid file format: %s", file_extension)
             return Response({"error": "Invalid file format. Please upload an .xls or .xlsx file."}, status=status.HTTP_400_BAD_REQUEST)
 
-        df = pd.read_excel(excel_file, engine='openpyxl' if file_extension == 'xlsx' else 'xlrd')
-        logger.info(f"DataFrame contents: {df.head()}")
-
-        processor_mapping = {processor.name: processor.id for processor in Processor.objects.all()}
-        plo_mapping = {plo.name: plo.id for plo in PLO.objects.all()}
-
-        for index, row in df.iterrows():
-            if not row['sid'] or not row['requested_date']:
-                logger.error("Missing required fields in row: %s", row)
-                return Response({"error": "Missing required fields."}, status=status.HTTP_400_BAD_REQUEST)
-
-            requested_date = parse_date(row['requested_date'])
-            expected_delivery = parse_date(row['expected_delivery'])
-            revised_delivery_date = parse_date(row['revised_delivery_date'])
-
-            if requested_date is None:
-                logger.error(f"Invalid requested_date at row {index}: {row['requested_date']}")
-                return Response({"error": "Invalid requested_date."}, status=status.HTTP_400_BAD_REQUEST)
-
-            processor1_instance_id = processor_mapping.get(row['processor1'])
-            processor2_instance_id = processor_mapping.get(row['processor2']) if row['processor2'] else None
-
-            if processor1_instance_id is None:
-                logger.error("Invalid processor1 ID: %s", row['processor1'])
-                return Response({"error": "Invalid processor1 ID."}, status=status.HTTP_400_BAD_REQUEST)
-
-            processor1_instance = Processor.objects.get(id=processor1_instance_id)
-            processor2_instance = Processor.objects.get(id=processor2_instance_id) if processor2_instance_id else None
-
-            plo_name = row.get('plo')
-            plo_id = plo_mapping.get(plo_name)
-
-            if plo_id is None:
-                logger.error(f"Invalid PLO name: {plo_name} at row {index}")
-                return Response({"error": f"PLO '{plo_name}' not found."}, status=status.HTTP_400_BAD_REQUEST)
-
-            item = Item(
-                requested_date=requested_date,
-                flavour=row['flavour'],
-                sid=row['sid'],
-                estimated_clients=row['estimated_clients'],
-                delivered_clients=row['delivered_clients'],
-                bfs=row['bfs'],
-                t_shirt_size=row['t_shirt_size'],
-                system_type=row['system_type'],
-                hardware=row['hardware'],
-                setup=row['setup'],
-                plo_id=plo_id,  # This will now always be valid
-                processor1=processor1_instance,
-                processor2=processor2_instance,
-                status=row['status'],
-                landscape=row['landscape'],
-                description=row['description'],
-                expected_delivery=expected_delivery,
-                revised_delivery_date=revised_delivery_date,
-                delivery_date=row.get('delivery_date', datetime.date(9999, 12, 31)),
-                delivery_delay_reason=row.get('delivery_delay_reason', None),
-                servicenow=row.get('servicenow', ''),
-                comments=row.get('comments', ''),
-            )
-            item.save()
+        try:
+            job = enqueue_import(ImportJob.ITEMS, excel_file, mode=request.query_params.get('mode', 'insert'))
+        except ImportFileError as e:
+            logger.error("Rejected Excel upload: %s", e)
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response({"message": "Excel data uploaded successfully."}, status=status.HTTP_201_CREATED)
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
     except Exception as e:
         logger.error(f"Error processing the file: {e}")
         return Response({"error": "Failed to upload data."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
-class ForecastViewSet(viewsets.ModelViewSet):
+class ForecastViewSet(ConditionalGetMixin, ProjectedListMixin, BulkWriteMixin, ExportMixin, viewsets.ModelViewSet):
     serializer_class = ForecastSerializer
-    queryset = Forecast.objects.all()
+    queryset = Forecast.objects.select_related('item')
+    etag_models = (Forecast, Item)  # item_sid comes from the Item
+    replica_actions = ('list', 'export', 'capacity')
+    export_columns = FORECAST_EXPORT_COLUMNS
+    export_name = 'forecasts'
+    pagination_class = IdCursorPagination
+    filter_backends = [FieldFilterBackend, PrefixSearchFilter, StableOrderingFilter]
+    filter_fields = ['sid', 'assigned_to', 'requester', 'bfs']
+    range_filter_fields = ['time_weeks']
+    calendar_week_filter_fields = {
+        'cw_request': ('cw_request_plo', 'cw_request_plo_end'),
+        'cw_delivered': ('cw_delivered', 'cw_delivered_end'),
+    }
+    search_fields = ['sid', 'system_description']  # prefix, case-sensitive
+    ordering_fields = ['sid', 'assigned_to', 'requester', 'cw_request_plo', 'cw_delivered', 'time_weeks']
+    ordering_expressions = {
+        'requester': coalesced('requester__name', ''),
+        'cw_request_plo': coalesced('cw_request_plo', INTEGER_MAX),
+        'cw_delivered': coalesced('cw_delivered', INTEGER_MAX),
+        'time_weeks': coalesced('time_weeks', INTEGER_MAX),
+    }
+
+    @action(detail=False, methods=['get', 'post'])
+    def capacity(self, request):
+        """
+        Weekly load per team and processor with overcommitted weeks flagged.
+        POST runs a what-if: ``changes``, ``add`` and ``remove`` edit the
+        forecasts and ``team_capacity``/``processor_capacity`` override the
+        configured slots, without saving anything.
+        """
+        params = request.data if request.method == 'POST' else request.query_params
+        try:
+            first_week = parse_weeks(params.get('first_week'))[0]
+            last_week = parse_weeks(params.get('last_week'))[1]
+            demand = load_demand()
+            if request.method == 'POST':
+                demand = apply_scenario(
+                    demand,
+                    changes=request.data.get('changes') or [],
+                    add=request.data.get('add') or [],
+                    remove=request.data.get('remove') or [],
+                )
+            plan = simulate(
+                demand,
+                team_capacity=params.get('team_capacity') if request.method == 'POST' else None,
+                processor_capacity=params.get('processor_capacity') if request.method == 'POST' else None,
+                first_week=first_week,
+                last_week=last_week,
+            )
+        except (ScenarioError, TypeError, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(plan)
 
     def update(self, request, *args, **kwargs):
         partial = request.data.get('partial', False)  # Check if partial update
@@ -402,57 +612,38 @@ def upload_excel_forecast(request):
             logger.error("Invalid file format: %s", file_extension)
             return Response({"error": "Invalid file format. Please upload an .xls or .xlsx file."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Read the Excel file using pandas
-        df = pd.read_excel(excel_file, engine='openpyxl' if file_extension == 'xlsx' else 'xlrd')
-        logger.info(f"DataFrame contents: {df.head()}")
-
-        # Ensure item mappings are available
-        item_mapping = {item.sid: item.id for item in Item.objects.all()}
-
-        for index, row in df.iterrows():
-            # Check required fields
-            if not row.get('sid') or not row.get('assigned_to'):
-                logger.error("Missing required fields in row: %s", row)
-                return Response({"error": "Missing required fields."}, status=status.HTTP_400_BAD_REQUEST)
-
-            # Retrieve the item based on sid
-            item_id = item_mapping.get(row['sid'])
-            if not item_id:
-                logger.error(f"Item with SID '{row['sid']}' not found.")
-                return Response({"error": f"Item with SID '{row['sid']}' not found."}, status=status.HTTP_400_BAD_REQUEST)
-
-            # Parse and handle the calendar weeks
-            cw_request_plo = row.get('cw_request_plo', '').split(',') if row.get('cw_request_plo') else []
-            cw_delivered = row.get('cw_delivered', '').split(',') if row.get('cw_delivered') else []
-
-            # Create the forecast entry
-            forecast_data = {
-                'sid': row['sid'],
-                'item': Item.objects.get(id=item_id),
-                'clients': row.get('clients'),
-                'bfs': row['bfs'],
-                'system_description': row['system_description'],
-                'time_weeks': row.get('time_weeks'),
-                'landscape': row['landscape'],
-                'frontend': row['frontend'],
-                'assigned_to': row.get('assigned_to'),
-                'requester': row.get('requester', ''),
-                'parallel_processing': row.get('parallel_processing', False),
-                'cw_request_plo': cw_request_plo,  # List of calendar weeks
-                'cw_delivered': cw_delivered,      # List of calendar weeks
-                'comments': row.get('comments', ''),
-            }
-
-            # Create and save the Forecast object
-            forecast_serializer = ForecastSerializer(data=forecast_data)
-            if forecast_serializer.is_valid():
-                forecast_serializer.save()
-            else:
-                logger.error(f"Error saving forecast at row {index}: {forecast_serializer.errors}")
-                return Response({"error": "Error saving forecast data."}, status=status.HTTP_400_BAD_REQUEST)
-
-        return Response({"message": "Excel data uploaded successfully."}, status=status.HTTP_201_CREATED)
+        # The sheet is parsed and written by the import worker; poll the job for progress
+        job = enqueue_import(ImportJob.FORECASTS, excel_file)
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
     except Exception as e:
         logger.error(f"Error processing the file: {e}")
-        return Response({"error": "Failed to upload data."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        return Response({"error": "Failed to upload data."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ImportJobDetailView(generics.RetrieveAPIView):
+    serializer_class = ImportJobSerializer
+    queryset = ImportJob.objects.all()
+
+
+class SyncView(APIView):
+    """
+    ``GET sync/?since=<token>``: the Items, Forecasts, PLOs and Processors
+    changed or deleted since the token of the previous call (everything
+    without one), and the token to send next time. See sync.py.
+    """
+
+    def get(self, request):
+        try:
+            since = parse_token(request.query_params.get('since'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(changes_since(since))
+
+
+class PerfSummaryView(APIView):
+    """Latency percentiles per route from this process's recent requests (see perf.py)."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(route_summary())
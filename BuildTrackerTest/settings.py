@@ -36,6 +36,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'BuildTrackerApp.perf.PerfMiddleware',  # first, so its timings cover everything below
+    'BuildTrackerApp.replica.ReplicaMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -91,12 +93,45 @@ WSGI_APPLICATION = 'BuildTrackerTest.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
+# Run on every new SQLite connection. synchronous=NORMAL is still safe in WAL
+# mode (a power cut can only lose the last commits); cache_size is in KiB when
+# negative. WAL itself, which lets readers carry on while an import writes, is
+# stored in the database file and set once by migration 0026_sqlite_wal.
+SQLITE_PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+# Seconds a writer waits for the write lock before "database is locked"
+SQLITE_BUSY_TIMEOUT = 20
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        # Keep connections open between requests, checking them before reuse
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': SQLITE_BUSY_TIMEOUT,
+            # Take the write lock at BEGIN: a transaction that read first cannot be refused it
+            # later (SQLite would fail at once instead of waiting out the busy timeout)
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+        },
+        # A file rather than the in-memory default, so tests run with WAL like production
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    },
+}
+# Copy of the primary for list, export and dashboard reads, refreshed by
+# `manage.py refresh_replica` (see BuildTrackerApp/replica.py)
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'NAME': BASE_DIR / 'replica.sqlite3',
+    'TEST': {'MIRROR': 'default'},
 }
+DATABASE_ROUTERS = ['BuildTrackerApp.replica.ReplicaRouter']
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -136,7 +171,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'BuildTrackerApp.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.TokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -172,3 +207,116 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = USER
 EMAIL_HOST_PASSWORD = PASSWORD  
 
+
+# Number of rows written per INSERT/UPDATE batch by the Excel importers
+IMPORT_BATCH_SIZE = 500
+
+# Spool uploads to a temporary file instead of holding them in memory; the
+# Excel importers stream rows from that file in IMPORT_BATCH_SIZE batches.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Uploaded files waiting for the import worker are kept under MEDIA_ROOT
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Run import jobs inside the upload request instead of queueing them for
+# `manage.py run_import_jobs`. Handy for local development and tests.
+IMPORT_JOBS_EAGER = False
+
+# A running import job whose worker reported no progress for IMPORT_JOB_TIMEOUT
+# seconds is queued again, and failed after IMPORT_JOB_MAX_ATTEMPTS runs.
+IMPORT_JOB_TIMEOUT = 3600
+IMPORT_JOB_MAX_ATTEMPTS = 3
+
+# A file-based cache is shared by every worker process on the host, so an
+# invalidation made by one process (or by the import worker) is seen by all.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    }
+}
+
+# Seconds the /item/stats/ dashboard aggregates stay cached; writes to
+# Items, PLOs and Processors invalidate them earlier.
+ITEM_STATS_CACHE_TIMEOUT = 300
+
+# Outbox worker (`manage.py send_outbox_emails`): failed messages are retried
+# after OUTBOX_RETRY_BASE_SECONDS, doubling each attempt up to
+# OUTBOX_RETRY_MAX_SECONDS, and given up after OUTBOX_MAX_ATTEMPTS. Messages
+# a worker claimed but did not finish within OUTBOX_CLAIM_TIMEOUT seconds are
+# handed to the next run.
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_BASE_SECONDS = 60
+OUTBOX_RETRY_MAX_SECONDS = 3600
+OUTBOX_CLAIM_TIMEOUT = 600
+EMAIL_TIMEOUT = 30
+
+# Status notifications wait this many seconds in the outbox; further
+# transitions of the same SID in that window are merged into one email.
+STATUS_NOTIFICATION_DEBOUNCE_SECONDS = 60
+
+# Regularisation of the delivery date model (BuildTrackerApp/eta.py); larger
+# values pull predictions for rare flavour/size/hardware combinations
+# towards the overall average.
+ETA_RIDGE = 1.0
+
+# Weekly build slots used by the capacity planner (/forecast/capacity/);
+# teams missing here (TBD) are never flagged as overcommitted.
+CAPACITY_TEAM_SLOTS = {'COE': 10, 'ODC': 10}
+CAPACITY_PROCESSOR_SLOTS = 3
+
+# Largest list accepted by the item/forecast bulk/ endpoints in one request.
+BULK_MAX_RECORDS = 1000
+
+# Rows fetched per database round trip by the item/forecast export/ endpoints.
+EXPORT_CHUNK_SIZE = 2000
+
+# Most rows per table returned by one sync/ response; the client asks again while "more" is set.
+SYNC_PAGE_SIZE = 5000
+# Deletions are kept this long for sync/ clients; older tokens get a full resync.
+SYNC_TOMBSTONE_RETENTION_DAYS = 30
+
+# Requests kept per process for the /api/_perf/ percentiles.
+PERF_BUFFER_SIZE = 10000
+PERF_LOG_DIR = BASE_DIR / 'logs'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        # One JSON object per request, written by BuildTrackerApp.perf.PerfMiddleware;
+        # PERF_LOG_DIR is created with the first line
+        'perf_file': {
+            'class': 'BuildTrackerApp.perf.PerfLogFileHandler',
+            'filename': PERF_LOG_DIR / 'perf.log',
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'BuildTrackerApp.perf': {
+            'handlers': ['perf_file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Seconds between replica refreshes, how long a client reads from the primary
+# after its own write, and how stale the replica may get before reads go back
+# to the primary.
+REPLICA_REFRESH_INTERVAL = 10
+REPLICA_STICKY_SECONDS = 30
+REPLICA_MAX_LAG = 60
+
+# Seconds a process keeps the username and staff flags behind a JWT before
+# reading them again; changes made in the same process apply at once.
+AUTH_USER_CACHE_TTL = 30
+# Users whose flags a process keeps at most; the least recently seen go first.
+AUTH_USER_CACHE_SIZE = 1000